@@ -0,0 +1,87 @@
+# chefquest/arranque.py
+"""
+Calentamiento del proceso web al arrancar (lo llama chefquest/wsgi.py).
+
+Sin esto, la primera petición de cada worker paga la importación de las vistas
+(urlconf), la compilación de cada plantilla en el loader cacheado y la carga del
+manifiesto de estáticos. Aquí se hace una vez, antes de aceptar tráfico.
+Se desactiva con ARRANQUE_CALENTAR=False (p. ej. para medir la diferencia con
+`manage.py medir_arranque --sin-calentar`).
+"""
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.urls import get_resolver
+
+EXTENSIONES_PLANTILLA = (".html", ".txt", ".xml")
+
+logger = logging.getLogger(__name__)
+
+
+def calentar_urls():
+    """Importa el urlconf (y con él todas las vistas) y rellena los índices de reverse()."""
+    resolver = get_resolver()
+    resolver.reverse_dict  # noqa: B018  (propiedad: construye el índice)
+    pendientes = list(resolver.namespace_dict.values())
+    while pendientes:
+        _, subresolver = pendientes.pop()
+        subresolver.reverse_dict  # noqa: B018
+        pendientes.extend(subresolver.namespace_dict.values())
+
+
+def directorios_de_plantillas(loaders):
+    """Directorios de los loaders (el cacheado envuelve a los de DIRS y templates/ de las apps)."""
+    for loader in loaders:
+        if hasattr(loader, "loaders"):
+            yield from directorios_de_plantillas(loader.loaders)
+        elif hasattr(loader, "get_dirs"):
+            yield from loader.get_dirs()
+
+
+def nombres_de_plantillas(motor):
+    """Todas las plantillas que encuentran los loaders del motor."""
+    nombres = set()
+    for directorio in directorios_de_plantillas(motor.engine.template_loaders):
+        for raiz, _, ficheros in os.walk(directorio):
+            for fichero in ficheros:
+                if fichero.endswith(EXTENSIONES_PLANTILLA):
+                    nombres.add(os.path.relpath(os.path.join(raiz, fichero), directorio).replace(os.sep, "/"))
+    return sorted(nombres)
+
+
+def calentar_plantillas():
+    """Compila las plantillas en el loader cacheado. Devuelve (compiladas, con errores)."""
+    compiladas = errores = 0
+    for motor in engines.all():
+        if not hasattr(motor, "engine"):  # solo el motor de Django tiene loader cacheado
+            continue
+        for nombre in nombres_de_plantillas(motor):
+            try:
+                motor.get_template(nombre)
+                compiladas += 1
+            except (TemplateDoesNotExist, TemplateSyntaxError):
+                # Fragmentos que no son plantillas completas: se compilarán (y fallarán) al usarlos
+                errores += 1
+    return compiladas, errores
+
+
+def calentar_estaticos():
+    """Carga el manifiesto de estáticos (ManifestStaticFilesStorage lo lee al instanciarse)."""
+    from django.contrib.staticfiles.storage import staticfiles_storage
+
+    staticfiles_storage.base_url  # noqa: B018  (LazyObject: fuerza la instancia)
+
+
+def calentar():
+    if not getattr(settings, "ARRANQUE_CALENTAR", True):
+        return None
+    inicio = time.perf_counter()
+    calentar_urls()
+    compiladas, errores = calentar_plantillas()
+    calentar_estaticos()
+    ms = (time.perf_counter() - inicio) * 1000
+    logger.info("URLs y %d plantillas listas en %.0f ms (%d sin compilar)", compiladas, ms, errores)
+    return {"plantillas": compiladas, "errores": errores, "ms": ms}
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chefquest.settings')
 
 application = get_asgi_application()
+
+# URLs, plantillas y estáticos listos antes de la primera petición
+from chefquest.arranque import calentar  # noqa: E402
+
+calentar()
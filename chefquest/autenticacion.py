@@ -0,0 +1,172 @@
+# chefquest/autenticacion.py
+"""
+Backend de autenticación con caché compartida entre peticiones.
+
+ModelBackend carga en cada petición el usuario, sus permisos (propios y de grupo)
+y, al usarlo las vistas de staff, su empresa. Este backend guarda todo eso en una
+sola entrada de caché por usuario: una petición autenticada solo hace una lectura
+de caché.
+
+La entrada no es la instancia: solo los campos de CAMPOS_USUARIO, los de la
+empresa, los permisos y el hash de sesión (nunca el hash de la contraseña). El
+resto de campos quedan diferidos y se leen de la base de datos si se usan.
+Se carga siempre de la primaria, también en las vistas que leen de réplicas.
+
+También limita los intentos de login (chefquest.limitador) en authenticate(),
+por donde pasan todos los formularios con contraseña (login de clientes,
+/accounts/login/, /admin/login/): un intento rechazado no llega a calcular el
+hash de la contraseña.
+
+Invalidación (clientes/signals.py):
+  - cambios en el usuario, sus grupos, sus permisos o su empresa: cambia la versión
+    del usuario, lo que invalida su entrada.
+  - cambios en grupos o permisos: se incrementa la generación global, lo que
+    invalida las entradas de todos los usuarios a la vez.
+
+La invalidación se hace al confirmar la transacción (transaction.on_commit): si
+se hiciera antes, otra petición podría volver a guardar los datos antiguos
+mientras la transacción sigue abierta. Cada entrada lleva la generación y la
+versión del usuario leídas antes de consultar la base de datos, y solo vale si
+siguen siendo las actuales: una petición que leyó la fila antes del cambio y la
+guarda después de la invalidación deja una entrada que ya nace caducada.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+
+from chefquest.db_routers import lecturas_en_primaria
+from chefquest.limitador import ip_de_la_peticion, permitir_intento
+
+CLAVE_GENERACION = "auth:generacion"
+
+# Lo que usan las peticiones (plantillas, mixins de staff, permisos); el resto se difiere
+CAMPOS_USUARIO = (
+    "id", "username", "nombre_visible", "email", "first_name", "last_name",
+    "is_active", "is_staff", "is_superuser", "empresa_id",
+)
+CACHES_PERMISOS = ("_user_perm_cache", "_group_perm_cache", "_perm_cache")
+
+
+def _clave(user_id):
+    return f"auth:usuario:{user_id}"
+
+
+def _clave_version(user_id):
+    return f"auth:version:{user_id}"
+
+
+def get_timeout():
+    return getattr(settings, "AUTH_CACHE_SEGUNDOS", 300)
+
+
+def _actual(clave, valor):
+    """El valor leído o, si no existe, uno nuevo (add(): si otro proceso lo ha creado entretanto, el suyo)."""
+    if valor is None:
+        cache.add(clave, time.time_ns(), timeout=None)
+        valor = cache.get(clave)
+    return valor
+
+
+def _campos(instancia, nombres):
+    # En el orden de los campos del modelo, como espera Model.from_db
+    return {
+        f.attname: getattr(instancia, f.attname)
+        for f in instancia._meta.concrete_fields if f.attname in nombres
+    }
+
+
+def _desde_campos(modelo, campos):
+    """Instancia de `modelo` con solo esos campos cargados (los demás, diferidos)."""
+    return modelo.from_db("default", list(campos), list(campos.values()))
+
+
+def _entrada(usuario, generacion, version):
+    return {
+        "generacion": generacion,
+        "version": version,
+        "usuario": _campos(usuario, CAMPOS_USUARIO),
+        "empresa": usuario.empresa and _campos(usuario.empresa, {f.attname for f in usuario.empresa._meta.concrete_fields}),
+        "permisos": {nombre: getattr(usuario, nombre) for nombre in CACHES_PERMISOS if hasattr(usuario, nombre)},
+        "hash_sesion": usuario.get_session_auth_hash(),
+        "hashes_sesion_anteriores": list(usuario.get_session_auth_fallback_hash()),
+    }
+
+
+def _reconstruir(entrada):
+    Usuario = get_user_model()
+    usuario = _desde_campos(Usuario, entrada["usuario"])
+    if entrada["empresa"]:
+        usuario.empresa = _desde_campos(Usuario.empresa.field.related_model, entrada["empresa"])
+    for nombre, permisos in entrada["permisos"].items():
+        setattr(usuario, nombre, permisos)
+    # django.contrib.auth.get_user comprueba la sesión con estos hashes: sin leer la contraseña
+    hash_sesion, anteriores = entrada["hash_sesion"], entrada["hashes_sesion_anteriores"]
+    usuario.get_session_auth_hash = lambda: hash_sesion
+    usuario.get_session_auth_fallback_hash = lambda: iter(anteriores)
+    return usuario
+
+
+def invalidar_usuario(*user_ids):
+    def invalidar():
+        # La versión nueva invalida también las entradas que se guarden más tarde con la anterior
+        cache.set_many({_clave_version(i): time.time_ns() for i in user_ids}, timeout=None)
+        cache.delete_many([_clave(i) for i in user_ids])
+
+    transaction.on_commit(invalidar)
+
+
+def invalidar_todos():
+    transaction.on_commit(lambda: cache.set(CLAVE_GENERACION, time.time_ns(), timeout=None))
+
+
+class BackendCacheado(ModelBackend):
+
+    def authenticate(self, request, username=None, password=None, codigo_empresa=None, **kwargs):
+        if username is None:
+            username = kwargs.get(get_user_model().USERNAME_FIELD)
+        permitido, dimension = permitir_intento(
+            ip=ip_de_la_peticion(request), usuario=username, codigo_empresa=codigo_empresa,
+        )
+        if not permitido:
+            if request is not None:
+                # Para que el formulario pueda explicar por qué se rechaza
+                request.login_limitado = dimension
+            # authenticate() deja de probar backends y devuelve None
+            raise PermissionDenied("Demasiados intentos de inicio de sesión.")
+        return super().authenticate(request, username=username, password=password, **kwargs)
+
+    def get_user(self, user_id):
+        clave, clave_version = _clave(user_id), _clave_version(user_id)
+        encontrados = cache.get_many([clave, CLAVE_GENERACION, clave_version])
+        generacion = encontrados.get(CLAVE_GENERACION)
+        version = encontrados.get(clave_version)
+        entrada = encontrados.get(clave)
+        if (
+            entrada
+            and generacion is not None and entrada.get("generacion") == generacion
+            and version is not None and entrada.get("version") == version
+        ):
+            return _reconstruir(entrada)
+
+        # Antes de consultar: si cambian mientras tanto, la entrada que se guarde no valdrá
+        generacion = _actual(CLAVE_GENERACION, generacion)
+        version = _actual(clave_version, version)
+
+        Usuario = get_user_model()
+        # De la primaria: lo que se cachea aquí se da por vigente hasta la próxima invalidación
+        with lecturas_en_primaria():
+            try:
+                usuario = Usuario._default_manager.db_manager("default").select_related("empresa").get(pk=user_id)
+            except Usuario.DoesNotExist:
+                return None
+            if not self.user_can_authenticate(usuario):
+                return None
+            # Rellena _user_perm_cache, _group_perm_cache y _perm_cache
+            self.get_all_permissions(usuario)
+        cache.set(clave, _entrada(usuario, generacion, version), timeout=get_timeout())
+        return usuario
@@ -0,0 +1,227 @@
+# chefquest/cache_niveles.py
+"""
+Caché de dos niveles para resultados caros (listados de productos, estadísticas).
+
+    valor = obtener("estadisticas", calcular, empresa_id=3, partes=(90,), ttl=300)
+
+- Nivel 1: LRU en memoria del proceso (CACHE_LOCAL_ENTRADAS). Evita traer y
+  deserializar el valor de la caché compartida en cada petición. Los valores se
+  comparten entre peticiones del mismo proceso: no se deben modificar.
+- Nivel 2: la caché compartida de Django (Redis, o ficheros en local).
+- Espacios de nombres versionados: la clave incluye los contadores de
+  chefquest.versiones de la empresa (y de `dependencias`), que las señales ya
+  incrementan al cambiar productos y reservas. Una clave vieja no se borra: deja
+  de usarse y caduca sola.
+- Obsoleto mientras se recalcula: pasado `ttl` el valor se sigue sirviendo
+  durante `obsoleto` segundos más mientras un solo worker lo recalcula.
+- Un solo cálculo a la vez (single-flight): un cerrojo en la caché compartida
+  decide qué worker recalcula; sin ningún valor que servir, el resto espera a
+  que aparezca (como mucho ESPERA_MAXIMA segundos) en vez de recalcular a la vez.
+  Con la caché de ficheros add() no es atómico y, muy de vez en cuando, pueden
+  recalcular dos workers; con Redis no.
+- `calcular()` siempre lee de la primaria (chefquest.db_routers.lecturas_en_primaria),
+  también dentro de vistas con @usar_replica: el resultado se da por vigente
+  para la versión de su clave. `calcular` debe devolver datos ya evaluados (listas),
+  no querysets perezosos.
+- Contadores por nombre (aciertos en cada nivel, obsoletos, fallos, recálculos
+  y su tiempo) que se vuelcan a la caché compartida cada VOLCADO_SEGUNDOS.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from chefquest import versiones
+from chefquest.db_routers import lecturas_en_primaria
+
+PREFIJO = "niveles"
+ESPERA_MAXIMA = 5  # segundos esperando al worker que recalcula
+ESPERA_CERROJO = 60  # caducidad del cerrojo si el worker que recalcula muere
+VOLCADO_SEGUNDOS = 10
+CONTADORES = ("local", "compartida", "obsoleto", "fallo", "recalculo", "recalculo_ms")
+
+
+# ==============================
+# NIVEL 1: LRU DEL PROCESO
+# ==============================
+
+class LRU:
+    """Diccionario acotado por número de entradas; expulsa la menos usada. Seguro entre hilos."""
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self._datos = OrderedDict()
+        self._cerrojo = threading.Lock()
+
+    def get(self, clave):
+        with self._cerrojo:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                self._datos.move_to_end(clave)
+            return entrada
+
+    def set(self, clave, entrada):
+        with self._cerrojo:
+            self._datos[clave] = entrada
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def clear(self):
+        with self._cerrojo:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+_local = LRU(getattr(settings, "CACHE_LOCAL_ENTRADAS", 256))
+
+
+# ==============================
+# CONTADORES
+# ==============================
+
+_contadores = Counter()
+_ultimo_volcado = time.monotonic()
+_cerrojo_contadores = threading.Lock()
+
+
+def _contar(nombre, contador, cantidad=1):
+    global _ultimo_volcado
+    with _cerrojo_contadores:
+        _contadores[(nombre, contador)] += cantidad
+        if time.monotonic() - _ultimo_volcado < VOLCADO_SEGUNDOS:
+            return
+        pendientes = dict(_contadores)
+        _contadores.clear()
+        _ultimo_volcado = time.monotonic()
+    _volcar(pendientes)
+
+
+def _volcar(pendientes):
+    # Nombres de todos los procesos, para que estadisticas() sepa qué contadores leer
+    conocidos = set(cache.get(f"{PREFIJO}:nombres", ()))
+    if not {nombre for nombre, _ in pendientes} <= conocidos:
+        cache.set(f"{PREFIJO}:nombres", sorted(conocidos | {n for n, _ in pendientes}), timeout=None)
+    for (nombre, contador), cantidad in pendientes.items():
+        clave = f"{PREFIJO}:contador:{nombre}:{contador}"
+        if not cache.add(clave, cantidad, timeout=None):
+            try:
+                cache.incr(clave, cantidad)
+            except ValueError:  # expulsada entre add() e incr()
+                cache.set(clave, cantidad, timeout=None)
+
+
+def volcar_contadores():
+    """Vuelca ya los contadores de este proceso (se hace solo cada VOLCADO_SEGUNDOS)."""
+    with _cerrojo_contadores:
+        pendientes = dict(_contadores)
+        _contadores.clear()
+    _volcar(pendientes)
+
+
+def estadisticas():
+    """{nombre: {contador: total}} de todos los procesos (lo ya volcado a la caché compartida)."""
+    claves = {
+        f"{PREFIJO}:contador:{n}:{c}": (n, c)
+        for n in cache.get(f"{PREFIJO}:nombres", ()) for c in CONTADORES
+    }
+    valores = cache.get_many(list(claves))
+    resultado = {}
+    for clave, (nombre, contador) in claves.items():
+        resultado.setdefault(nombre, {})[contador] = valores.get(clave, 0)
+    return resultado
+
+
+# ==============================
+# LECTURA CON RECÁLCULO
+# ==============================
+
+def _clave(nombre, empresa_id, dependencias, partes):
+    espacios = ([versiones.clave_empresa(empresa_id)] if empresa_id is not None else []) + list(dependencias)
+    leidas = versiones.leer(*espacios) if espacios else {}
+    version = ".".join(str(leidas[e]) for e in espacios)
+    return f"{PREFIJO}:{nombre}:{empresa_id or '-'}@{version}:" + ":".join(str(p) for p in partes)
+
+
+def _recalcular(nombre, clave, calcular, ttl, obsoleto):
+    inicio = time.perf_counter()
+    # De la primaria aunque la vista lea de réplicas: el valor se guarda bajo una clave
+    # con la versión actual y una réplica con retraso lo guardaría sin la última escritura
+    with lecturas_en_primaria():
+        valor = calcular()
+    ahora = time.time()
+    entrada = (ahora + ttl, valor)
+    cache.set(clave, entrada, timeout=int(ttl + obsoleto) + 1)
+    _local.set(clave, entrada)
+    _contar(nombre, "recalculo")
+    _contar(nombre, "recalculo_ms", round((time.perf_counter() - inicio) * 1000))
+    return valor
+
+
+def _recalcular_con_cerrojo(nombre, clave, calcular, ttl, obsoleto):
+    """Recalcula si este worker consigue el cerrojo; si no, devuelve None."""
+    cerrojo = f"{clave}:cerrojo"
+    if not cache.add(cerrojo, 1, timeout=ESPERA_CERROJO):
+        return None
+    try:
+        return (_recalcular(nombre, clave, calcular, ttl, obsoleto),)
+    finally:
+        cache.delete(cerrojo)
+
+
+def obtener(nombre, calcular, empresa_id=None, partes=(), dependencias=(), ttl=300, obsoleto=None):
+    """
+    Valor de `calcular()` cacheado en los dos niveles bajo `nombre` + `partes`, en el
+    espacio de la empresa (y de los contadores de `dependencias`, p. ej.
+    versiones.CATALOGO). Durante `obsoleto` segundos tras `ttl` (por defecto otros
+    `ttl`) se sirve el valor anterior mientras un worker lo recalcula.
+    """
+    obsoleto = ttl if obsoleto is None else obsoleto
+    clave = _clave(nombre, empresa_id, dependencias, partes)
+    ahora = time.time()
+
+    entrada = _local.get(clave)
+    if entrada is not None and ahora < entrada[0]:
+        _contar(nombre, "local")
+        return entrada[1]
+
+    # El valor local no está o está obsoleto: quizá otro worker ya lo ha recalculado
+    compartida = cache.get(clave)
+    if compartida is not None:
+        entrada = compartida
+        _local.set(clave, entrada)
+        if ahora < entrada[0]:
+            _contar(nombre, "compartida")
+            return entrada[1]
+
+    if entrada is not None:
+        # Obsoleto: un worker recalcula y los demás sirven el anterior mientras tanto
+        recalculado = _recalcular_con_cerrojo(nombre, clave, calcular, ttl, obsoleto)
+        if recalculado is not None:
+            return recalculado[0]
+        _contar(nombre, "obsoleto")
+        return entrada[1]
+
+    _contar(nombre, "fallo")
+    recalculado = _recalcular_con_cerrojo(nombre, clave, calcular, ttl, obsoleto)
+    if recalculado is not None:
+        return recalculado[0]
+    # Otro worker lo está calculando: se espera a su resultado
+    limite = time.monotonic() + ESPERA_MAXIMA
+    while time.monotonic() < limite:
+        time.sleep(0.05)
+        entrada = cache.get(clave)
+        if entrada is not None:
+            _local.set(clave, entrada)
+            return entrada[1]
+    # Tarda demasiado (o murió sin soltar el cerrojo): se calcula aquí
+    return _recalcular(nombre, clave, calcular, ttl, obsoleto)
+
+
+def invalidar_empresa(empresa_id):
+    """Cambia la versión del espacio de la empresa: todas sus claves dejan de usarse."""
+    versiones.incrementar(versiones.clave_empresa(empresa_id))
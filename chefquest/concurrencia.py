@@ -0,0 +1,166 @@
+# chefquest/concurrencia.py
+"""
+Control de concurrencia optimista (columna `version`).
+
+Los modelos versionados (staff.models.ModeloVersionado) guardan con
+UPDATE ... WHERE id = X AND version = <la leída> y suben la versión. Si otra
+escritura se adelantó, no se actualiza ninguna fila y se lanza ConflictoDeVersion:
+no se pisan cambios ajenos y no hace falta bloquear filas.
+
+Los formularios llevan la versión que vio el usuario en un campo oculto
+(VersionFormMixin) y guardan solo los campos modificados (campos_modificados).
+EdicionVersionadaMixin hace todo esto en las UpdateView y, si hay conflicto,
+vuelve a mostrar el formulario sobre la fila actual con los valores del usuario y,
+campo a campo, el valor actual junto a su cambio (plantilla conflicto_version.html);
+VersionadoAdminMixin vuelve a abrir la página del admin con un mensaje.
+"""
+import copy
+
+from django import forms
+from django.contrib import messages
+from django.db.models import QuerySet
+from django.http import HttpResponseRedirect
+from django.utils.html import format_html
+
+MENSAJE_CONFLICTO = (
+    "Alguien ha modificado estos datos mientras los editabas. "
+    "Se muestran los valores actuales: revisa los cambios y vuelve a guardar."
+)
+MENSAJE_CONFLICTO_FORMULARIO = (
+    "Alguien ha modificado estos datos mientras los editabas. "
+    "Tus cambios se conservan en el formulario: compáralos con los valores actuales y vuelve a guardar."
+)
+
+
+class ConflictoDeVersion(Exception):
+    """La fila ha cambiado (o se ha borrado) desde que se leyó."""
+
+
+class VersionWidget(forms.HiddenInput):
+    """Campo oculto que además muestra el número (columnas editables del admin)."""
+
+    def render(self, name, value, attrs=None, renderer=None):
+        return format_html("{}{}", super().render(name, value, attrs, renderer), value or "")
+
+
+class VersionFormMixin:
+    """ModelForm con la versión leída en un campo oculto; al guardar se usa para comparar."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["version"] = forms.IntegerField(
+            widget=self.version_widget, required=False, initial=self.instance.version,
+        )
+
+    version_widget = forms.HiddenInput
+
+    def save(self, commit=True):
+        version = self.cleaned_data.get("version")
+        if version is not None and not self.instance._state.adding:
+            self.instance.version = version
+        return super().save(commit=commit)
+
+
+def campos_modificados(form, extra=()):
+    """Campos del modelo que el formulario ha cambiado (sin m2m), más `extra`."""
+    concretos = {
+        f.name for f in form._meta.model._meta.concrete_fields
+        if f.name != "version" and not f.primary_key
+    }
+    return [c for c in form.changed_data if c in concretos] + [c for c in extra if c not in form.changed_data]
+
+
+def _mostrar(valor):
+    # Fechas y números se dejan tal cual: la plantilla los formatea con la zona y el idioma
+    if valor is None or valor == "":
+        return "—"
+    if isinstance(valor, (list, tuple, QuerySet)):  # m2m (un fichero también es iterable)
+        return ", ".join(str(v) for v in valor) or "—"
+    return valor
+
+
+def diferencias(form, instancia):
+    """
+    [(etiqueta, valor actual, valor del usuario)] de los campos en los que el
+    formulario ya validado difiere de `instancia`, la fila guardada. No vale
+    form.instance: al validar, el formulario le copia los valores enviados.
+    """
+    campos_modelo = {f.name: f for f in instancia._meta.get_fields() if not f.auto_created}
+    datos = getattr(form, "cleaned_data", {})
+    filas = []
+    for nombre in form.changed_data:
+        campo = campos_modelo.get(nombre)
+        if campo is None:
+            continue
+        if campo.many_to_many:
+            actual = list(getattr(instancia, nombre).all()) if instancia.pk else []
+        elif campo.choices:
+            actual = getattr(instancia, f"get_{nombre}_display")()
+        else:
+            actual = getattr(instancia, nombre)
+        # Si el valor no es válido se muestra tal como llegó
+        tuyo = datos[nombre] if nombre in datos else form[nombre].value()
+        if campo.choices and not campo.many_to_many:
+            tuyo = dict(campo.flatchoices).get(tuyo, tuyo)
+        filas.append((form[nombre].label, _mostrar(actual), _mostrar(tuyo)))
+    return filas
+
+
+class EdicionVersionadaMixin:
+    """
+    Para UpdateView con un formulario VersionFormMixin: UPDATE solo de los campos
+    cambiados (más `campos_extra`) comparando la versión. Si hay conflicto no se
+    pisan los datos ajenos: se vuelve a mostrar el formulario ligado a la fila
+    actual (con su versión) y a los valores enviados, y en `conflictos` cada campo
+    con su valor actual y el del usuario. Al guardar de nuevo solo se escribe lo
+    que el usuario deja distinto de la fila actual.
+    """
+    campos_extra = ()
+
+    def form_valid(self, form):
+        self.object = form.save(commit=False)
+        try:
+            self.object.save(update_fields=campos_modificados(form, self.campos_extra))
+        except ConflictoDeVersion:
+            return self.form_conflicto()
+        form.save_m2m()
+        return HttpResponseRedirect(self.get_success_url())
+
+    def form_conflicto(self):
+        self.object = self.get_object()  # fila actual (404 si la han borrado)
+        datos = self.request.POST.copy()
+        datos["version"] = self.object.version
+        kwargs = self.get_form_kwargs()
+        kwargs.update(data=datos, instance=copy.copy(self.object))
+        form = self.get_form_class()(**kwargs)
+        form.is_valid()
+        conflictos = diferencias(form, self.object)
+        form.add_error(None, MENSAJE_CONFLICTO_FORMULARIO)
+        return self.render_to_response(self.get_context_data(form=form, conflictos=conflictos))
+
+
+class VersionadoAdminMixin:
+    """
+    ModelAdmin de un modelo versionado: guarda solo los campos cambiados comparando
+    la versión (formulario y columnas editables de la lista). Un conflicto deshace
+    el guardado y vuelve a la misma página con un mensaje de error.
+    """
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            obj.save(update_fields=campos_modificados(form))
+        else:
+            super().save_model(request, obj, form, change)
+
+    def _sin_conflictos(self, vista, request, *args, **kwargs):
+        try:
+            return vista(request, *args, **kwargs)
+        except ConflictoDeVersion:
+            self.message_user(request, MENSAJE_CONFLICTO, messages.ERROR)
+            return HttpResponseRedirect(request.get_full_path())
+
+    def changeform_view(self, request, *args, **kwargs):
+        return self._sin_conflictos(super().changeform_view, request, *args, **kwargs)
+
+    def changelist_view(self, request, *args, **kwargs):
+        return self._sin_conflictos(super().changelist_view, request, *args, **kwargs)
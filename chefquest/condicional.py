@@ -0,0 +1,72 @@
+# chefquest/condicional.py
+import hashlib
+
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from . import versiones
+
+
+def _contexto_usuario(request):
+    """
+    Lo que cambia la página aparte de los datos: usuario (desde la sesión, sin
+    consultar Usuario) y tema. Devuelve None si hay mensajes pendientes, porque
+    entonces la respuesta no se puede reutilizar.
+    """
+    if "messages" in request.COOKIES or "_messages" in request.session:
+        return None
+    return (request.session.get("_auth_user_id", ""), request.COOKIES.get("tema", ""))
+
+
+def condicional(obtener_contadores):
+    """
+    Decorador de vistas GET: calcula ETag y Last-Modified a partir de contadores de
+    versión (y, si la página depende del catálogo, del inicio de la franja de precios
+    vigente) y devuelve 304 sin ejecutar la vista si el cliente ya tiene esa versión.
+    `obtener_contadores(request, *args, **kwargs)` devuelve los nombres de contador
+    de los que depende la página (o None para no usar respuesta condicional).
+    """
+    def _estado(request, *args, **kwargs):
+        # Se cachea en la petición: condition() llama a etag y last_modified por separado
+        if not hasattr(request, "_estado_condicional"):
+            nombres = obtener_contadores(request, *args, **kwargs)
+            usuario = _contexto_usuario(request)
+            if not nombres or usuario is None:
+                request._estado_condicional = None
+            else:
+                valores = versiones.leer(*nombres)
+                partes = [request.get_full_path(), *usuario, timezone.localdate().isoformat()]
+                partes += [f"{n}={valores[n]}" for n in sorted(valores)]
+                modificada = versiones.como_fecha(max(valores.values()))
+                if versiones.CATALOGO in valores:
+                    # Los precios del catálogo cambian con la hora (reglas por franja horaria)
+                    from staff.precios import inicio_tramo
+
+                    tramo = inicio_tramo(valores[versiones.CATALOGO])
+                    partes.append(tramo.isoformat())
+                    modificada = max(modificada, tramo)
+                etag = hashlib.md5("|".join(map(str, partes)).encode(), usedforsecurity=False).hexdigest()
+                request._estado_condicional = (etag, modificada)
+        return request._estado_condicional
+
+    def etag(request, *args, **kwargs):
+        estado = _estado(request, *args, **kwargs)
+        return estado and estado[0]
+
+    def last_modified(request, *args, **kwargs):
+        estado = _estado(request, *args, **kwargs)
+        return estado and estado[1]
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def contadores_catalogo(request, *args, **kwargs):
+    return [versiones.CATALOGO]
+
+
+def contadores_empresa(request, *args, **kwargs):
+    # Solo la sesión: si la empresa aún no está fijada, la vista normal se encarga
+    empresa_id = request.session.get("empresa_id")
+    if not empresa_id:
+        return None
+    return [versiones.clave_empresa(empresa_id)]
@@ -0,0 +1,121 @@
+# chefquest/db_routers.py
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+# Estado por petición (ContextVar funciona tanto en WSGI como en ASGI)
+_lectura_en_replica = ContextVar("lectura_en_replica", default=False)
+_escritura_realizada = ContextVar("escritura_realizada", default=False)
+
+# Apps cuyas lecturas/escrituras siempre van a la primaria y no cuentan como
+# escritura del usuario (la sesión se guarda en casi todas las peticiones)
+APPS_SOLO_PRIMARIA = {"sessions"}
+
+
+def get_replicas():
+    return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+def reiniciar_estado():
+    """Limpia el estado de enrutado al comenzar una petición."""
+    _lectura_en_replica.set(False)
+    _escritura_realizada.set(False)
+
+
+def hubo_escritura():
+    return _escritura_realizada.get()
+
+
+@contextmanager
+def lecturas_en_replica():
+    """
+    Dentro del bloque, las lecturas se envían a una réplica (si hay alguna configurada).
+    Las escrituras siguen yendo siempre a 'default'.
+    """
+    token = _lectura_en_replica.set(True)
+    try:
+        yield
+    finally:
+        _lectura_en_replica.reset(token)
+
+
+@contextmanager
+def lecturas_en_primaria():
+    """
+    Dentro del bloque, las lecturas van a 'default' aunque la vista use réplicas:
+    para lo que se guarda en una caché como si fuera lo último (usuarios, permisos, listados).
+    """
+    token = _lectura_en_replica.set(False)
+    try:
+        yield
+    finally:
+        _lectura_en_replica.reset(token)
+
+
+def _puede_usar_replica(request):
+    # Solo peticiones de lectura y sin ventana de "lee tus escrituras" activa
+    return (
+        request.method in ("GET", "HEAD")
+        and not getattr(request, "forzar_primaria", False)
+    )
+
+
+def usar_replica(view_func):
+    """Decorador para FBV de solo lectura (catálogo, listados, estadísticas)."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not _puede_usar_replica(request):
+            return view_func(request, *args, **kwargs)
+        with lecturas_en_replica():
+            return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaLecturaMixin:
+    """
+    Equivalente a @usar_replica para CBV. Debe ir antes de la vista genérica,
+    igual que el resto de mixins de staff.mixins.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        if not _puede_usar_replica(request):
+            return super().dispatch(request, *args, **kwargs)
+        with lecturas_en_replica():
+            response = super().dispatch(request, *args, **kwargs)
+            # Las TemplateResponse se renderizan después; forzamos aquí el render
+            # para que las consultas perezosas de la plantilla también usen la réplica
+            if hasattr(response, "render") and not getattr(response, "is_rendered", True):
+                response.render()
+            return response
+
+
+class ReplicaRouter:
+    """
+    Envía las lecturas marcadas a las réplicas de settings.DATABASE_REPLICAS
+    y todas las escrituras (y migraciones) a 'default'.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in APPS_SOLO_PRIMARIA:
+            return "default"
+        replicas = get_replicas()
+        if replicas and _lectura_en_replica.get():
+            return random.choice(replicas)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in APPS_SOLO_PRIMARIA:
+            _escritura_realizada.set(True)
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Todas las bases de datos contienen los mismos datos
+        bases = {"default", *get_replicas()}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
@@ -0,0 +1,96 @@
+# chefquest/estaticos.py
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+# Orden de preferencia de las variantes generadas en collectstatic
+CODIFICACIONES = [("br", ".br"), ("gzip", ".gz")]
+
+# nombre.0123456789ab.css -> nombre con hash de ManifestStaticFilesStorage
+NOMBRE_CON_HASH = re.compile(r"\.[0-9a-f]{12}\.[^./]+$")
+
+UN_ANO = 60 * 60 * 24 * 365
+
+
+def _codificaciones_aceptadas(request):
+    cabecera = request.headers.get("Accept-Encoding", "")
+    aceptadas = set()
+    for parte in cabecera.split(","):
+        token, _, params = parte.strip().partition(";")
+        if token and params.replace(" ", "") != "q=0":
+            aceptadas.add(token.lower())
+    return aceptadas
+
+
+def servir_estatico(request, path):
+    """
+    Sirve STATIC_ROOT en producción (sin servidor web delante).
+    Los ficheros con hash se marcan como inmutables; el resto se revalida.
+    """
+    try:
+        ruta = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Fichero no encontrado.")
+    if not os.path.isfile(ruta):
+        raise Http404("Fichero no encontrado.")
+
+    estado = os.stat(ruta)
+    con_hash = bool(NOMBRE_CON_HASH.search(path))
+    if not con_hash and not was_modified_since(request.headers.get("If-Modified-Since"), estado.st_mtime):
+        return HttpResponseNotModified()
+
+    fichero, codificacion = ruta, None
+    aceptadas = _codificaciones_aceptadas(request)
+    for nombre, extension in CODIFICACIONES:
+        if nombre in aceptadas and os.path.isfile(ruta + extension):
+            fichero, codificacion = ruta + extension, nombre
+            break
+
+    content_type, _ = mimetypes.guess_type(ruta)
+    response = FileResponse(open(fichero, "rb"), content_type=content_type or "application/octet-stream")
+    if codificacion:
+        response.headers["Content-Encoding"] = codificacion
+    patch_vary_headers(response, ["Accept-Encoding"])
+
+    response.headers["Last-Modified"] = http_date(estado.st_mtime)
+    if con_hash:
+        patch_cache_control(response, public=True, max_age=UN_ANO, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+    return response
+
+
+# Lo único que se sirve de MEDIA_ROOT: imágenes (nada que el navegador pueda ejecutar)
+TIPOS_MEDIA = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png", ".webp": "image/webp"}
+
+
+def servir_media(request, path):
+    """
+    Sirve las imágenes de MEDIA_ROOT. Solo contiene ficheros con nombre = hash del
+    contenido (chefquest.storage.AlmacenPorContenido), así que todos son
+    inmutables. Cualquier otra extensión es 404, y `nosniff` impide que el
+    navegador interprete una imagen como HTML.
+    """
+    content_type = TIPOS_MEDIA.get(os.path.splitext(path)[1].lower())
+    if content_type is None:
+        raise Http404("Fichero no encontrado.")
+    try:
+        ruta = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Fichero no encontrado.")
+    if not os.path.isfile(ruta):
+        raise Http404("Fichero no encontrado.")
+
+    response = FileResponse(open(ruta, "rb"), content_type=content_type)
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    response.headers["Last-Modified"] = http_date(os.stat(ruta).st_mtime)
+    patch_cache_control(response, public=True, max_age=UN_ANO, immutable=True)
+    return response
@@ -0,0 +1,147 @@
+# chefquest/idempotencia.py
+"""
+Claves de idempotencia para los POST que crean o cambian reservas.
+
+El cliente envía una clave (cabecera Idempotency-Key o campo oculto
+`idempotency_key`, que los formularios generan en cada render). La primera
+petición con esa clave se ejecuta y su respuesta se guarda en la caché durante
+IDEMPOTENCIA_SEGUNDOS; las repeticiones (doble pulsación, reintentos de la red)
+reciben la respuesta guardada sin ejecutar la vista ni tocar el ORM. Una
+repetición que llega mientras la original sigue en curso recibe enseguida un
+409 con Retry-After: no ocupa un worker esperando.
+
+Sin clave se usa una huella del cuerpo del POST con una ventana corta, que
+absorbe igualmente las dobles pulsaciones.
+"""
+import hashlib
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+CABECERA = "HTTP_IDEMPOTENCY_KEY"
+CAMPO = "idempotency_key"
+VENTANA_HUELLA = 10  # segundos
+REINTENTAR_EN = 1  # segundos (Retry-After del 409 mientras la original sigue en curso)
+MAX_CONTENIDO = 64 * 1024
+EN_CURSO = "en_curso"
+PREFIJO = "idem"
+
+_vistas = set()
+
+
+def nueva_clave():
+    return uuid.uuid4().hex
+
+
+def get_ttl():
+    return getattr(settings, "IDEMPOTENCIA_SEGUNDOS", 600)
+
+
+def _clave_peticion(request):
+    explicita = request.META.get(CABECERA) or request.POST.get(CAMPO)
+    if explicita:
+        return explicita[:100], get_ttl()
+    datos = sorted(
+        (campo, valor)
+        for campo, valores in request.POST.lists() if campo != "csrfmiddlewaretoken"
+        for valor in valores
+    )
+    return "huella-" + hashlib.sha256(repr(datos).encode()).hexdigest(), VENTANA_HUELLA
+
+
+def _guardable(response):
+    return (
+        200 <= response.status_code < 400
+        and not response.streaming
+        and len(response.content) <= MAX_CONTENIDO
+    )
+
+
+def _serializar(response):
+    return {
+        "estado": response.status_code,
+        "contenido": response.content,
+        "cabeceras": {
+            cabecera: response[cabecera]
+            for cabecera in ("Content-Type", "Location")
+            if response.has_header(cabecera)
+        },
+    }
+
+
+def _repetir(guardada):
+    response = HttpResponse(guardada["contenido"], status=guardada["estado"])
+    for cabecera, valor in guardada["cabeceras"].items():
+        response[cabecera] = valor
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _sesion(request):
+    # La cookie de sesión, sin cargar la sesión (ni tocar la base de datos)
+    cookie = request.COOKIES.get(settings.SESSION_COOKIE_NAME, "")
+    return hashlib.sha256(cookie.encode()).hexdigest()[:32] if cookie else ""
+
+
+def _contar_duplicado(nombre):
+    clave = f"{PREFIJO}:duplicados:{nombre}"
+    if not cache.add(clave, 1, timeout=None):
+        try:
+            cache.incr(clave)
+        except ValueError:  # expulsada entre add() e incr()
+            cache.set(clave, 1, timeout=None)
+
+
+def idempotente(nombre):
+    """
+    Decorador para vistas POST. Debe ir por fuera de login_required y similares:
+    la repetición no necesita cargar el usuario ni la sesión (la clave incluye la cookie de sesión).
+    """
+    _vistas.add(nombre)
+
+    def decorador(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "POST":
+                return view_func(request, *args, **kwargs)
+
+            clave, ttl = _clave_peticion(request)
+            clave_cache = f"{PREFIJO}:{_sesion(request)}:{request.path}:{clave}"
+
+            if not cache.add(clave_cache, EN_CURSO, timeout=ttl):
+                guardada = cache.get(clave_cache)
+                if guardada == EN_CURSO:
+                    _contar_duplicado(nombre)
+                    response = HttpResponse("La solicitud ya se está procesando.", status=409)
+                    response["Retry-After"] = str(REINTENTAR_EN)
+                    return response
+                if guardada is not None:
+                    _contar_duplicado(nombre)
+                    return _repetir(guardada)
+                # La original falló y liberó la clave: esta se procesa con normalidad
+                cache.add(clave_cache, EN_CURSO, timeout=ttl)
+
+            try:
+                response = view_func(request, *args, **kwargs)
+            except Exception:
+                cache.delete(clave_cache)
+                raise
+            if hasattr(response, "render") and not getattr(response, "is_rendered", True):
+                response.render()
+            if _guardable(response):
+                cache.set(clave_cache, _serializar(response), timeout=ttl)
+            else:
+                cache.delete(clave_cache)
+            return response
+        return wrapper
+    return decorador
+
+
+def estadisticas():
+    """Peticiones duplicadas absorbidas por vista (desde que existe el contador en la caché)."""
+    claves = {f"{PREFIJO}:duplicados:{n}": n for n in sorted(_vistas)}
+    valores = cache.get_many(list(claves))
+    return {n: valores.get(c, 0) for c, n in claves.items()}
@@ -0,0 +1,154 @@
+# chefquest/limitador.py
+"""
+Limitador de intentos de login (token bucket).
+
+Cada intento consume un token de tres cubetas: por IP, por nombre de usuario y por
+código de empresa. Si alguna está vacía el intento se rechaza antes de comprobar
+la contraseña, que es lo caro (PBKDF2): lo hace BackendCacheado.authenticate()
+para todos los logins, y staff.views.login_empresa para el código de empresa.
+Los tokens se recargan de forma continua.
+
+Backends:
+  - "memoria": diccionario del proceso (un worker, desarrollo).
+  - "cache":   caché de Django compartida entre workers (Redis/Memcached en producción).
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+CONFIG_POR_DEFECTO = {
+    "BACKEND": "cache",
+    # dimensión: (capacidad, segundos para recargar la cubeta entera)
+    "IP": (20, 60),
+    "USUARIO": (5, 300),
+    "EMPRESA": (10, 300),
+    "CONFIAR_X_FORWARDED_FOR": False,
+}
+
+DIMENSIONES = ("IP", "USUARIO", "EMPRESA")
+
+
+def get_config():
+    return {**CONFIG_POR_DEFECTO, **getattr(settings, "LOGIN_THROTTLE", {})}
+
+
+def _recargar(tokens, ultimo, ahora, capacidad, periodo):
+    return min(capacidad, tokens + (ahora - ultimo) * capacidad / periodo)
+
+
+class MemoriaBackend:
+    MAX_CLAVES = 10000
+
+    def __init__(self):
+        self._cubetas = {}
+        self._rechazos = {}
+        self._lock = threading.Lock()
+
+    def consumir(self, clave, capacidad, periodo):
+        ahora = time.monotonic()
+        with self._lock:
+            tokens, ultimo, _ = self._cubetas.get(clave, (capacidad, ahora, periodo))
+            tokens = _recargar(tokens, ultimo, ahora, capacidad, periodo)
+            permitido = tokens >= 1
+            if permitido:
+                tokens -= 1
+            # Cada cubeta guarda su periodo: las dimensiones recargan a ritmos distintos
+            self._cubetas[clave] = (tokens, ahora, periodo)
+            if len(self._cubetas) > self.MAX_CLAVES:
+                self._purgar(ahora)
+        return permitido
+
+    def _purgar(self, ahora):
+        # Una cubeta sin uso durante su periodo completo está llena: no hace falta guardarla
+        for clave, (_, ultimo, periodo) in list(self._cubetas.items()):
+            if ahora - ultimo > periodo:
+                del self._cubetas[clave]
+
+    def registrar_rechazo(self, dimension):
+        with self._lock:
+            self._rechazos[dimension] = self._rechazos.get(dimension, 0) + 1
+
+    def rechazos(self):
+        with self._lock:
+            return dict(self._rechazos)
+
+
+class CacheBackend:
+    """
+    Estado en la caché compartida. La lectura-escritura no es atómica: con mucha
+    concurrencia puede dejar pasar algún intento de más, nunca bloquear de menos.
+    """
+    PREFIJO = "limitador"
+
+    def consumir(self, clave, capacidad, periodo):
+        ahora = time.time()
+        clave_cache = f"{self.PREFIJO}:{clave}"
+        tokens, ultimo = cache.get(clave_cache, (capacidad, ahora))
+        tokens = _recargar(tokens, ultimo, ahora, capacidad, periodo)
+        permitido = tokens >= 1
+        if permitido:
+            tokens -= 1
+        cache.set(clave_cache, (tokens, ahora), timeout=int(periodo) + 1)
+        return permitido
+
+    def registrar_rechazo(self, dimension):
+        clave = f"{self.PREFIJO}:rechazos:{dimension}"
+        if not cache.add(clave, 1, timeout=None):
+            try:
+                cache.incr(clave)
+            except ValueError:  # expulsada entre add() e incr()
+                cache.set(clave, 1, timeout=None)
+
+    def rechazos(self):
+        claves = {f"{self.PREFIJO}:rechazos:{d}": d for d in DIMENSIONES}
+        return {claves[c]: v for c, v in cache.get_many(list(claves)).items()}
+
+
+_backends = {"memoria": MemoriaBackend(), "cache": CacheBackend()}
+
+
+def get_backend():
+    return _backends[get_config()["BACKEND"]]
+
+
+def ip_de_la_peticion(request):
+    if request is None:
+        return None
+    if get_config()["CONFIAR_X_FORWARDED_FOR"]:
+        reenviada = request.META.get("HTTP_X_FORWARDED_FOR")
+        if reenviada:
+            return reenviada.split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR")
+
+
+def _huella(valor):
+    # Las claves no guardan usuarios ni códigos en claro
+    return hashlib.sha256(str(valor).strip().lower().encode()).hexdigest()[:32]
+
+
+def permitir_intento(ip=None, usuario=None, codigo_empresa=None):
+    """
+    Consume un token de cada cubeta aplicable. Devuelve (permitido, dimension_rechazada).
+    """
+    config = get_config()
+    backend = get_backend()
+    valores = {"IP": ip, "USUARIO": usuario, "EMPRESA": codigo_empresa}
+
+    for dimension in DIMENSIONES:
+        valor = valores[dimension]
+        if not valor:
+            continue
+        capacidad, periodo = config[dimension]
+        if not backend.consumir(f"{dimension}:{_huella(valor)}", capacidad, periodo):
+            backend.registrar_rechazo(dimension)
+            return False, dimension
+    return True, None
+
+
+def estadisticas():
+    """Intentos rechazados por dimensión desde el arranque (memoria) o desde que existe la clave (caché)."""
+    rechazos = get_backend().rechazos()
+    return {d: rechazos.get(d, 0) for d in DIMENSIONES}
@@ -0,0 +1,259 @@
+# chefquest/microbench.py
+"""
+Microbenchmarks de los caminos calientes en Python puro (comando `microbenchmarks`).
+
+Cada benchmark se registra con @benchmark(nombre, tamanos): la función recibe el
+tamaño y prepara los datos (fuera de la medición) y devuelve la función sin
+argumentos que se mide. Se mide con timeit (autorange + repeticiones) y se
+compara el mejor tiempo por llamada con las referencias guardadas en
+MICROBENCH_REFERENCIAS: más de MICROBENCH_UMBRAL % por encima es una regresión.
+Las referencias solo valen para la máquina que las midió: se generan en cada
+una con --guardar y no se suben al repositorio. Si se midieron con otro Python,
+arquitectura o sistema no se comparan.
+
+Todo se ejecuta dentro de una transacción que se deshace al final (los que
+necesitan filas las crean ahí) y con AJUSTES: hash de contraseñas MD5 y
+limitador de login en memoria sin límite, para medir la lógica propia y no
+PBKDF2 ni el bloqueo por intentos.
+"""
+import json
+import platform
+import statistics
+import timeit
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.utils import timezone
+from django.views import View
+
+AJUSTES = {
+    "PASSWORD_HASHERS": ["django.contrib.auth.hashers.MD5PasswordHasher"],
+    "LOGIN_THROTTLE": {"BACKEND": "memoria", "IP": (10 ** 9, 1), "USUARIO": (10 ** 9, 1), "EMPRESA": (10 ** 9, 1)},
+}
+
+BENCHMARKS = []
+_bd = {}  # filas creadas en la transacción de la ejecución actual
+
+
+def benchmark(nombre, tamanos=(None,)):
+    def decorador(preparar):
+        BENCHMARKS.append((nombre, tamanos, preparar))
+        return preparar
+    return decorador
+
+
+def clave(nombre, n):
+    return nombre if n is None else f"{nombre}[{n}]"
+
+
+# ==============================
+# DATOS
+# ==============================
+
+def productos_en_memoria(n):
+    """Productos sin guardar con categoría (la mitad con cupón) y empresa, como los del select_related."""
+    from staff.models import Categoria, Cupon, Empresa, Producto
+
+    cupon = Cupon(pk=1, nombre="Verano", descuento=15)
+    categorias = [Categoria(pk=i, nombre=f"Categoría {i}", cupon=cupon if i % 2 else None) for i in range(10)]
+    empresa = Empresa(pk=1, nombre_comercial="Benchmark", codigo=1)
+    return [
+        Producto(
+            pk=i, nombre=f"Producto {i}", descripcion="Plato de prueba con descripción de longitud media.",
+            precio=Decimal("12.50") + i % 7, coste=Decimal("4.00"), stock=i % 50,
+            producto_del_dia=i % 20 == 0, categoria=categorias[i % 10], empresa=empresa,
+        )
+        for i in range(1, n + 1)
+    ]
+
+
+def _empresa_y_usuario():
+    from clientes.models import Usuario
+    from staff.models import Empresa
+
+    if "usuario" not in _bd:
+        codigo = 990000 + Empresa.objects.count()
+        empresa = Empresa.objects.create(nombre_comercial="Benchmark", codigo=codigo)
+        _bd["usuario"] = Usuario.objects.create_user(
+            f"benchmark{codigo}", password="benchmark", nombre_visible="Benchmark", empresa=empresa,
+        )
+    return _bd["usuario"]
+
+
+def _productos_en_bd(n):
+    from staff.models import Producto
+
+    usuario = _empresa_y_usuario()
+    existentes = _bd.setdefault("productos", [])
+    if len(existentes) < n:
+        existentes.extend(Producto.objects.bulk_create(
+            Producto(nombre=f"B{i}", descripcion="-", precio=10, coste=4, stock=100, empresa_id=usuario.empresa_id)
+            for i in range(len(existentes), n)
+        ))
+    return existentes[:n]
+
+
+def _peticion(ruta="/"):
+    from clientes.models import Usuario
+    from staff.models import Empresa
+
+    request = RequestFactory().get(ruta)
+    request.user = Usuario(pk=1, username="staff", is_staff=True, empresa=Empresa(pk=1, nombre_comercial="Benchmark"))
+    request.session = {"empresa_id": 1}
+    return request
+
+
+# ==============================
+# BENCHMARKS
+# ==============================
+
+@benchmark("calcular_precio", (1000,))
+def _calcular_precio(n):
+    from clientes.views import calcular_precio
+
+    productos = productos_en_memoria(n)
+    return lambda: [calcular_precio(p) for p in productos]
+
+
+@benchmark("inicio_items", (100, 1000, 10000))
+def _inicio_items(n):
+    from clientes.views import items_de_carta
+
+    productos = productos_en_memoria(n)
+    # Un tercio con precio compilado; el resto pasa por calcular_precio
+    precios = {p.pk: p.precio * Decimal("0.9") for p in productos if p.pk % 3 == 0}
+    return lambda: items_de_carta(productos, precios)
+
+
+@benchmark("reserva_form", (10, 100, 1000))
+def _reserva_form(n):
+    from clientes.forms import ReservaPedidoForm
+
+    datos = {
+        "tipo": "COMIDA",
+        "fecha": (timezone.localtime() + timedelta(days=1)).strftime("%Y-%m-%dT%H:%M"),
+        "comensales": 2,
+        "direccion": "Calle Mayor 1",
+        "notas": "",
+        "productos": [p.pk for p in _productos_en_bd(n)],
+    }
+    formulario = ReservaPedidoForm(data=datos)
+    if not formulario.is_valid():
+        raise ValueError(f"reserva_form: datos no válidos {formulario.errors.as_json()}")
+    return lambda: ReservaPedidoForm(data=datos).is_valid()
+
+
+@benchmark("login_empresa_clean")
+def _login_empresa_clean():
+    from clientes.forms import LoginEmpresaForm
+
+    usuario = _empresa_y_usuario()
+    datos = {
+        "username": usuario.username, "password": "benchmark",
+        "codigo_empresa": str(usuario.empresa.codigo), "es_empresa": "True",
+    }
+    if not LoginEmpresaForm(data=datos).is_valid():
+        raise ValueError("login_empresa_clean: el login de prueba no es válido")
+    return lambda: LoginEmpresaForm(data=datos).is_valid()
+
+
+@benchmark("resolucion_empresa")
+def _resolucion_empresa():
+    from staff.mixins import EmpresaEnSesionMixin, UsuarioEmpresaRequiredMixin
+
+    class Vista(EmpresaEnSesionMixin, UsuarioEmpresaRequiredMixin, View):
+        def get(self, request):
+            return None
+
+    vista = Vista.as_view()
+    request = _peticion()
+    return lambda: vista(request)
+
+
+@benchmark("render_producto_list", (100, 1000, 10000))
+def _render_producto_list(n):
+    productos = productos_en_memoria(n)
+    request = _peticion("/staff/productos/")
+    return lambda: render_to_string("staff/producto_list.html", {"object_list": productos}, request=request)
+
+
+@benchmark("render_inicio", (100, 1000, 10000))
+def _render_inicio(n):
+    from clientes.views import items_de_carta
+
+    productos, carta_del_dia = items_de_carta(productos_en_memoria(n), {})
+    contexto = {"productos": productos, "cartas_publicadas": [], "carta_del_dia": carta_del_dia or None}
+    request = _peticion()
+    return lambda: render_to_string("clientes/inicio.html", contexto, request=request)
+
+
+# ==============================
+# EJECUCIÓN Y REFERENCIAS
+# ==============================
+
+def medir(funcion, repeticiones=5):
+    """(mejor, mediana) en segundos por llamada; cada repetición dura al menos 0,2 s."""
+    temporizador = timeit.Timer(funcion)
+    vueltas, _ = temporizador.autorange()
+    tiempos = [t / vueltas for t in temporizador.repeat(repeat=repeticiones, number=vueltas)]
+    return min(tiempos), statistics.median(tiempos)
+
+
+def ejecutar(filtro=None, repeticiones=5, al_medir=None):
+    """Ejecuta los benchmarks cuyo nombre contiene `filtro`. Devuelve {clave: (mejor, mediana)}."""
+    resultados = {}
+    _bd.clear()
+    with override_settings(**AJUSTES), transaction.atomic():
+        for nombre, tamanos, preparar in BENCHMARKS:
+            if filtro and filtro not in nombre:
+                continue
+            for n in tamanos:
+                funcion = preparar() if n is None else preparar(n)
+                funcion()  # calentamiento: plantillas compiladas, cachés, consultas preparadas
+                resultados[clave(nombre, n)] = medir(funcion, repeticiones)
+                if al_medir:
+                    al_medir(clave(nombre, n), *resultados[clave(nombre, n)])
+        transaction.set_rollback(True)
+    _bd.clear()
+    return resultados
+
+
+def entorno_actual():
+    # Sin el nombre del host: en Docker cambia cada vez que se recrea el contenedor
+    return {"python": platform.python_version(), "maquina": platform.machine(), "sistema": platform.system()}
+
+
+def cargar_referencias(ruta):
+    """(referencias, entorno en el que se midieron); ({}, None) si no hay fichero."""
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            datos = json.load(f)
+    except FileNotFoundError:
+        return {}, None
+    return datos["referencias"], datos.get("entorno")
+
+
+def guardar_referencias(ruta, resultados):
+    """
+    Guarda el mejor tiempo de cada resultado. Conserva las referencias que no se
+    han medido si son de este mismo entorno.
+    """
+    anteriores, entorno = cargar_referencias(ruta)
+    if entorno != entorno_actual():
+        anteriores = {}  # de otra máquina: no se mezclan
+    referencias = {**anteriores, **{c: mejor for c, (mejor, _) in resultados.items()}}
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump({
+            "entorno": entorno_actual(),
+            "referencias": dict(sorted(referencias.items())),
+        }, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+
+def cambio(actual, referencia):
+    """Variación relativa (0.25 = 25 % más lento)."""
+    return actual / referencia - 1 if referencia else 0.0
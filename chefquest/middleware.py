@@ -1,5 +1,17 @@
 import time
 
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # sin brotli se usa solo gzip
+    brotli = None
+
+from .db_routers import reiniciar_estado, hubo_escritura
+from .perfilado import peticion_autorizada, perfilar
+
 class SimpleLoggerMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -12,4 +24,83 @@ class SimpleLoggerMiddleware:
         
         # 2. Código que se ejecuta DESPUÉS de que la vista devuelve la respuesta
         print(f"--- [LOG]: Petición procesada: {request.path} ---")
-        return response
\ No newline at end of file
+        return response
+
+class ReplicaStickinessMiddleware:
+    """
+    "Lee tus escrituras": si la petición escribe en la primaria, marca al cliente con
+    una cookie durante REPLICA_STICKY_SECONDS. Mientras la cookie exista, sus lecturas
+    no se envían a las réplicas (ver chefquest.db_routers).
+    """
+    COOKIE_NAME = "cq_primaria"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reiniciar_estado()
+        request.forzar_primaria = self.COOKIE_NAME in request.COOKIES
+
+        response = self.get_response(request)
+
+        if hubo_escritura():
+            ventana = getattr(settings, "REPLICA_STICKY_SECONDS", 5)
+            response.set_cookie(self.COOKIE_NAME, "1", max_age=ventana, httponly=True, samesite="Lax")
+        return response
+
+
+
+class CompresionMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware con soporte de brotli: si el cliente acepta 'br' y la librería
+    está instalada se usa brotli; si no, gzip. Solo comprime tipos de texto
+    (las imágenes ya vienen comprimidas).
+
+    Las respuestas que llevan el token CSRF van siempre por gzip: GZipMiddleware
+    añade relleno aleatorio contra BREACH y brotli no tiene dónde ponerlo.
+    """
+    TIPOS_COMPRIMIBLES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+
+    def process_response(self, request, response):
+        tipo = response.get("Content-Type", "")
+        if not tipo.startswith(self.TIPOS_COMPRIMIBLES):
+            return response
+
+        acepta_br = "br" in [
+            parte.split(";")[0].strip() for parte in request.META.get("HTTP_ACCEPT_ENCODING", "").split(",")
+        ]
+        if (
+            brotli is None
+            or not acepta_br
+            or response.streaming
+            or len(response.content) < 200
+            or response.has_header("Content-Encoding")
+            or request.META.get("CSRF_COOKIE_NEEDS_UPDATE")  # get_token() se usó al generar la página
+        ):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        comprimido = brotli.compress(response.content, quality=5)  # calidad media: rápido por petición
+        if len(comprimido) >= len(response.content):
+            return response
+        response.content = comprimido
+        response.headers["Content-Length"] = str(len(comprimido))
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = "br"
+        return response
+
+
+class PerfiladoMiddleware:
+    """
+    Perfila la petición (cProfile, pilas muestreadas y SQL) cuando un superusuario
+    envía un token de perfilado válido. Ver chefquest/perfilado.py.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if peticion_autorizada(request):
+            return perfilar(request, self.get_response)
+        return self.get_response(request)
@@ -0,0 +1,200 @@
+# chefquest/perfilado.py
+"""
+Perfilado bajo demanda de peticiones individuales (solo superusuarios).
+
+Se activa enviando un token firmado (se obtiene en el admin, "Perfiles de peticiones")
+en la cabecera X-Perfil o en el parámetro ?_perfil=. Para esa petición se guarda:
+  - <nombre>.prof:   estadísticas de cProfile (pstats, snakeviz...).
+  - <nombre>.folded: pilas muestreadas en formato "collapsed" (flamegraph.pl, speedscope).
+  - <nombre>.json:   línea temporal de SQL (inicio, duración, base de datos, sentencia).
+y un resumen en staff.PerfilPeticion.
+"""
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.utils import timezone
+
+SALT = "chefquest.perfilado"
+CABECERA = "HTTP_X_PERFIL"
+PARAMETRO = "_perfil"
+VALIDEZ_TOKEN = 60 * 60  # segundos
+
+# cProfile no admite dos perfiles activos a la vez: se perfila una petición cada vez
+_lock = threading.Lock()
+
+
+def get_directorio():
+    return str(getattr(settings, "PERFILADO_DIR", os.path.join(settings.BASE_DIR, "perfiles")))
+
+
+def token_para(usuario):
+    return signing.TimestampSigner(salt=SALT).sign(str(usuario.pk))
+
+
+def peticion_autorizada(request):
+    token = request.META.get(CABECERA) or request.GET.get(PARAMETRO)
+    if not token:
+        return False
+    usuario = getattr(request, "user", None)
+    if not (usuario and usuario.is_authenticated and usuario.is_superuser):
+        return False
+    try:
+        return signing.TimestampSigner(salt=SALT).unsign(token, max_age=VALIDEZ_TOKEN) == str(usuario.pk)
+    except signing.BadSignature:
+        return False
+
+
+# ==============================
+# MUESTREO DE PILAS
+# ==============================
+
+class Muestreador(threading.Thread):
+    """Lee cada `intervalo` segundos la pila del hilo que atiende la petición."""
+
+    def __init__(self, hilo_id, intervalo=0.005):
+        super().__init__(daemon=True)
+        self.hilo_id = hilo_id
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self.hilo_id)
+            pila = []
+            while frame is not None:
+                codigo = frame.f_code
+                pila.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})")
+                frame = frame.f_back
+            if pila:
+                self.pilas[";".join(reversed(pila))] += 1
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+
+    def como_folded(self):
+        return "".join(f"{pila} {n}\n" for pila, n in self.pilas.most_common())
+
+
+# ==============================
+# LÍNEA TEMPORAL DE SQL
+# ==============================
+
+class RegistroSQL:
+    def __init__(self, inicio):
+        self.inicio = inicio
+        self.consultas = []
+
+    def envoltorio(self, alias):
+        def ejecutar(execute, sql, params, many, context):
+            t0 = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                self.consultas.append({
+                    "bd": alias,
+                    "inicio_ms": round((t0 - self.inicio) * 1000, 3),
+                    "duracion_ms": round((time.perf_counter() - t0) * 1000, 3),
+                    "sql": sql,
+                })
+        return ejecutar
+
+
+def _tiempo_plantillas(perfil):
+    """Tiempo acumulado (ms) en el render de plantillas Django, a partir de las estadísticas de cProfile."""
+    perfil.create_stats()
+    total = 0
+    for (fichero, _, funcion), (_, _, _, acumulado, _) in perfil.stats.items():
+        if funcion == "render" and fichero.replace(os.sep, "/").endswith("django/template/backends/django.py"):
+            total += acumulado
+    return round(total * 1000, 3)
+
+
+# ==============================
+# PERFILADO
+# ==============================
+
+def perfilar(request, get_response):
+    if not _lock.acquire(blocking=False):
+        return get_response(request)
+    try:
+        inicio = time.perf_counter()
+        registro = RegistroSQL(inicio)
+        muestreador = Muestreador(threading.get_ident())
+        perfil = cProfile.Profile()
+
+        with ExitStack() as pila:
+            for alias in connections:
+                pila.enter_context(connections[alias].execute_wrapper(registro.envoltorio(alias)))
+            muestreador.start()
+            perfil.enable()
+            try:
+                response = get_response(request)
+                if hasattr(response, "render") and not getattr(response, "is_rendered", True):
+                    response.render()  # TemplateResponse: que el render quede dentro del perfil
+            finally:
+                perfil.disable()
+                muestreador.parar()
+        duracion = time.perf_counter() - inicio
+
+        guardar_perfil(request, response, duracion, perfil, muestreador, registro)
+        return response
+    finally:
+        _lock.release()
+
+
+def guardar_perfil(request, response, duracion, perfil, muestreador, registro):
+    from staff.models import PerfilPeticion
+
+    directorio = get_directorio()
+    os.makedirs(directorio, exist_ok=True)
+    nombre = f"{timezone.now():%Y%m%d-%H%M%S-%f}-{os.getpid()}"
+    ruta = os.path.join(directorio, nombre)
+
+    plantillas_ms = _tiempo_plantillas(perfil)
+    perfil.dump_stats(ruta + ".prof")
+    with open(ruta + ".folded", "w", encoding="utf-8") as f:
+        f.write(muestreador.como_folded())
+    with open(ruta + ".json", "w", encoding="utf-8") as f:
+        json.dump({"ruta": request.get_full_path(), "sql": registro.consultas}, f, indent=1)
+
+    PerfilPeticion.objects.create(
+        nombre=nombre,
+        usuario_id=request.user.pk,
+        metodo=request.method,
+        ruta=request.path[:255],
+        estado=response.status_code,
+        duracion_ms=round(duracion * 1000, 3),
+        consultas=len(registro.consultas),
+        sql_ms=round(sum(c["duracion_ms"] for c in registro.consultas), 3),
+        plantillas_ms=plantillas_ms,
+    )
+    purgar_perfiles()
+
+
+def purgar_perfiles():
+    """Conserva solo los PERFILADO_MAX perfiles más recientes (filas y ficheros)."""
+    from staff.models import PerfilPeticion
+
+    maximo = getattr(settings, "PERFILADO_MAX", 200)
+    antiguos = list(PerfilPeticion.objects.order_by("-creado").values_list("pk", "nombre")[maximo:])
+    if not antiguos:
+        return
+    directorio = get_directorio()
+    for _, nombre in antiguos:
+        for extension in PerfilPeticion.EXTENSIONES:
+            try:
+                os.remove(os.path.join(directorio, nombre + extension))
+            except FileNotFoundError:
+                pass
+    PerfilPeticion.objects.filter(pk__in=[pk for pk, _ in antiguos]).delete()
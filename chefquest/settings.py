@@ -29,13 +29,17 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'chefquest.middleware.CompresionMiddleware',  # gzip/brotli: antes de todo lo que toque el cuerpo
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'chefquest.middleware.PerfiladoMiddleware',  # necesita request.user
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'chefquest.middleware.SimpleLoggerMiddleware', # Agregamos nuestro middleware 
+    'chefquest.middleware.ReplicaStickinessMiddleware',
 ]
 
 
@@ -75,6 +79,23 @@ DATABASES = {
     }
 }
 
+# Réplicas de solo lectura (opcional): DB_REPLICA_HOSTS="replica1,replica2"
+# Cada réplica reutiliza la configuración de 'default' cambiando el host.
+DATABASE_REPLICAS = []
+for i, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    alias = f'replica_{i}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['chefquest.db_routers.ReplicaRouter']
+
+# Segundos que un usuario lee de la primaria tras escribir
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', '5'))
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -92,6 +113,17 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Limitador de intentos de login (chefquest/limitador.py)
+# Cada dimensión: (capacidad, segundos para recargar la cubeta entera)
+LOGIN_THROTTLE = {
+    'BACKEND': os.environ.get('LOGIN_THROTTLE_BACKEND', 'cache'),  # 'cache' (compartido) o 'memoria'
+    'IP': (20, 60),
+    'USUARIO': (5, 300),
+    'EMPRESA': (10, 300),
+    'CONFIAR_X_FORWARDED_FOR': os.environ.get('CONFIAR_X_FORWARDED_FOR', 'False') == 'True',
+}
+
+
 LANGUAGE_CODE = 'en-us'
 
 TIME_ZONE = 'UTC'
@@ -107,9 +139,106 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
 
+# collectstatic genera nombres con hash y variantes .gz/.br en STATIC_ROOT.
+# Con DEBUG=False se sirven desde chefquest.estaticos con caché inmutable.
+STATIC_ROOT = BASE_DIR / "staticfiles"
+
+# El almacén con manifiesto exige haber ejecutado collectstatic (la imagen de Docker lo
+# hace al construirse): sin manifiesto cada {% static %} falla. Por defecto solo con
+# DEBUG=False; en desarrollo y en los tests se usa el almacén normal.
+ESTATICOS_MANIFIESTO = os.environ.get('ESTATICOS_MANIFIESTO', str(not DEBUG)) == 'True'
+
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": (
+            "chefquest.storage.CompressedManifestStaticFilesStorage" if ESTATICOS_MANIFIESTO
+            else "django.contrib.staticfiles.storage.StaticFilesStorage"
+        ),
+    },
+    # Imágenes de productos: originales y miniaturas con nombre = hash del contenido
+    "imagenes": {
+        "BACKEND": "chefquest.storage.AlmacenPorContenido",
+    },
+}
+
+# Ficheros subidos. Se sirven siempre desde chefquest.estaticos.servir_media (caché inmutable)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', str(BASE_DIR / 'media'))
+
+# Imágenes de productos (staff/imagenes.py y `manage.py procesar_imagenes`): anchos de las
+# miniaturas (nunca mayores que el original), tamaño máximo de subida y atributo `sizes`
+IMAGENES_ANCHOS = [int(a) for a in os.environ.get('IMAGENES_ANCHOS', '160,320,640,1024').split(',')]
+IMAGENES_MAX_MB = float(os.environ.get('IMAGENES_MAX_MB', '8'))
+IMAGENES_SIZES = os.environ.get('IMAGENES_SIZES', '(max-width: 700px) 100vw, 50vw')
+
 
 AUTH_USER_MODEL = 'clientes.Usuario'
 
+# Caché compartida entre workers: Redis si hay REDIS_URL; si no, ficheros en CACHE_DIR
+# (sustituto local: lento, pero común a todos los procesos, a diferencia de la de memoria)
+REDIS_URL = os.environ.get('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', str(BASE_DIR / 'cache')),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+# Entradas del primer nivel en memoria de cada proceso (chefquest/cache_niveles.py)
+CACHE_LOCAL_ENTRADAS = int(os.environ.get('CACHE_LOCAL_ENTRADAS', '256'))
+
+# Usuario, permisos y empresa en caché compartida (chefquest/autenticacion.py)
+AUTHENTICATION_BACKENDS = ['chefquest.autenticacion.BackendCacheado']
+AUTH_CACHE_SEGUNDOS = int(os.environ.get('AUTH_CACHE_SEGUNDOS', '300'))
+
+# Perfilado de peticiones bajo demanda (chefquest/perfilado.py)
+PERFILADO_DIR = os.environ.get('PERFILADO_DIR', str(BASE_DIR / 'perfiles'))
+PERFILADO_MAX = int(os.environ.get('PERFILADO_MAX', '200'))
+
+# Exportación columnar de reservas para informes (clientes/columnar.py)
+EXPORTACION_DIR = os.environ.get('EXPORTACION_DIR', str(BASE_DIR / 'exportacion'))
+# Los ids de reservas creadas hace menos de esto pueden tener huecos de transacciones abiertas
+EXPORTACION_MARGEN_SEGUNDOS = int(os.environ.get('EXPORTACION_MARGEN_SEGUNDOS', '60'))
+
+# Segundos que se recuerda una clave de idempotencia (chefquest/idempotencia.py)
+IDEMPOTENCIA_SEGUNDOS = int(os.environ.get('IDEMPOTENCIA_SEGUNDOS', '600'))
+
+# Horas que se conserva un borrador de reserva (clientes/borradores.py)
+BORRADOR_RESERVA_HORAS = int(os.environ.get('BORRADOR_RESERVA_HORAS', '72'))
+
+# Cierre de reservas vencidas (clientes/ciclo.py y `manage.py cerrar_reservas`):
+# horas tras la fecha de la reserva para cancelar las pendientes y entregar las confirmadas
+RESERVAS_CANCELAR_PENDIENTES_HORAS = int(os.environ.get('RESERVAS_CANCELAR_PENDIENTES_HORAS', '0'))
+RESERVAS_ENTREGAR_CONFIRMADAS_HORAS = int(os.environ.get('RESERVAS_ENTREGAR_CONFIRMADAS_HORAS', '3'))
+
+# Arranque en frío (chefquest/arranque.py y `manage.py medir_arranque`)
+ARRANQUE_CALENTAR = os.environ.get('ARRANQUE_CALENTAR', 'True') == 'True'
+ARRANQUE_PRESUPUESTO_MS = int(os.environ.get('ARRANQUE_PRESUPUESTO_MS', '2000'))
+# En los tests (staff.tests.ArranqueTests) el presupuesto se multiplica por este margen:
+# las máquinas de CI compartidas son más lentas y ruidosas que el servidor
+ARRANQUE_MARGEN_TESTS = float(os.environ.get('ARRANQUE_MARGEN_TESTS', '2'))
+
+# Outbox de eventos (staff/outbox.py): antigüedad a partir de la cual un hueco en
+# las posiciones se da por definitivo. Debe superar la transacción más larga.
+OUTBOX_MARGEN_SEGUNDOS = int(os.environ.get('OUTBOX_MARGEN_SEGUNDOS', '10'))
+
+# Microbenchmarks (chefquest/microbench.py y `manage.py microbenchmarks`): referencias
+# de esta máquina (se generan con --guardar, no se suben al repositorio) y porcentaje
+# de empeoramiento que se considera regresión
+MICROBENCH_REFERENCIAS = os.environ.get('MICROBENCH_REFERENCIAS', str(BASE_DIR / 'benchmarks' / 'referencias.json'))
+MICROBENCH_UMBRAL = float(os.environ.get('MICROBENCH_UMBRAL', '25'))
+
+# Planificación de repartos (staff/reparto.py)
+REPARTO_VENTANA_MINUTOS = int(os.environ.get('REPARTO_VENTANA_MINUTOS', '30'))
+REPARTO_VELOCIDAD_KMH = float(os.environ.get('REPARTO_VELOCIDAD_KMH', '20'))
+REPARTO_MINUTOS_PARADA = float(os.environ.get('REPARTO_MINUTOS_PARADA', '3'))
+
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'inicio'
 LOGOUT_REDIRECT_URL = 'inicio'
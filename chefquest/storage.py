@@ -0,0 +1,106 @@
+# chefquest/storage.py
+import gzip
+import hashlib
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage, storages
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se generan las variantes .gz
+    brotli = None
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Nombres con hash (ManifestStaticFilesStorage) y, en el mismo `collectstatic`,
+    variantes precomprimidas .gz y .br de los ficheros de texto.
+    chefquest.estaticos.servir_estatico elige la variante según Accept-Encoding.
+    """
+    EXTENSIONES_COMPRIMIBLES = {".css", ".js", ".json", ".svg", ".html", ".txt", ".xml", ".map", ".ico"}
+    TAMANO_MINIMO = 256  # por debajo de esto la cabecera de compresión no compensa
+
+    def post_process(self, paths, dry_run=False, **options):
+        nombres = {}
+        for nombre, nombre_hash, procesado in super().post_process(paths, dry_run=dry_run, **options):
+            if nombre_hash and not isinstance(procesado, Exception):
+                nombres[nombre] = nombre_hash
+            yield nombre, nombre_hash, procesado
+
+        if dry_run:
+            return
+        for nombre, nombre_hash in nombres.items():
+            self._comprimir(nombre)
+            self._comprimir(nombre_hash)
+
+    def _comprimir(self, nombre):
+        if os.path.splitext(nombre)[1].lower() not in self.EXTENSIONES_COMPRIMIBLES:
+            return
+        ruta = self.path(nombre)
+        if not os.path.isfile(ruta):
+            return
+        with open(ruta, "rb") as f:
+            datos = f.read()
+        if len(datos) < self.TAMANO_MINIMO:
+            return
+
+        # mtime=0: salida determinista, el mismo fichero produce siempre el mismo .gz
+        variantes = {".gz": gzip.compress(datos, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variantes[".br"] = brotli.compress(datos, quality=11)
+
+        for extension, comprimido in variantes.items():
+            if len(comprimido) < len(datos):
+                with open(ruta + extension, "wb") as f:
+                    f.write(comprimido)
+
+
+class AlmacenPorContenido(FileSystemStorage):
+    """
+    Guarda cada imagen con el SHA-256 de su contenido como nombre
+    (`<carpeta>/ab/cdef...<ext>`): subir dos veces la misma imagen no duplica nada
+    y un nombre nunca cambia de contenido, así que se sirve como inmutable
+    (chefquest.estaticos.servir_media). Los ficheros no se borran: otro objeto
+    puede estar usando el mismo.
+
+    La extensión sale de la firma del contenido, nunca del nombre que manda el
+    cliente: un fichero que no empieza como JPEG, PNG o WebP no se guarda.
+    """
+    # (desplazamiento, firma, extensión)
+    FIRMAS = (
+        (0, b"\xff\xd8\xff", ".jpg"),
+        (0, b"\x89PNG\r\n\x1a\n", ".png"),
+        (8, b"WEBP", ".webp"),  # RIFF....WEBP
+    )
+
+    @classmethod
+    def extension_de(cls, cabecera):
+        for desplazamiento, firma, extension in cls.FIRMAS:
+            if cabecera[desplazamiento:desplazamiento + len(firma)] == firma:
+                if extension == ".webp" and not cabecera.startswith(b"RIFF"):
+                    continue
+                return extension
+        raise SuspiciousFileOperation("Solo se guardan imágenes JPEG, PNG o WebP.")
+
+    def save(self, name, content, max_length=None):
+        resumen = hashlib.sha256()
+        cabecera = b""
+        if hasattr(content, "seek"):
+            content.seek(0)
+        for trozo in content.chunks():
+            if not cabecera:
+                cabecera = trozo[:16]
+            resumen.update(trozo)
+        huella = resumen.hexdigest()
+        carpeta, extension = os.path.dirname(name), self.extension_de(cabecera)
+        name = "/".join(filter(None, [carpeta, huella[:2], huella[2:] + extension]))
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+
+def almacen_imagenes():
+    # Función (no instancia) para que el campo no fije el almacén en las migraciones
+    return storages["imagenes"]
@@ -14,10 +14,14 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from clientes.views import inicio, cambiar_tema
 from django.contrib.auth import views as auth_views
+from chefquest.estaticos import servir_estatico, servir_media
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -33,3 +37,14 @@ urlpatterns = [
     path("staff/", include("staff.urls")),
 path("accounts/", include("django.contrib.auth.urls")),
 ]
+
+# Imágenes subidas (también en desarrollo, para probar las cabeceras de caché)
+urlpatterns += [
+    re_path(r"^%s(?P<path>.*)$" % re.escape(settings.MEDIA_URL.lstrip("/")), servir_media),
+]
+
+# En desarrollo runserver sirve los estáticos; en producción los servimos desde STATIC_ROOT
+if not settings.DEBUG:
+    urlpatterns += [
+        re_path(r"^%s(?P<path>.*)$" % re.escape(settings.STATIC_URL.lstrip("/")), servir_estatico),
+    ]
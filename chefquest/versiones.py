@@ -0,0 +1,53 @@
+# chefquest/versiones.py
+"""
+Contadores de versión baratos para respuestas condicionales.
+
+Cada contador guarda el instante (ns) de su último cambio en la caché compartida.
+Las señales de staff y clientes los incrementan; los decoradores de
+chefquest.condicional los leen para calcular ETag/Last-Modified sin tocar
+ningún queryset.
+"""
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db import transaction
+
+CATALOGO = "catalogo"
+TIMEOUT = None  # sin caducidad: si se pierde, se reinicia a "ahora"
+
+
+def clave_empresa(empresa_id):
+    return f"empresa:{empresa_id}"
+
+
+def _clave(nombre):
+    return f"version:{nombre}"
+
+
+def incrementar(*nombres):
+    ahora = time.time_ns()
+    cache.set_many({_clave(n): ahora for n in nombres}, timeout=TIMEOUT)
+
+
+def leer(*nombres):
+    """Devuelve {nombre: version}. Los contadores ausentes se inicializan a ahora."""
+    claves = {_clave(n): n for n in nombres}
+    encontrados = cache.get_many(list(claves))
+    faltan = [c for c in claves if c not in encontrados]
+    if faltan:
+        ahora = time.time_ns()
+        for clave in faltan:
+            # add(): si otro proceso lo ha creado entretanto, nos quedamos con el suyo
+            cache.add(clave, ahora, timeout=TIMEOUT)
+        encontrados.update(cache.get_many(faltan))
+    return {claves[c]: v for c, v in encontrados.items()}
+
+
+def como_fecha(version):
+    return datetime.fromtimestamp(version / 1e9, tz=dt_timezone.utc)
+
+
+def incrementar_al_confirmar(*nombres):
+    """Incrementa tras el commit, para que nadie cachee una versión con datos aún sin confirmar."""
+    transaction.on_commit(lambda: incrementar(*nombres))
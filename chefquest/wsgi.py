@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chefquest.settings')
 
 application = get_wsgi_application()
+
+# URLs, plantillas y estáticos listos antes de la primera petición
+from chefquest.arranque import calentar  # noqa: E402
+
+calentar()
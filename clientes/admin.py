@@ -1,6 +1,8 @@
+from django import forms
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Usuario,Usuario_Perfil,Reserva_Pedido
+from chefquest.concurrencia import VersionadoAdminMixin, VersionFormMixin
+from .models import Usuario,Usuario_Perfil,Reserva_Pedido,Reserva_Archivada,Borrador_Reserva
 
 # Register your models here.
 """
@@ -71,16 +73,60 @@ class UsuarioPerfilAdmin(admin.ModelAdmin):
 # -----------------------------
 # Admin para Reserva_Pedido
 # -----------------------------
+class ReservaPedidoAdminForm(VersionFormMixin, forms.ModelForm):
+    # Declarado para que el admin lo incluya (oculto) en el formulario
+    version = forms.IntegerField(required=False, widget=forms.HiddenInput)
+
+    class Meta:
+        model = Reserva_Pedido
+        exclude = ("version",)
+
+
 @admin.register(Reserva_Pedido)
-class ReservaPedidoAdmin(admin.ModelAdmin):
+class ReservaPedidoAdmin(VersionadoAdminMixin, admin.ModelAdmin):
+    form = ReservaPedidoAdminForm
     list_display = (
         "tipo",
         "cliente",
         "fecha",
         "estado",
-        "comensales"
+        "comensales",
+        "empresa",
+        "version",
     )
-    list_filter = ("tipo", "estado")
+    list_filter = ("tipo", "estado", "empresa")
     search_fields = ("cliente__username", "empresa__nombre_comercial", "direccion", "notas")
     ordering = ("-fecha",)
-    filter_horizontal = ("productos",)  # Mejor UI para seleccionar múltiples productos
\ No newline at end of file
+    list_select_related = ("cliente", "empresa")
+    filter_horizontal = ("productos",)  # Mejor UI para seleccionar múltiples productos
+
+# -----------------------------
+# Admin para Reserva_Archivada (solo lectura, para informes)
+# -----------------------------
+@admin.register(Reserva_Archivada)
+class ReservaArchivadaAdmin(admin.ModelAdmin):
+    list_display = ("id", "tipo", "fecha", "estado", "comensales", "empresa_id")
+    list_filter = ("tipo", "estado")
+    date_hierarchy = "fecha"
+    ordering = ("-fecha",)
+    show_full_result_count = False  # evita COUNT(*) sobre todo el histórico
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# -----------------------------
+# Admin para Borrador_Reserva (consulta y limpieza manual)
+# -----------------------------
+@admin.register(Borrador_Reserva)
+class BorradorReservaAdmin(admin.ModelAdmin):
+    list_display = ("usuario", "actualizado", "caduca")
+    list_select_related = ("usuario",)
+    ordering = ("caduca",)
+    readonly_fields = ("usuario", "datos", "actualizado", "caduca")
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,71 @@
+# clientes/borradores.py
+"""
+Borradores de reservas (Borrador_Reserva).
+
+El formulario de nueva reserva se autoguarda en segundo plano en una fila por
+usuario con caducidad, en lugar de guardarse en la sesión: la sesión no crece
+ni se reescribe con cada intento.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .forms import ReservaPedidoForm
+from .models import Borrador_Reserva
+
+# Límite por campo: un borrador es un formulario, no un almacén de texto libre
+MAX_LONGITUD = 2000
+MAX_PRODUCTOS = 100
+
+
+def get_ttl():
+    return timedelta(hours=getattr(settings, "BORRADOR_RESERVA_HORAS", 72))
+
+
+def datos_de_post(post):
+    """Solo los campos del formulario con valor, recortados."""
+    datos = {}
+    for campo in ReservaPedidoForm.Meta.fields:
+        if campo == "productos":
+            ids = [p for p in post.getlist("productos") if p.isdigit()][:MAX_PRODUCTOS]
+            if ids:
+                datos["productos"] = ids
+            continue
+        valor = (post.get(campo) or "").strip()
+        if valor:
+            datos[campo] = valor[:MAX_LONGITUD]
+    return datos
+
+
+def guardar_borrador(usuario, datos):
+    """Guarda (o borra, si no queda nada) el borrador del usuario. Una sola sentencia de escritura."""
+    if not datos:
+        borrar_borrador(usuario)
+        return None
+    borrador, _ = Borrador_Reserva.objects.update_or_create(
+        usuario=usuario,
+        defaults={"datos": datos, "caduca": timezone.now() + get_ttl()},
+    )
+    return borrador
+
+
+def leer_borrador(usuario):
+    """Datos del borrador vigente del usuario o {}."""
+    datos = (
+        Borrador_Reserva.objects
+        .filter(usuario=usuario, caduca__gt=timezone.now())
+        .values_list("datos", flat=True)
+        .first()
+    )
+    return datos or {}
+
+
+def borrar_borrador(usuario):
+    Borrador_Reserva.objects.filter(usuario=usuario).delete()
+
+
+def purgar_borradores(ahora=None):
+    """Borra los borradores caducados. Devuelve cuántos."""
+    borrados, _ = Borrador_Reserva.objects.filter(caduca__lte=ahora or timezone.now()).delete()
+    return borrados
@@ -0,0 +1,98 @@
+# clientes/ciclo.py
+"""
+Ciclo de vida de las reservas vencidas (comando `cerrar_reservas`).
+
+Sin esto una reserva se queda PENDIENTE o CONFIRMADO para siempre aunque su
+fecha haya pasado. Cada regla cambia el estado de las reservas con fecha anterior
+a un corte:
+  - cancelar: PENDIENTE -> CANCELADO. No hay stock que devolver: el stock solo se
+    resta al confirmar (staff.views.confirmar_reserva).
+  - entregar: CONFIRMADO -> ENTREGADO.
+
+Se procesa por lotes con UPDATEs por conjuntos de ids, cada lote en su propia
+transacción corta: bloquea las filas del lote (saltando las que tenga bloqueadas
+otra transacción), las actualiza subiendo la versión (los formularios abiertos
+verán el conflicto) y escribe sus eventos en la outbox. Las reservas actualizadas
+dejan de cumplir la condición, así que cada lote vuelve a leer desde el principio
+del índice parcial de reservas abiertas por fecha.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from chefquest import versiones
+from staff.models import EventoOutbox
+from staff.outbox import nuevo_evento
+from .models import Reserva_Pedido
+from .utils import TAMANO_LOTE
+
+# nombre: (estado actual, estado nuevo, ajuste con las horas tras la fecha)
+REGLAS = {
+    "cancelar": ("PENDIENTE", "CANCELADO", "RESERVAS_CANCELAR_PENDIENTES_HORAS"),
+    "entregar": ("CONFIRMADO", "ENTREGADO", "RESERVAS_ENTREGAR_CONFIRMADAS_HORAS"),
+}
+CAMPOS = ("pk", "tipo", "fecha", "comensales", "cliente_id", "empresa_id", "version")
+
+
+def corte_de_regla(nombre, horas=None, ahora=None):
+    """Fecha límite de la regla: reservas con fecha anterior a ahora - horas."""
+    if horas is None:
+        horas = getattr(settings, REGLAS[nombre][2])
+    return (ahora or timezone.now()) - timedelta(hours=max(horas, 0))
+
+
+def reservas_vencidas(nombre, antes_de):
+    return Reserva_Pedido.objects.filter(estado=REGLAS[nombre][0], fecha__lt=antes_de)
+
+
+def _eventos(filas, estado, nuevo_estado):
+    # Los mismos eventos que un save() normal (Reserva_Pedido.eventos_al_guardar)
+    eventos = []
+    for pk, tipo, fecha, comensales, cliente_id, empresa_id, version in filas:
+        reserva = Reserva_Pedido(
+            pk=pk, tipo=tipo, fecha=fecha, comensales=comensales, estado=nuevo_estado,
+            cliente_id=cliente_id, empresa_id=empresa_id, version=version + 1,
+        )
+        eventos.extend(
+            nuevo_evento(tipo_evento, reserva, datos)
+            for tipo_evento, datos in reserva.eventos_al_guardar(False, {"estado": (estado, nuevo_estado)})
+        )
+    return eventos
+
+
+def aplicar_regla(nombre, antes_de, tamano=TAMANO_LOTE, pausa=0):
+    """
+    Aplica la regla `nombre` a las reservas con fecha anterior a `antes_de`, en
+    lotes de `tamano` con una transacción por lote y `pausa` segundos entre lotes.
+    Devuelve el número de reservas actualizadas.
+    """
+    estado, nuevo_estado, _ = REGLAS[nombre]
+    actualizadas = 0
+    while True:
+        with transaction.atomic():
+            filas = list(
+                reservas_vencidas(nombre, antes_de)
+                .order_by("fecha")
+                .select_for_update(skip_locked=True)
+                .values_list(*CAMPOS)[:tamano]
+            )
+            if not filas:
+                break
+            ids = [fila[0] for fila in filas]
+            hechas = Reserva_Pedido.objects.filter(pk__in=ids).update(
+                estado=nuevo_estado, version=F("version") + 1
+            )
+            EventoOutbox.objects.bulk_create(_eventos(filas, estado, nuevo_estado))
+            empresas = {fila[5] for fila in filas if fila[5]}
+            if empresas:
+                versiones.incrementar_al_confirmar(*(versiones.clave_empresa(e) for e in empresas))
+        actualizadas += hechas
+        if hechas < tamano:
+            break
+        if pausa:
+            time.sleep(pausa)
+    return actualizadas
@@ -0,0 +1,326 @@
+# clientes/columnar.py
+"""
+Exportación columnar de reservas para informes fuera de línea (multiempresa).
+
+Cada noche `exportar_columnas` escribe ficheros .npy (una columna por fichero) que
+los procesos de informes abren con mmap: varios procesos comparten las mismas
+páginas sin copiar ni volver a recorrer Reserva_Pedido.
+
+Estructura en EXPORTACION_DIR:
+    segmentos/<n>/            columnas de un tramo de reservas (inmutable)
+        id.npy fecha.npy estado.npy tipo.npy cliente.npy empresa.npy comensales.npy
+        enlaces_inicio.npy    (n+1) posición de los productos de cada reserva (CSR)
+        enlaces_producto.npy  ids de producto de todas las reservas del segmento
+    manifiesto-<version>.json segmentos que forman la versión, último id exportado...
+    ACTUAL                    nombre del manifiesto vigente (se cambia con os.replace)
+
+La exportación diaria añade un segmento con las reservas nuevas (id mayor que el
+último exportado); las versiones anteriores siguen siendo válidas para quien las
+tenga abiertas. Los cambios de estado de reservas ya exportadas solo se recogen
+en una exportación completa (--completo), que además compacta en un segmento.
+
+Se leen las dos tablas: Reserva_Pedido y las reservas ya archivadas
+(Reserva_Archivada, mismo id), así que el histórico no se pierde al archivar.
+Un id se reserva al insertar pero la fila no se ve hasta el commit: como en
+staff.outbox.frontera(), la exportación no pasa del primer hueco en los ids de
+reservas creadas hace menos de EXPORTACION_MARGEN_SEGUNDOS.
+
+Uso en un informe:
+    exp = abrir_exportacion()
+    pedidos_por_cliente = np.bincount(exp.columna("cliente")[exp.columna("cliente") >= 0])
+"""
+import heapq
+import json
+import os
+import shutil
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Reserva_Archivada, Reserva_Pedido
+
+TAMANO_LOTE = 50000
+SIN_VALOR = -1  # cliente/empresa nulos
+
+TIPOS = [clave for clave, _ in Reserva_Pedido.TIPO_CHOICES]
+ESTADOS = [clave for clave, _ in Reserva_Pedido.ESTADOS_CHOICES]
+
+COLUMNAS = {
+    "id": np.int64,
+    "fecha": np.int64,  # segundos desde epoch (UTC)
+    "estado": np.int8,  # índice en ESTADOS
+    "tipo": np.int8,  # índice en TIPOS
+    "cliente": np.int64,
+    "empresa": np.int64,
+    "comensales": np.int32,
+}
+
+
+def get_directorio():
+    return str(getattr(settings, "EXPORTACION_DIR", os.path.join(settings.BASE_DIR, "exportacion")))
+
+
+def _margen():
+    return timedelta(seconds=getattr(settings, "EXPORTACION_MARGEN_SEGUNDOS", 60))
+
+
+def frontera(desde_id=0):
+    """
+    Último id exportable a partir de `desde_id` (ya exportado) sin saltarse
+    reservas que aún no se ven. Los huecos anteriores a la última reserva creada
+    hace más del margen son definitivos (rollbacks, borrados); los posteriores
+    pueden ser transacciones abiertas.
+    """
+    corte = timezone.now() - _margen()
+    base = (
+        Reserva_Pedido.objects.filter(pk__gt=desde_id, creada__lte=corte)
+        .order_by("-pk").values_list("pk", flat=True).first()
+    ) or desde_id
+    # Primero la tabla caliente: una reserva que se archiva entretanto aparece en la fría
+    recientes = set(Reserva_Pedido.objects.filter(pk__gt=base).values_list("pk", flat=True))
+    recientes.update(Reserva_Archivada.objects.filter(pk__gt=base).values_list("pk", flat=True))
+    for pk in sorted(recientes):
+        if pk != base + 1:
+            break
+        base = pk
+    return base
+
+
+# ==============================
+# ESCRITURA
+# ==============================
+
+def _filas(desde_id, hasta_id):
+    """
+    Reservas con desde_id < id <= hasta_id de las dos tablas, ordenadas por id.
+    Cada fila: (id, fecha, estado, tipo, cliente, empresa, comensales, productos);
+    productos es la lista de ids de las archivadas y None en las de Reserva_Pedido.
+    """
+    campos = ("pk", "fecha", "estado", "tipo", "cliente_id", "empresa_id", "comensales")
+    calientes = (
+        fila + (None,)
+        for fila in Reserva_Pedido.objects.filter(pk__gt=desde_id, pk__lte=hasta_id)
+        .order_by("pk").values_list(*campos).iterator(chunk_size=TAMANO_LOTE)
+    )
+    archivadas = (
+        Reserva_Archivada.objects.filter(pk__gt=desde_id, pk__lte=hasta_id)
+        .order_by("pk").values_list(*campos, "productos_ids").iterator(chunk_size=TAMANO_LOTE)
+    )
+    anterior = None
+    # En un empate (archivada mientras se leía) merge da primero la caliente: gana la archivada
+    for fila in heapq.merge(calientes, archivadas, key=lambda f: f[0]):
+        if anterior is not None and anterior[0] != fila[0]:
+            yield anterior
+        anterior = fila
+    if anterior is not None:
+        yield anterior
+
+
+def _escribir_segmento(directorio, desde_id, hasta_id):
+    """Escribe en `directorio` las reservas con desde_id < id <= hasta_id. Devuelve el número de filas."""
+    total = (
+        Reserva_Pedido.objects.filter(pk__gt=desde_id, pk__lte=hasta_id).count()
+        + Reserva_Archivada.objects.filter(pk__gt=desde_id, pk__lte=hasta_id).count()
+    )
+    os.makedirs(directorio)
+    columnas = {
+        nombre: np.lib.format.open_memmap(os.path.join(directorio, f"{nombre}.npy"), mode="w+", dtype=dtype, shape=(total,))
+        for nombre, dtype in COLUMNAS.items()
+    }
+
+    escritas = 0
+    lote = []
+    enlaces_archivadas = []  # (reserva, producto) de las archivadas, que los guardan en la fila
+    for fila in _filas(desde_id, hasta_id):
+        lote.append(fila)
+        if fila[7] is not None:
+            enlaces_archivadas.extend((fila[0], p) for p in fila[7])
+        if len(lote) >= TAMANO_LOTE:
+            escritas = _escribir_lote(columnas, escritas, lote[:total - escritas])
+            lote = []
+    if lote:
+        escritas = _escribir_lote(columnas, escritas, lote[:total - escritas])
+
+    for nombre in COLUMNAS:
+        columnas[nombre].flush()
+        if escritas < total:
+            # Reservas borradas durante la exportación o leídas en las dos tablas: se recorta la columna
+            recortada = np.array(columnas[nombre][:escritas])
+            ruta = os.path.join(directorio, f"{nombre}.npy")
+            np.save(ruta + ".tmp.npy", recortada)
+            os.replace(ruta + ".tmp.npy", ruta)
+    ids = np.load(os.path.join(directorio, "id.npy"), mmap_mode="r")
+
+    # Productos de cada reserva en formato CSR, ordenados por reserva
+    Enlace = Reserva_Pedido.productos.through
+    enlaces = np.fromiter(
+        Enlace.objects
+        .filter(reserva_pedido_id__gt=desde_id, reserva_pedido_id__lte=hasta_id)
+        .order_by("reserva_pedido_id", "producto_id")
+        .values_list("reserva_pedido_id", "producto_id")
+        .iterator(chunk_size=TAMANO_LOTE),
+        dtype=np.dtype((np.int64, 2)),
+    ).reshape(-1, 2)
+    archivadas = np.array(enlaces_archivadas, dtype=np.int64).reshape(-1, 2)
+    # Los de la tabla caliente de reservas que se exportaron ya archivadas sobran
+    enlaces = enlaces[~np.isin(enlaces[:, 0], archivadas[:, 0])]
+    enlaces = np.concatenate([enlaces, archivadas])
+    enlaces = enlaces[np.lexsort((enlaces[:, 1], enlaces[:, 0]))]
+    # Los enlaces de reservas que no llegaron al segmento (borradas entretanto) se descartan
+    enlaces = enlaces[np.isin(enlaces[:, 0], ids)]
+    inicio = np.searchsorted(enlaces[:, 0], ids, side="left")
+    np.save(os.path.join(directorio, "enlaces_inicio.npy"), np.append(inicio, len(enlaces)).astype(np.int64))
+    np.save(os.path.join(directorio, "enlaces_producto.npy"), np.ascontiguousarray(enlaces[:, 1]))
+    return escritas
+
+
+def _escribir_lote(columnas, posicion, lote):
+    """Copia un lote de filas en las columnas a partir de `posicion`. Devuelve la nueva posición."""
+    codigo_tipo = {t: i for i, t in enumerate(TIPOS)}
+    codigo_estado = {e: i for i, e in enumerate(ESTADOS)}
+    n = len(lote)
+    tramo = slice(posicion, posicion + n)
+    columnas["id"][tramo] = np.fromiter((f[0] for f in lote), dtype=np.int64, count=n)
+    columnas["fecha"][tramo] = np.fromiter((f[1].timestamp() for f in lote), dtype=np.int64, count=n)
+    columnas["estado"][tramo] = np.fromiter((codigo_estado.get(f[2], SIN_VALOR) for f in lote), dtype=np.int8, count=n)
+    columnas["tipo"][tramo] = np.fromiter((codigo_tipo.get(f[3], SIN_VALOR) for f in lote), dtype=np.int8, count=n)
+    columnas["cliente"][tramo] = np.fromiter((SIN_VALOR if f[4] is None else f[4] for f in lote), dtype=np.int64, count=n)
+    columnas["empresa"][tramo] = np.fromiter((SIN_VALOR if f[5] is None else f[5] for f in lote), dtype=np.int64, count=n)
+    columnas["comensales"][tramo] = np.fromiter((f[6] for f in lote), dtype=np.int32, count=n)
+    return posicion + n
+
+
+def _manifiesto_actual(base):
+    try:
+        with open(os.path.join(base, "ACTUAL"), encoding="utf-8") as f:
+            nombre = f.read().strip()
+        with open(os.path.join(base, nombre), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _publicar(base, manifiesto):
+    nombre = f"manifiesto-{manifiesto['version']:06d}.json"
+    temporal = os.path.join(base, f".{nombre}.tmp")
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, indent=1)
+    os.replace(temporal, os.path.join(base, nombre))
+    temporal = os.path.join(base, ".ACTUAL.tmp")
+    with open(temporal, "w", encoding="utf-8") as f:
+        f.write(nombre)
+    os.replace(temporal, os.path.join(base, "ACTUAL"))
+
+
+def exportar_columnas(completo=False, conservar=3):
+    """
+    Exporta las reservas nuevas como un segmento más (o todas, con completo=True)
+    y publica una versión nueva. Devuelve el manifiesto publicado.
+    """
+    base = get_directorio()
+    os.makedirs(os.path.join(base, "segmentos"), exist_ok=True)
+    anterior = _manifiesto_actual(base)
+    if anterior is None:
+        completo = True
+
+    # Lo ya exportado es seguro; a partir de ahí, hasta el primer hueco reciente
+    hasta_id = frontera(anterior["ultimo_id"] if anterior else 0)
+    desde_id = 0 if completo else anterior["ultimo_id"]
+    segmentos = [] if completo else list(anterior["segmentos"])
+    filas = 0 if completo else anterior["filas"]
+    version = (anterior["version"] + 1) if anterior else 1
+
+    if hasta_id > desde_id:
+        nombre = f"{version:06d}"
+        temporal = os.path.join(base, "segmentos", f".{nombre}.tmp")
+        shutil.rmtree(temporal, ignore_errors=True)
+        nuevas = _escribir_segmento(temporal, desde_id, hasta_id)
+        os.replace(temporal, os.path.join(base, "segmentos", nombre))
+        segmentos.append({"nombre": nombre, "filas": nuevas, "desde_id": desde_id, "hasta_id": hasta_id})
+        filas += nuevas
+
+    manifiesto = {
+        "version": version,
+        "creado": timezone.now().isoformat(),
+        "ultimo_id": max(hasta_id, desde_id),
+        "filas": filas,
+        "segmentos": segmentos,
+        "estados": ESTADOS,
+        "tipos": TIPOS,
+        "columnas": {n: np.dtype(d).name for n, d in COLUMNAS.items()},
+    }
+    _publicar(base, manifiesto)
+    limpiar_versiones(base, conservar)
+    return manifiesto
+
+
+def limpiar_versiones(base, conservar):
+    """Borra los manifiestos más antiguos y los segmentos que ya no usa ninguno de los restantes."""
+    manifiestos = sorted(n for n in os.listdir(base) if n.startswith("manifiesto-") and n.endswith(".json"))
+    for nombre in manifiestos[:-conservar]:
+        os.remove(os.path.join(base, nombre))
+    en_uso = set()
+    for nombre in manifiestos[-conservar:]:
+        with open(os.path.join(base, nombre), encoding="utf-8") as f:
+            en_uso.update(s["nombre"] for s in json.load(f)["segmentos"])
+    directorio = os.path.join(base, "segmentos")
+    for nombre in os.listdir(directorio):
+        if nombre not in en_uso and not nombre.startswith("."):
+            # Los procesos que aún lo tengan en mmap conservan las páginas hasta cerrarlo
+            shutil.rmtree(os.path.join(directorio, nombre))
+
+
+# ==============================
+# LECTURA (informes)
+# ==============================
+
+class Exportacion:
+    """Versión publicada de la exportación, con las columnas abiertas en mmap (solo lectura)."""
+
+    def __init__(self, base, manifiesto):
+        self.manifiesto = manifiesto
+        self.estados = manifiesto["estados"]
+        self.tipos = manifiesto["tipos"]
+        self.segmentos = [
+            {
+                nombre: np.load(os.path.join(base, "segmentos", s["nombre"], f"{nombre}.npy"), mmap_mode="r")
+                for nombre in (*COLUMNAS, "enlaces_inicio", "enlaces_producto")
+            }
+            for s in manifiesto["segmentos"]
+        ]
+
+    def __len__(self):
+        return self.manifiesto["filas"]
+
+    def columna(self, nombre):
+        """Columna completa. Con un solo segmento es el propio mmap; con varios se concatena (copia)."""
+        partes = [s[nombre] for s in self.segmentos]
+        if not partes:
+            return np.empty(0, dtype=COLUMNAS[nombre])
+        return partes[0] if len(partes) == 1 else np.concatenate(partes)
+
+    def enlaces(self):
+        """(posición de la reserva en las columnas, producto_id) de todos los productos pedidos."""
+        reservas, productos = [], []
+        desplazamiento = 0
+        for s in self.segmentos:
+            repeticiones = np.diff(s["enlaces_inicio"])
+            reservas.append(np.repeat(np.arange(desplazamiento, desplazamiento + len(repeticiones)), repeticiones))
+            productos.append(s["enlaces_producto"])
+            desplazamiento += len(repeticiones)
+        if not reservas:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(reservas), np.concatenate(productos)
+
+    def codigo_estado(self, estado):
+        return self.estados.index(estado)
+
+
+def abrir_exportacion(base=None):
+    base = base or get_directorio()
+    manifiesto = _manifiesto_actual(base)
+    if manifiesto is None:
+        raise FileNotFoundError(f"No hay ninguna exportación publicada en {base}.")
+    return Exportacion(base, manifiesto)
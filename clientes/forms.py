@@ -5,14 +5,13 @@ from django.contrib.auth.forms import UserCreationForm
 from django.core.exceptions import ValidationError
 from datetime import timedelta
 from django.contrib.auth import authenticate
-from django.db import transaction
-from django.contrib.auth.models import Group
 from django.contrib.auth import get_user_model
-from django.utils.crypto import get_random_string
 
 from .models import Usuario, Usuario_Perfil, Reserva_Pedido
 from staff.models import Producto, Empresa
 from staff.forms import EmpresaRegistroForm
+from .registro import registrar_usuario
+from chefquest.concurrencia import VersionFormMixin
 
 
 User = get_user_model()
@@ -54,39 +53,16 @@ class UsuarioRegistroForm(UserCreationForm):
 
         return cleaned_data
 
-    def _generar_codigo_unico(self):
-        # Generador seguro de código numérico de 8 dígitos (ajusta longitud si lo deseas)
-        for _ in range(10):
-            codigo = get_random_string(8, allowed_chars='0123456789')
-            if not Empresa.objects.filter(codigo=codigo).exists():
-                return codigo
-        raise ValidationError("No se pudo generar un código de empresa. Intenta de nuevo.")
-
-    @transaction.atomic
     def save(self, commit=True):
         """
-        Guarda únicamente el usuario y asigna grupos/flags.
-        La creación del perfil y de la empresa debe hacerse desde la vista
-        (UsuarioCreateView) para evitar duplicados en la relación OneToOne.
+        Con commit=True guarda el usuario y su grupo mediante clientes.registro.
+        La vista de registro usa commit=False y crea perfil y empresa en la misma
+        llamada al servicio, para evitar guardados repetidos.
         """
         user = super().save(commit=False)
         user.email = self.cleaned_data.get("email")
         if commit:
-            user.save()
-
-            # asignar grupo y flags
-            try:
-                if self.cleaned_data.get("es_empresa"):
-                    grupo = Group.objects.get(name="Empresas")
-                    user.groups.add(grupo)
-                    user.is_staff = True
-                else:
-                    grupo = Group.objects.get(name="Usuarios")
-                    user.groups.add(grupo)
-            except Group.DoesNotExist:
-                pass
-            user.save()
-
+            registrar_usuario(user, es_empresa=bool(self.cleaned_data.get("es_empresa")))
         return user
 
 
@@ -100,7 +76,7 @@ class UsuarioPerfilForm(forms.ModelForm):
         ]
 
 
-class ReservaPedidoForm(forms.ModelForm):
+class ReservaPedidoForm(VersionFormMixin, forms.ModelForm):
     class Meta:
         model = Reserva_Pedido
         fields = [
@@ -201,8 +177,11 @@ class LoginEmpresaForm(forms.Form):
         if not username:
             raise ValidationError("Usuario requerido.")
 
-        # Primero intentar autenticar por contraseña (flujo normal)
-        user = authenticate(username=username, password=password)
+        # Primero intentar autenticar por contraseña (flujo normal). El backend
+        # limita los intentos por IP, usuario y código antes de calcular el hash
+        user = authenticate(self.request, username=username, password=password, codigo_empresa=codigo or None)
+        if getattr(self.request, "login_limitado", None):
+            raise ValidationError("Demasiados intentos de inicio de sesión. Espera unos minutos y vuelve a intentarlo.")
         if not user:
             # Si no se autentica por contraseña, dar error genérico
             raise ValidationError("Credenciales incorrectas.")
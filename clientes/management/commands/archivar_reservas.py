@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from clientes.models import Reserva_Pedido, Reserva_Archivada
+from clientes.particiones import desconectar_particiones, sumar_meses
+from clientes.utils import TAMANO_LOTE, archivar_reservas
+
+
+class Command(BaseCommand):
+    help = "Mueve las reservas terminadas antiguas a la tabla de reservas archivadas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--meses", type=int, default=1,
+                            help="Archiva las reservas ENTREGADO/CANCELADO de hace más de N meses.")
+        parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Reservas por transacción.")
+        parser.add_argument("--desconectar", type=int, default=None, metavar="MESES",
+                            help="Desconecta las particiones archivadas de hace más de MESES meses (PostgreSQL).")
+
+    def handle(self, *args, **options):
+        ahora = timezone.now()
+        antes_de = ahora - timedelta(days=30 * options["meses"])
+
+        movidas = archivar_reservas(Reserva_Pedido, Reserva_Archivada, antes_de, tamano=options["lote"])
+        self.stdout.write(self.style.SUCCESS(f"{movidas} reservas archivadas (anteriores a {antes_de:%d/%m/%Y})."))
+
+        if options["desconectar"] is not None:
+            limite = sumar_meses(ahora.date(), -options["desconectar"])
+            for nombre in desconectar_particiones(limite):
+                self.stdout.write(f"Desconectada {nombre}")
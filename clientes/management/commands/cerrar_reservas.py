@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from clientes.ciclo import REGLAS, aplicar_regla, corte_de_regla, reservas_vencidas
+from clientes.utils import TAMANO_LOTE
+
+
+class Command(BaseCommand):
+    help = (
+        "Cierra las reservas vencidas: cancela las PENDIENTE y marca como ENTREGADO las "
+        "CONFIRMADO cuya fecha pasó hace más de las horas configuradas. Pensado para un cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--regla", action="append", choices=sorted(REGLAS),
+                            help="Reglas a aplicar (repetible). Por defecto, todas.")
+        parser.add_argument("--horas-pendientes", type=int, default=None,
+                            help="Cancela las PENDIENTE de hace más de N horas (RESERVAS_CANCELAR_PENDIENTES_HORAS).")
+        parser.add_argument("--horas-confirmadas", type=int, default=None,
+                            help="Entrega las CONFIRMADO de hace más de N horas (RESERVAS_ENTREGAR_CONFIRMADAS_HORAS).")
+        parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Reservas por transacción.")
+        parser.add_argument("--pausa", type=float, default=0, help="Segundos de espera entre lotes.")
+        parser.add_argument("--simular", action="store_true", help="Solo cuenta las reservas afectadas.")
+
+    def handle(self, *args, **options):
+        horas = {"cancelar": options["horas_pendientes"], "entregar": options["horas_confirmadas"]}
+        for nombre in options["regla"] or REGLAS:
+            estado, nuevo_estado, _ = REGLAS[nombre]
+            antes_de = corte_de_regla(nombre, horas[nombre])
+            if options["simular"]:
+                total = reservas_vencidas(nombre, antes_de).count()
+                self.stdout.write(f"{nombre}: {total} reservas {estado} pasarían a {nuevo_estado}.")
+                continue
+            total = aplicar_regla(nombre, antes_de, tamano=max(options["lote"], 1), pausa=options["pausa"])
+            self.stdout.write(self.style.SUCCESS(
+                f"{nombre}: {total} reservas {estado} -> {nuevo_estado} (fecha anterior a {antes_de:%d/%m/%Y %H:%M})."
+            ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from clientes.models import Reserva_Pedido
+from clientes.utils import TAMANO_LOTE, comprobar_empresa_reservas
+
+
+class Command(BaseCommand):
+    help = "Comprueba que Reserva_Pedido.empresa coincide con la empresa de sus productos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reparar", action="store_true", help="Corrige las reservas inconsistentes.")
+        parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Reservas por lote.")
+
+    def handle(self, *args, **options):
+        inconsistencias = comprobar_empresa_reservas(Reserva_Pedido, tamano=options["lote"])
+
+        for reserva_id, guardada, esperada in inconsistencias[:50]:
+            self.stdout.write(f"Reserva {reserva_id}: empresa={guardada} esperada={esperada}")
+        if len(inconsistencias) > 50:
+            self.stdout.write(f"... y {len(inconsistencias) - 50} más")
+
+        if not inconsistencias:
+            self.stdout.write(self.style.SUCCESS("Todas las reservas son consistentes."))
+            return
+
+        if options["reparar"]:
+            por_empresa = {}
+            for reserva_id, _, esperada in inconsistencias:
+                por_empresa.setdefault(esperada, []).append(reserva_id)
+            for empresa_id, ids in por_empresa.items():
+                Reserva_Pedido.objects.filter(pk__in=ids).update(empresa_id=empresa_id)
+            self.stdout.write(self.style.SUCCESS(f"{len(inconsistencias)} reservas corregidas."))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"{len(inconsistencias)} reservas inconsistentes. Usa --reparar para corregirlas."
+            ))
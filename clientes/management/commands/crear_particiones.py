@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from clientes.particiones import crear_particiones, es_postgresql, sumar_meses
+
+
+class Command(BaseCommand):
+    help = "Crea las particiones mensuales futuras de las reservas archivadas (solo PostgreSQL)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--meses", type=int, default=3, help="Meses a crear a partir del actual.")
+        parser.add_argument("--atras", type=int, default=0, help="Meses anteriores al actual a crear también.")
+
+    def handle(self, *args, **options):
+        if not es_postgresql():
+            self.stdout.write(self.style.WARNING("El particionado solo está disponible en PostgreSQL."))
+            return
+
+        desde = sumar_meses(timezone.now().date(), -options["atras"])
+        creadas = crear_particiones(desde, options["atras"] + options["meses"])
+        for nombre in creadas:
+            self.stdout.write(f"Creada {nombre}")
+        self.stdout.write(self.style.SUCCESS(f"{len(creadas)} particiones creadas."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.urls import get_resolver
+
+from chefquest.idempotencia import estadisticas
+
+
+class Command(BaseCommand):
+    help = "Muestra cuántas peticiones duplicadas (dobles envíos, reintentos) se han absorbido, por vista."
+
+    def handle(self, *args, **options):
+        get_resolver().url_patterns  # importa las vistas: registran sus nombres al decorarse
+        for vista, total in estadisticas().items():
+            self.stdout.write(f"{vista}: {total} duplicados absorbidos")
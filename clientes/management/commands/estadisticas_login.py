@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from chefquest.limitador import estadisticas, get_config
+
+
+class Command(BaseCommand):
+    help = "Muestra los intentos de login rechazados por el limitador, por dimensión."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Backend: {get_config()['BACKEND']}")
+        for dimension, total in estadisticas().items():
+            self.stdout.write(f"{dimension}: {total} rechazos")
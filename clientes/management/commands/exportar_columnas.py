@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from clientes.columnar import exportar_columnas, get_directorio
+
+
+class Command(BaseCommand):
+    help = "Exporta las reservas a ficheros columnares (.npy) para informes. Pensado para un cron nocturno."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--completo", action="store_true", help="Reexporta todo en un único segmento (recoge cambios de estado).")
+        parser.add_argument("--conservar", type=int, default=3, help="Versiones publicadas que se conservan.")
+
+    def handle(self, *args, **options):
+        manifiesto = exportar_columnas(completo=options["completo"], conservar=options["conservar"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Versión {manifiesto['version']} publicada en {get_directorio()}: "
+            f"{manifiesto['filas']} reservas en {len(manifiesto['segmentos'])} segmentos."
+        ))
@@ -0,0 +1,29 @@
+import csv
+
+from django.core.management.base import BaseCommand
+
+from clientes.registro import TAMANO_LOTE, importar_clientes
+
+
+def leer_csv(f):
+    """
+    Columnas: username, email, nombre_visible, telefono, direccion,
+    preferencias_de_comunicacion, observacion, password_hash.
+    Se lee fila a fila: el fichero nunca se carga entero en memoria.
+    """
+    for registro in csv.DictReader(f):
+        if registro.get("username"):
+            yield {k: (v or "").strip() for k, v in registro.items() if k}
+
+
+class Command(BaseCommand):
+    help = "Importación masiva de clientes desde un CSV (migración desde otro sistema)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("fichero", help="Ruta al .csv")
+        parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Clientes por INSERT.")
+
+    def handle(self, *args, **options):
+        with open(options["fichero"], newline="", encoding="utf-8") as f:
+            creados, omitidos = importar_clientes(leer_csv(f), tamano=options["lote"])
+        self.stdout.write(self.style.SUCCESS(f"{creados} clientes creados, {omitidos} omitidos (ya existían)."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from clientes.borradores import purgar_borradores
+
+
+class Command(BaseCommand):
+    help = "Elimina los borradores de reserva caducados (pensado para un cron diario)."
+
+    def handle(self, *args, **options):
+        borrados = purgar_borradores()
+        self.stdout.write(self.style.SUCCESS(f"{borrados} borradores caducados eliminados."))
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0002_remove_reserva_pedido_empresa'),
+        ('staff', '0003_producto_producto_del_dia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reserva_pedido',
+            name='empresa',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservas', related_query_name='reserva', to='staff.empresa', verbose_name='Empresa'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva_pedido',
+            index=models.Index(fields=['empresa', '-fecha'], name='reserva_empresa_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+from collections import Counter
+
+from django.db import migrations, transaction
+
+# Copia de la lógica de clientes.utils en el momento de esta migración: las
+# migraciones no importan código de la app, que puede cambiar después.
+TAMANO_LOTE = 1000
+
+
+def empresa_predominante(empresa_ids):
+    # La empresa de la mayoría de productos; en caso de empate, el id más bajo
+    conteo = Counter(e for e in empresa_ids if e)
+    if not conteo:
+        return None
+    return min(conteo, key=lambda e: (-conteo[e], e))
+
+
+def calcular_empresas(Reserva_Pedido, reserva_ids):
+    through = Reserva_Pedido.productos.through
+    por_reserva = {}
+    filas = (
+        through.objects
+        .filter(reserva_pedido_id__in=reserva_ids)
+        .values_list("reserva_pedido_id", "producto__empresa_id")
+    )
+    for reserva_id, empresa_id in filas:
+        por_reserva.setdefault(reserva_id, []).append(empresa_id)
+    clientes = dict(
+        Reserva_Pedido.objects.filter(pk__in=reserva_ids).values_list("pk", "cliente__empresa_id")
+    )
+    return {
+        reserva_id: empresa_predominante(por_reserva.get(reserva_id, [])) or clientes.get(reserva_id)
+        for reserva_id in reserva_ids
+    }
+
+
+def rellenar(apps, schema_editor):
+    Reserva_Pedido = apps.get_model("clientes", "Reserva_Pedido")
+    qs = Reserva_Pedido.objects.filter(empresa__isnull=True)
+    # Paginación por clave primaria; cada lote es una transacción corta con un UPDATE por empresa
+    ultimo = 0
+    while True:
+        ids = list(qs.filter(pk__gt=ultimo).order_by("pk").values_list("pk", flat=True)[:TAMANO_LOTE])
+        if not ids:
+            return
+        por_empresa = {}
+        for reserva_id, empresa_id in calcular_empresas(Reserva_Pedido, ids).items():
+            if empresa_id:
+                por_empresa.setdefault(empresa_id, []).append(reserva_id)
+        with transaction.atomic():
+            for empresa_id, reserva_ids in por_empresa.items():
+                Reserva_Pedido.objects.filter(pk__in=reserva_ids).update(empresa_id=empresa_id)
+        ultimo = ids[-1]
+
+
+class Migration(migrations.Migration):
+    # Sin transacción global: cada lote se confirma por separado para no bloquear la tabla
+    atomic = False
+
+    dependencies = [
+        ('clientes', '0003_reserva_pedido_empresa'),
+    ]
+
+    operations = [
+        migrations.RunPython(rellenar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Copia del DDL de clientes.particiones en el momento de esta migración: las
+# migraciones no importan código de la app, que puede cambiar después.
+TABLA = "clientes_reserva_archivada"
+
+DDL_TABLA = f"""
+CREATE TABLE {TABLA} (
+    id bigint NOT NULL,
+    tipo varchar(10) NOT NULL,
+    fecha timestamp with time zone NOT NULL,
+    comensales integer NOT NULL CHECK (comensales >= 0),
+    direccion varchar(100) NOT NULL,
+    notas text NOT NULL,
+    estado varchar(10) NOT NULL,
+    cliente_id bigint NULL,
+    empresa_id bigint NULL,
+    productos_ids jsonb NOT NULL,
+    archivada_en timestamp with time zone NOT NULL,
+    PRIMARY KEY (id, fecha)
+) PARTITION BY RANGE (fecha);
+CREATE TABLE {TABLA}_default PARTITION OF {TABLA} DEFAULT;
+CREATE INDEX archivada_empresa_fecha_idx ON {TABLA} (empresa_id, fecha DESC);
+CREATE INDEX {TABLA}_cliente_id_idx ON {TABLA} (cliente_id);
+"""
+
+
+def crear_tabla(apps, schema_editor):
+    # En PostgreSQL, particionada por mes; en otros motores, la tabla normal del modelo
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DDL_TABLA)
+    else:
+        schema_editor.create_model(apps.get_model("clientes", "Reserva_Archivada"))
+
+
+def borrar_tabla(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLA} CASCADE")
+    else:
+        schema_editor.delete_model(apps.get_model("clientes", "Reserva_Archivada"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0004_rellenar_empresa_reservas'),
+        ('staff', '0003_producto_producto_del_dia'),
+    ]
+
+    operations = [
+        # En PostgreSQL la tabla se crea particionada por mes (ver clientes/particiones.py)
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='Reserva_Archivada',
+                    fields=[
+                        ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                        ('tipo', models.CharField(choices=[('LOCAL', 'Reserva en local'), ('COMIDA', 'Pedido de comida'), ('EVENTO', 'Evento')], max_length=10, verbose_name='Tipo')),
+                        ('fecha', models.DateTimeField(verbose_name='Fecha y hora')),
+                        ('comensales', models.PositiveIntegerField(verbose_name='Número de comensales')),
+                        ('direccion', models.CharField(max_length=100, verbose_name='Dirección')),
+                        ('notas', models.TextField(blank=True, verbose_name='Notas adicionales')),
+                        ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('CONFIRMADO', 'Confirmado'), ('CANCELADO', 'Cancelado'), ('ENTREGADO', 'Entregado')], max_length=10, verbose_name='Estado')),
+                        ('productos_ids', models.JSONField(default=list, verbose_name='Productos')),
+                        ('archivada_en', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de archivado')),
+                        ('cliente', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Cliente')),
+                        ('empresa', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='staff.empresa', verbose_name='Empresa')),
+                    ],
+                    options={
+                        'verbose_name': 'Reserva archivada',
+                        'verbose_name_plural': 'Reservas archivadas',
+                        'ordering': ['-fecha'],
+                        'indexes': [models.Index(fields=['empresa', '-fecha'], name='archivada_empresa_fecha_idx')],
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(crear_tabla, borrar_tabla),
+    ]
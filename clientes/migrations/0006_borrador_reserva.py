@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0005_reserva_archivada'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Borrador_Reserva',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='borrador_reserva', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+                ('datos', models.JSONField(default=dict, verbose_name='Datos del formulario')),
+                ('actualizado', models.DateTimeField(auto_now=True, verbose_name='Última modificación')),
+                ('caduca', models.DateTimeField(db_index=True, verbose_name='Caduca')),
+            ],
+            options={
+                'verbose_name': 'Borrador de reserva',
+                'verbose_name_plural': 'Borradores de reserva',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0006_borrador_reserva'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reserva_pedido',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Versión'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0007_reserva_pedido_version'),
+        ('staff', '0011_outbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva_pedido',
+            index=models.Index(condition=models.Q(('estado__in', ['PENDIENTE', 'CONFIRMADO'])), fields=['estado', 'fecha'], name='reserva_abierta_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0008_reserva_abierta_fecha_idx'),
+    ]
+
+    operations = [
+        # Las reservas existentes quedan con la fecha de la migración (valor constante:
+        # en PostgreSQL añadir la columna no reescribe la tabla)
+        migrations.AddField(
+            model_name='reserva_pedido',
+            name='creada',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Creada'),
+            preserve_default=False,
+        ),
+    ]
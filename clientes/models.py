@@ -1,6 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser, Group, Permission
-from staff.models import Empresa, Producto
+from staff.models import Empresa, ModeloConEventos, ModeloVersionado, Producto
 
 # -----------------------
 # Modelo de usuario
@@ -85,7 +85,7 @@ class Usuario_Perfil(models.Model):
 # -----------------------
 # Reservas y pedidos
 # -----------------------
-class Reserva_Pedido(models.Model):
+class Reserva_Pedido(ModeloVersionado, ModeloConEventos):
     TIPO_CHOICES = [
         ('LOCAL', 'Reserva en local'),
         ('COMIDA', 'Pedido de comida'),
@@ -132,6 +132,24 @@ class Reserva_Pedido(models.Model):
         verbose_name="Cliente"
     )
 
+    # Empresa dueña de la reserva (desnormalizada desde los productos al crearla).
+    # Evita el JOIN con cliente/productos en todas las consultas de staff.
+    empresa = models.ForeignKey(
+        Empresa,
+        on_delete=models.SET_NULL,  # Si borramos la empresa, la reserva se conserva sin empresa
+        null=True,
+        blank=True,
+        related_name='reservas',
+        related_query_name='reserva',
+        verbose_name="Empresa"
+    )
+
+    # Momento del INSERT: clientes/columnar.py no exporta más allá de huecos recientes en los ids
+    creada = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Creada"
+    )
+
     # Productos asociados a esta reserva
     productos = models.ManyToManyField(
         Producto,
@@ -143,7 +161,147 @@ class Reserva_Pedido(models.Model):
         verbose_name = "Reserva / Pedido"
         verbose_name_plural = "Reservas / Pedidos"
         ordering = ['-fecha']  # ordenadas de la más reciente a la más antigua
+        indexes = [
+            # Listados y estadísticas de staff: WHERE empresa_id = X ORDER BY fecha DESC
+            models.Index(fields=['empresa', '-fecha'], name='reserva_empresa_fecha_idx'),
+            # Reservas aún abiertas por fecha (cerrar_reservas): solo una fracción pequeña de la tabla
+            models.Index(
+                fields=['estado', 'fecha'],
+                condition=models.Q(estado__in=['PENDIENTE', 'CONFIRMADO']),
+                name='reserva_abierta_fecha_idx',
+            ),
+        ]
+
+    campos_seguidos = ("estado",)
+    EVENTOS_DE_ESTADO = {
+        "CONFIRMADO": "reserva.confirmada",
+        "CANCELADO": "reserva.cancelada",
+        "ENTREGADO": "reserva.entregada",
+    }
+
+    def eventos_al_guardar(self, creado, cambios):
+        datos = {
+            "tipo": self.tipo,
+            "fecha": self.fecha,
+            "comensales": self.comensales,
+            "estado": self.estado,
+            "cliente_id": self.cliente_id,
+            "version": self.version,
+        }
+        if creado:
+            yield "reserva.creada", datos
+        elif "estado" in cambios and self.estado in self.EVENTOS_DE_ESTADO:
+            yield self.EVENTOS_DE_ESTADO[self.estado], {**datos, "estado_anterior": cambios["estado"][0]}
 
     def __str__(self):
         cliente_str = self.cliente.nombre_visible if self.cliente else "Cliente desconocido"
-        return f"{self.tipo} - {cliente_str} - {self.fecha.strftime('%d/%m/%Y %H:%M')}"
\ No newline at end of file
+        return f"{self.tipo} - {cliente_str} - {self.fecha.strftime('%d/%m/%Y %H:%M')}"
+
+# -----------------------
+# Reservas archivadas (almacenamiento frío)
+# -----------------------
+class Reserva_Archivada(models.Model):
+    """
+    Copia de solo lectura de las reservas terminadas (ENTREGADO/CANCELADO) antiguas.
+    En PostgreSQL la tabla está particionada por mes sobre 'fecha' (ver clientes/particiones.py).
+    Los productos se guardan como lista de ids en la misma fila, para que cada
+    partición contenga también los enlaces a sus productos.
+    """
+    id = models.BigIntegerField(primary_key=True)  # mismo id que tenía en Reserva_Pedido
+    tipo = models.CharField(
+        max_length=10,
+        choices=Reserva_Pedido.TIPO_CHOICES,
+        verbose_name="Tipo"
+    )
+    fecha = models.DateTimeField(
+        verbose_name="Fecha y hora"
+    )
+    comensales = models.PositiveIntegerField(
+        verbose_name="Número de comensales"
+    )
+    direccion = models.CharField(
+        max_length=100,
+        verbose_name="Dirección"
+    )
+    notas = models.TextField(
+        verbose_name="Notas adicionales",
+        blank=True
+    )
+    estado = models.CharField(
+        max_length=10,
+        choices=Reserva_Pedido.ESTADOS_CHOICES,
+        verbose_name="Estado"
+    )
+    # Sin restricciones de FK: el histórico sobrevive al borrado de clientes y empresas
+    cliente = models.ForeignKey(
+        Usuario,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Cliente"
+    )
+    empresa = models.ForeignKey(
+        Empresa,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Empresa"
+    )
+    productos_ids = models.JSONField(
+        default=list,
+        verbose_name="Productos"
+    )
+    archivada_en = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Fecha de archivado"
+    )
+
+    class Meta:
+        verbose_name = "Reserva archivada"
+        verbose_name_plural = "Reservas archivadas"
+        ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['empresa', '-fecha'], name='archivada_empresa_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} - {self.fecha.strftime('%d/%m/%Y %H:%M')} ({self.estado})"
+
+# -----------------------
+# Borradores de reserva
+# -----------------------
+class Borrador_Reserva(models.Model):
+    """
+    Formulario de reserva a medio rellenar (uno por usuario), fuera de la sesión.
+    Caduca a las BORRADOR_RESERVA_HORAS; `purgar_borradores` elimina los caducados.
+    """
+    usuario = models.OneToOneField(
+        Usuario,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='borrador_reserva',
+        verbose_name="Usuario"
+    )
+    datos = models.JSONField(
+        default=dict,
+        verbose_name="Datos del formulario"
+    )
+    actualizado = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Última modificación"
+    )
+    caduca = models.DateTimeField(
+        db_index=True,
+        verbose_name="Caduca"
+    )
+
+    class Meta:
+        verbose_name = "Borrador de reserva"
+        verbose_name_plural = "Borradores de reserva"
+
+    def __str__(self):
+        return f"Borrador de {self.usuario_id} (caduca {self.caduca:%d/%m/%Y %H:%M})"
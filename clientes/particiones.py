@@ -0,0 +1,116 @@
+# clientes/particiones.py
+"""
+Particionado mensual (PostgreSQL) de la tabla de reservas archivadas.
+
+La tabla caliente (Reserva_Pedido) no se particiona: recibe FKs desde la tabla
+de productos y Django no admite claves primarias compuestas en ella. Para que
+se quede en unas semanas de datos, el comando `archivar_reservas` mueve las
+reservas terminadas a Reserva_Archivada, que sí está particionada por mes.
+En otros motores (SQLite en local) la tabla es normal y estas funciones no hacen nada.
+La tabla particionada se crea en la migración clientes 0005.
+"""
+from datetime import date, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+TABLA = "clientes_reserva_archivada"
+
+
+def es_postgresql(conn=None):
+    return (conn or connection).vendor == "postgresql"
+
+
+def sumar_meses(dia, meses):
+    """Primer día del mes resultante de sumar `meses` (puede ser negativo) al mes de `dia`."""
+    total = dia.year * 12 + (dia.month - 1) + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def nombre_particion(inicio):
+    return f"{TABLA}_{inicio.year:04d}_{inicio.month:02d}"
+
+
+def particiones_existentes():
+    """Nombres de las particiones mensuales conectadas a la tabla padre."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = %s
+            """,
+            [TABLA],
+        )
+        return sorted(r[0] for r in cursor.fetchall() if r[0] != f"{TABLA}_default")
+
+
+def crear_particiones(desde, meses):
+    """
+    Crea las particiones mensuales de [desde, desde + meses). Es idempotente.
+    Si la partición DEFAULT ya tiene filas de un mes (PostgreSQL no dejaría crear
+    la partición), se mueven a la nueva en la misma transacción.
+    Si la tabla del mes existe porque se desconectó (desconectar_particiones, p. ej.
+    al volver a archivar datos antiguos), se reutiliza con sus filas y se vuelve a
+    conectar; las filas de DEFAULT que ya estén en ella no se duplican.
+    Devuelve los nombres de las particiones creadas o reconectadas.
+    """
+    if not es_postgresql():
+        return []
+    existentes = set(particiones_existentes())
+    creadas = []
+    with connection.cursor() as cursor:
+        for i in range(meses):
+            inicio = sumar_meses(desde, i)
+            fin = sumar_meses(inicio, 1)
+            nombre = nombre_particion(inicio)
+            if nombre in existentes:
+                continue
+            with transaction.atomic():
+                # Tabla suelta + ATTACH: así se pueden sacar antes las filas del mes de DEFAULT
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {nombre} (LIKE {TABLA} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+                )
+                # Una tabla desconectada conserva el índice único (id, fecha) de la clave primaria
+                cursor.execute(
+                    f"""
+                    WITH movidas AS (
+                        DELETE FROM {TABLA}_default WHERE fecha >= %s AND fecha < %s RETURNING *
+                    )
+                    INSERT INTO {nombre} SELECT * FROM movidas ON CONFLICT DO NOTHING
+                    """,
+                    [inicio, fin],
+                )
+                cursor.execute(
+                    f"ALTER TABLE {TABLA} ATTACH PARTITION {nombre} FOR VALUES FROM (%s) TO (%s)",
+                    [inicio, fin],
+                )
+            creadas.append(nombre)
+    return creadas
+
+
+def asegurar_particiones(desde, hasta):
+    """Crea las particiones de los meses entre dos instantes (ambos incluidos, en UTC)."""
+    inicio = sumar_meses(desde.astimezone(dt_timezone.utc).date(), 0)
+    final = sumar_meses(hasta.astimezone(dt_timezone.utc).date(), 0)
+    meses = (final.year - inicio.year) * 12 + final.month - inicio.month + 1
+    return crear_particiones(inicio, meses)
+
+
+def desconectar_particiones(antes_de):
+    """
+    Desconecta (DETACH) las particiones mensuales anteriores a `antes_de`.
+    Las tablas siguen existiendo para consultas puntuales o para volcarlas y borrarlas;
+    si se vuelve a archivar ese mes, crear_particiones las conecta de nuevo.
+    """
+    if not es_postgresql():
+        return []
+    limite = nombre_particion(sumar_meses(antes_de, 0))
+    desconectadas = []
+    with connection.cursor() as cursor:
+        for nombre in particiones_existentes():
+            if nombre < limite:
+                cursor.execute(f"ALTER TABLE {TABLA} DETACH PARTITION {nombre}")
+                desconectadas.append(nombre)
+    return desconectadas
@@ -0,0 +1,129 @@
+# clientes/registro.py
+"""
+Servicio de registro de usuarios.
+
+`registrar_usuario` crea usuario, perfil, empresa opcional y grupo con un número
+fijo de sentencias (una inserción por tabla). `importar_clientes` reutiliza la
+misma lógica con bulk_create para migraciones masivas de clientes.
+"""
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Usuario, Usuario_Perfil
+
+GRUPO_EMPRESAS = "Empresas"
+GRUPO_USUARIOS = "Usuarios"
+TAMANO_LOTE = 1000
+
+
+def _clave_grupo(nombre):
+    return f"registro:grupo:{nombre}"
+
+
+def id_de_grupo(nombre):
+    """
+    Id del grupo, en la caché compartida: todos los workers ven la invalidación
+    de olvidar_grupos() (solo consulta/crea el grupo si no está en la caché).
+    """
+    clave = _clave_grupo(nombre)
+    grupo_id = cache.get(clave)
+    if grupo_id is None:
+        grupo_id = Group.objects.get_or_create(name=nombre)[0].pk
+        # Al confirmar: un grupo recién creado en una transacción que se deshace no debe quedar cacheado
+        transaction.on_commit(lambda: cache.set(clave, grupo_id, timeout=None))
+    return grupo_id
+
+
+def olvidar_grupos():
+    # Todos los nombres: un grupo renombrado deja de ser el de su nombre anterior
+    claves = [_clave_grupo(n) for n in (GRUPO_EMPRESAS, GRUPO_USUARIOS)]
+    transaction.on_commit(lambda: cache.delete_many(claves))
+
+
+@transaction.atomic
+def registrar_usuario(usuario, perfil=None, empresa=None, es_empresa=False):
+    """
+    Guarda un usuario nuevo (aún sin guardar, con la contraseña ya cifrada) junto con
+    su perfil, su empresa (si es empresa) y su grupo. Como máximo:
+    INSERT empresa, INSERT usuario, INSERT perfil e INSERT en la tabla de grupos.
+    """
+    if es_empresa:
+        if empresa is not None:
+            if not empresa.contacto:
+                empresa.contacto = usuario.email
+            empresa.save()
+            usuario.empresa = empresa
+        usuario.is_staff = True
+
+    usuario.save()
+
+    if perfil is not None:
+        perfil.usuario = usuario
+        perfil.save()
+
+    grupo_id = id_de_grupo(GRUPO_EMPRESAS if es_empresa else GRUPO_USUARIOS)
+    Usuario.groups.through.objects.create(usuario_id=usuario.pk, group_id=grupo_id)
+    return usuario
+
+
+# ==============================
+# IMPORTACIÓN MASIVA
+# ==============================
+
+CAMPOS_PERFIL = ("preferencias_de_comunicacion", "direccion", "observacion")
+
+
+def _importar_lote(filas, grupo_id):
+    usernames = [f["username"] for f in filas]
+    existentes = set(Usuario.objects.filter(username__in=usernames).values_list("username", flat=True))
+    nuevas = []
+    vistos = set()
+    for fila in filas:
+        if fila["username"] in existentes or fila["username"] in vistos:
+            continue
+        vistos.add(fila["username"])
+        nuevas.append(fila)
+
+    usuarios = [
+        Usuario(
+            username=f["username"],
+            email=f.get("email") or "",
+            nombre_visible=f.get("nombre_visible") or f["username"],
+            telefono=f.get("telefono") or None,
+            # Hash ya calculado por el sistema anterior (formato de Django) o contraseña inutilizable.
+            # No se admiten contraseñas en claro: 100k PBKDF2 tardarían horas.
+            password=f.get("password_hash") or make_password(None),
+        )
+        for f in nuevas
+    ]
+    with transaction.atomic():
+        usuarios = Usuario.objects.bulk_create(usuarios)
+        Usuario_Perfil.objects.bulk_create([
+            Usuario_Perfil(usuario=u, **{c: f.get(c) or "" for c in CAMPOS_PERFIL})
+            for u, f in zip(usuarios, nuevas)
+        ])
+        Usuario.groups.through.objects.bulk_create([
+            Usuario.groups.through(usuario_id=u.pk, group_id=grupo_id) for u in usuarios
+        ])
+    return len(usuarios), len(filas) - len(usuarios)
+
+
+def importar_clientes(filas, tamano=TAMANO_LOTE):
+    """
+    Importa clientes desde un iterable de dicts (se consume por lotes, sin cargarlo entero).
+    Los usernames ya existentes se omiten. Devuelve (creados, omitidos).
+    """
+    grupo_id = id_de_grupo(GRUPO_USUARIOS)
+    creados = omitidos = 0
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= tamano:
+            c, o = _importar_lote(lote, grupo_id)
+            creados, omitidos, lote = creados + c, omitidos + o, []
+    if lote:
+        c, o = _importar_lote(lote, grupo_id)
+        creados, omitidos = creados + c, omitidos + o
+    return creados, omitidos
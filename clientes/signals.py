@@ -0,0 +1,103 @@
+# clientes/signals.py
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from chefquest import autenticacion, versiones
+from staff import cocina
+from staff.models import Empresa
+from .models import Reserva_Pedido, Usuario
+from .registro import olvidar_grupos
+
+
+# ==============================
+# CONTADORES DE VERSIÓN (respuestas condicionales)
+# ==============================
+
+@receiver(post_save, sender=Reserva_Pedido)
+@receiver(post_delete, sender=Reserva_Pedido)
+def reserva_version(sender, instance, **kwargs):
+    if instance.empresa_id:
+        versiones.incrementar_al_confirmar(versiones.clave_empresa(instance.empresa_id))
+
+
+@receiver(m2m_changed, sender=Reserva_Pedido.productos.through)
+def reserva_productos_version(sender, instance, action, **kwargs):
+    if action.startswith("post_") and isinstance(instance, Reserva_Pedido) and instance.empresa_id:
+        versiones.incrementar_al_confirmar(versiones.clave_empresa(instance.empresa_id))
+
+
+# ==============================
+# COLA DE COCINA (staff/cocina.py)
+# ==============================
+
+@receiver(post_save, sender=Reserva_Pedido)
+def reserva_cocina(sender, instance, **kwargs):
+    transaction.on_commit(lambda: cocina.actualizar_reserva(instance))
+
+
+@receiver(m2m_changed, sender=Reserva_Pedido.productos.through)
+def reserva_productos_cocina(sender, instance, action, **kwargs):
+    # Los productos cambian la duración y la carga (solo importa si ya está confirmada)
+    if action.startswith("post_") and isinstance(instance, Reserva_Pedido) and instance.estado == "CONFIRMADO":
+        transaction.on_commit(lambda: cocina.actualizar_reserva(instance))
+
+
+@receiver(post_delete, sender=Reserva_Pedido)
+def reserva_borrada_cocina(sender, instance, **kwargs):
+    transaction.on_commit(lambda: cocina.quitar_reserva(instance.empresa_id, instance.pk))
+
+
+# ==============================
+# CACHÉ DE GRUPOS (registro)
+# ==============================
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def grupo_modificado(sender, **kwargs):
+    olvidar_grupos()
+
+
+# ==============================
+# CACHÉ DE USUARIOS Y PERMISOS (chefquest/autenticacion.py)
+# ==============================
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def usuario_modificado(sender, instance, **kwargs):
+    autenticacion.invalidar_usuario(instance.pk)
+
+
+@receiver(m2m_changed, sender=Usuario.groups.through)
+@receiver(m2m_changed, sender=Usuario.user_permissions.through)
+def usuario_permisos_modificados(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        autenticacion.invalidar_usuario(instance.pk)
+    elif pk_set:
+        # grupo.usuarios_grupo.add(...) / permiso.usuarios_permiso.add(...)
+        autenticacion.invalidar_usuario(*pk_set)
+    else:
+        # clear() desde el grupo o el permiso: no sabemos a qué usuarios afecta
+        autenticacion.invalidar_todos()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def grupo_permisos_modificados(sender, action, **kwargs):
+    if action.startswith("post_"):
+        autenticacion.invalidar_todos()
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def permiso_borrado(sender, **kwargs):
+    autenticacion.invalidar_todos()
+
+
+@receiver(post_save, sender=Empresa)
+def empresa_modificada(sender, instance, created, **kwargs):
+    # La empresa va en la entrada de caché de sus usuarios (select_related)
+    if not created:
+        autenticacion.invalidar_usuario(*instance.usuario_set.values_list("pk", flat=True))
@@ -1,3 +1,234 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from chefquest import idempotencia
+from chefquest.concurrencia import MENSAJE_CONFLICTO_FORMULARIO, ConflictoDeVersion
+from chefquest.idempotencia import idempotente
+from staff.models import Empresa, Producto
+
+from .models import Reserva_Pedido, Usuario
+
+# Caché en memoria y vacía en cada test: la de ficheros se comparte entre ejecuciones
+CACHE_PRUEBAS = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def crear_datos():
+    empresa = Empresa.objects.create(nombre_comercial="Casa Pepe", contacto="pepe@example.com")
+    producto = Producto.objects.create(
+        nombre="Paella", descripcion="Para dos", precio=20, coste=8, stock=5, empresa=empresa,
+    )
+    cliente = Usuario.objects.create_user(username="ana", password="x", nombre_visible="Ana")
+    return empresa, producto, cliente
+
+
+def datos_reserva(producto, **extra):
+    fecha = timezone.localtime(timezone.now() + timedelta(days=3))
+    return {
+        "tipo": "COMIDA",
+        "fecha": fecha.strftime("%Y-%m-%dT%H:%M"),
+        "comensales": 2,
+        "direccion": "Calle Mayor 1",
+        "notas": "",
+        "productos": [producto.pk],
+        **extra,
+    }
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class IdempotenciaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.llamadas = 0
+
+    def peticion(self, clave="clave-1"):
+        request = self.factory.post("/reservar/", {"idempotency_key": clave})
+        request.COOKIES["sessionid"] = "sesion-de-prueba"
+        return request
+
+    def test_repeticion_devuelve_la_respuesta_guardada(self):
+        @idempotente("prueba_repeticion")
+        def vista(request):
+            self.llamadas += 1
+            return HttpResponse(f"reserva {self.llamadas}", status=201)
+
+        primera = vista(self.peticion())
+        segunda = vista(self.peticion())
+
+        self.assertEqual(self.llamadas, 1)
+        self.assertEqual(segunda.status_code, 201)
+        self.assertEqual(segunda.content, primera.content)
+        self.assertEqual(segunda["Idempotent-Replayed"], "true")
+        self.assertEqual(idempotencia.estadisticas()["prueba_repeticion"], 1)
+
+    def test_otra_clave_se_ejecuta(self):
+        @idempotente("prueba_otra_clave")
+        def vista(request):
+            self.llamadas += 1
+            return HttpResponse("ok")
+
+        vista(self.peticion("clave-1"))
+        vista(self.peticion("clave-2"))
+        self.assertEqual(self.llamadas, 2)
+
+    def test_repeticion_en_curso_recibe_409(self):
+        respuestas = []
+
+        @idempotente("prueba_en_curso")
+        def vista(request):
+            self.llamadas += 1
+            if self.llamadas == 1:
+                # Llega la repetición mientras la original todavía se procesa
+                respuestas.append(vista(self.peticion()))
+            return HttpResponse("ok")
+
+        vista(self.peticion())
+
+        self.assertEqual(self.llamadas, 1)
+        self.assertEqual(respuestas[0].status_code, 409)
+        self.assertEqual(respuestas[0]["Retry-After"], str(idempotencia.REINTENTAR_EN))
+
+    def test_excepcion_libera_la_clave(self):
+        @idempotente("prueba_excepcion")
+        def vista(request):
+            self.llamadas += 1
+            if self.llamadas == 1:
+                raise RuntimeError("fallo")
+            return HttpResponse("ok")
+
+        with self.assertRaises(RuntimeError):
+            vista(self.peticion())
+        respuesta = vista(self.peticion())
+
+        self.assertEqual(self.llamadas, 2)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertFalse(respuesta.has_header("Idempotent-Replayed"))
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class ReservaCreacionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.empresa, self.producto, self.cliente = crear_datos()
+        self.client.force_login(self.cliente)
+        self.url = reverse("clientes:reserva_create")
+
+    def test_post_duplicado_crea_una_sola_reserva(self):
+        datos = datos_reserva(self.producto, idempotency_key="doble-pulsacion")
+        primera = self.client.post(self.url, datos)
+        segunda = self.client.post(self.url, datos)
+
+        self.assertEqual(Reserva_Pedido.objects.count(), 1)
+        self.assertEqual(primera.status_code, 302)
+        self.assertEqual(segunda.status_code, 302)
+        self.assertEqual(segunda["Location"], primera["Location"])
+        self.assertEqual(segunda["Idempotent-Replayed"], "true")
+
+    def test_post_duplicado_sin_clave_se_absorbe_por_huella(self):
+        datos = datos_reserva(self.producto)
+        self.client.post(self.url, datos)
+        self.client.post(self.url, datos)
+        self.assertEqual(Reserva_Pedido.objects.count(), 1)
+
+    def test_claves_distintas_crean_dos_reservas(self):
+        self.client.post(self.url, datos_reserva(self.producto, idempotency_key="a"))
+        self.client.post(self.url, datos_reserva(self.producto, idempotency_key="b"))
+        self.assertEqual(Reserva_Pedido.objects.count(), 2)
+
+    def test_reserva_toma_la_empresa_de_sus_productos(self):
+        self.client.post(self.url, datos_reserva(self.producto, idempotency_key="a"))
+        reserva = Reserva_Pedido.objects.get()
+        self.assertEqual(reserva.empresa_id, self.empresa.pk)
+        self.assertEqual(reserva.version, 1)
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class ReservaVersionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.empresa, self.producto, self.cliente = crear_datos()
+        self.reserva = Reserva_Pedido.objects.create(
+            tipo="COMIDA", fecha=timezone.now() + timedelta(days=3), comensales=2,
+            direccion="Calle Mayor 1", estado="PENDIENTE", cliente=self.cliente, empresa=self.empresa,
+        )
+        self.reserva.productos.add(self.producto)
+
+    def test_guardar_con_version_obsoleta_falla(self):
+        primera = Reserva_Pedido.objects.get(pk=self.reserva.pk)
+        segunda = Reserva_Pedido.objects.get(pk=self.reserva.pk)
+        segunda.notas = "Sin gluten"
+        segunda.save(update_fields=["notas"])
+
+        primera.direccion = "Calle Nueva 2"
+        with self.assertRaises(ConflictoDeVersion):
+            primera.save(update_fields=["direccion"])
+
+        self.reserva.refresh_from_db()
+        self.assertEqual(self.reserva.direccion, "Calle Mayor 1")
+        self.assertEqual(self.reserva.notas, "Sin gluten")
+        self.assertEqual(self.reserva.version, 2)
+
+    def test_guardado_parcial_no_pisa_otras_columnas(self):
+        # Un cambio que no pasa por save() (ni sube la versión) en otra columna
+        Reserva_Pedido.objects.filter(pk=self.reserva.pk).update(comensales=6)
+        self.reserva.notas = "Sin gluten"
+        self.reserva.save(update_fields=["notas"])
+
+        self.reserva.refresh_from_db()
+        self.assertEqual(self.reserva.comensales, 6)
+        self.assertEqual(self.reserva.notas, "Sin gluten")
+        self.assertEqual(self.reserva.version, 2)
+
+    def test_edicion_con_version_obsoleta_muestra_el_conflicto(self):
+        self.client.force_login(self.cliente)
+        url = reverse("clientes:editar_reserva", args=[self.reserva.pk])
+        # Otra pestaña guarda entretanto
+        otra = Reserva_Pedido.objects.get(pk=self.reserva.pk)
+        otra.notas = "Sin gluten"
+        otra.save(update_fields=["notas"])
+
+        respuesta = self.client.post(url, datos_reserva(self.producto, direccion="Calle Nueva 2", version=1))
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn(MENSAJE_CONFLICTO_FORMULARIO, respuesta.context["form"].non_field_errors())
+        self.assertEqual(respuesta.context["form"]["version"].value(), 2)
+        self.assertIn("Calle Nueva 2", [tuyo for _, _, tuyo in respuesta.context["conflictos"]])
+        self.reserva.refresh_from_db()
+        self.assertEqual(self.reserva.direccion, "Calle Mayor 1")
+        self.assertEqual(self.reserva.notas, "Sin gluten")
+
+        # Al volver a enviar con la versión actual se guarda
+        respuesta = self.client.post(url, datos_reserva(
+            self.producto, direccion="Calle Nueva 2", notas="Sin gluten", version=2,
+        ))
+        self.assertEqual(respuesta.status_code, 302)
+        self.reserva.refresh_from_db()
+        self.assertEqual(self.reserva.direccion, "Calle Nueva 2")
+        self.assertEqual(self.reserva.version, 3)
+
+    def test_edicion_solo_escribe_los_campos_cambiados(self):
+        self.client.force_login(self.cliente)
+        url = reverse("clientes:editar_reserva", args=[self.reserva.pk])
+        datos = datos_reserva(
+            self.producto, fecha=timezone.localtime(self.reserva.fecha).strftime("%Y-%m-%dT%H:%M"),
+            direccion="Calle Nueva 2", version=1,
+        )
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.post(url, datos)
+
+        self.assertEqual(respuesta.status_code, 302)
+        updates = [
+            q["sql"] for q in consultas.captured_queries
+            if q["sql"].startswith('UPDATE "clientes_reserva_pedido"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"direccion"', updates[0])
+        self.assertNotIn('"comensales"', updates[0])
+        self.assertNotIn('"notas"', updates[0])
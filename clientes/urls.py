@@ -33,5 +33,8 @@ urlpatterns = [
     path("reservas/<int:pk>/", views.ReservaDetailView.as_view(), name="reserva_detail"),
     path("reservas/<int:pk>/cancelar/", views.cancelar_reserva, name="cancelar_reserva"),
     path("reservas/limpiar/",views.limpiar_reserva_sesion,name="limpiar_reserva_sesion"),
+    path("reservas/borrador/", views.autoguardar_reserva, name="autoguardar_reserva"),
     path("reserva/<int:pk>/editar/",views.ReservaPedidoUpdateView.as_view(),name="editar_reserva"),
+    path("carta/hoy.json", views.carta_hoy_json, name="carta_hoy"),
+    path("carta/<int:empresa_id>/<str:fecha>/v<int:version>.json", views.carta_publicada_json, name="carta_publicada"),
 ]
@@ -0,0 +1,116 @@
+# clientes/utils.py
+from collections import Counter
+from typing import Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Min
+
+TAMANO_LOTE = 1000
+
+
+def empresa_predominante(empresa_ids: Iterable[Optional[int]]) -> Optional[int]:
+    """
+    Devuelve la empresa a la que pertenecen la mayoría de productos de una reserva.
+    En caso de empate gana el id más bajo, para que el resultado sea estable.
+    """
+    conteo = Counter(e for e in empresa_ids if e)
+    if not conteo:
+        return None
+    return min(conteo, key=lambda e: (-conteo[e], e))
+
+
+def calcular_empresas(reserva_model, reserva_ids):
+    """
+    Calcula la empresa esperada de cada reserva: la predominante entre sus productos
+    o, si no tiene productos con empresa, la empresa del cliente.
+    Recibe la clase del modelo (como comprobar_empresa_reservas).
+    """
+    through = reserva_model.productos.through
+    por_reserva = {}
+    filas = (
+        through.objects
+        .filter(reserva_pedido_id__in=reserva_ids)
+        .values_list("reserva_pedido_id", "producto__empresa_id")
+    )
+    for reserva_id, empresa_id in filas:
+        por_reserva.setdefault(reserva_id, []).append(empresa_id)
+
+    clientes = dict(
+        reserva_model.objects
+        .filter(pk__in=reserva_ids)
+        .values_list("pk", "cliente__empresa_id")
+    )
+
+    return {
+        reserva_id: empresa_predominante(por_reserva.get(reserva_id, [])) or clientes.get(reserva_id)
+        for reserva_id in reserva_ids
+    }
+
+
+def lotes_de_ids(queryset, tamano):
+    # Paginación por clave primaria: cada lote es un rango de índice, sin OFFSET
+    ultimo = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=ultimo).order_by("pk").values_list("pk", flat=True)[:tamano]
+        )
+        if not ids:
+            return
+        yield ids
+        ultimo = ids[-1]
+
+
+def comprobar_empresa_reservas(reserva_model, tamano=TAMANO_LOTE):
+    """
+    Compara la empresa guardada en cada reserva con la calculada a partir de sus productos.
+    Devuelve una lista de tuplas (reserva_id, empresa_guardada, empresa_esperada).
+    """
+    inconsistencias = []
+    for ids in lotes_de_ids(reserva_model.objects.all(), tamano):
+        guardadas = dict(reserva_model.objects.filter(pk__in=ids).values_list("pk", "empresa_id"))
+        for reserva_id, esperada in calcular_empresas(reserva_model, ids).items():
+            if guardadas.get(reserva_id) != esperada:
+                inconsistencias.append((reserva_id, guardadas.get(reserva_id), esperada))
+    return inconsistencias
+
+
+ESTADOS_TERMINADOS = ("ENTREGADO", "CANCELADO")
+
+
+def archivar_reservas(reserva_model, archivada_model, antes_de, tamano=TAMANO_LOTE):
+    """
+    Mueve a la tabla fría las reservas terminadas con fecha anterior a `antes_de`.
+    Antes crea las particiones mensuales de esas fechas, para que no acaben en la
+    DEFAULT (y se puedan desconectar después). Cada lote copia y borra en la
+    misma transacción corta; si se interrumpe, se puede relanzar sin duplicar
+    (ignore_conflicts). Devuelve el número de reservas movidas.
+    """
+    from .particiones import asegurar_particiones
+
+    qs = reserva_model.objects.filter(estado__in=ESTADOS_TERMINADOS, fecha__lt=antes_de)
+    primera = qs.aggregate(primera=Min("fecha"))["primera"]
+    if primera is None:
+        return 0
+    asegurar_particiones(primera, antes_de)
+    through = reserva_model.productos.through
+    campos = ["id", "tipo", "fecha", "comensales", "direccion", "notas", "estado", "cliente_id", "empresa_id"]
+
+    movidas = 0
+    for ids in lotes_de_ids(qs, tamano):
+        productos = {}
+        for reserva_id, producto_id in (
+            through.objects.filter(reserva_pedido_id__in=ids).values_list("reserva_pedido_id", "producto_id")
+        ):
+            productos.setdefault(reserva_id, []).append(producto_id)
+
+        with transaction.atomic():
+            filas = reserva_model.objects.filter(pk__in=ids).values(*campos)
+            archivadas = [
+                archivada_model(productos_ids=productos.get(fila["id"], []), **fila)
+                for fila in filas
+            ]
+            archivada_model.objects.bulk_create(archivadas, ignore_conflicts=True)
+            # El borrado en cascada elimina también las filas de la tabla de productos
+            reserva_model.objects.filter(pk__in=ids).delete()
+        movidas += len(ids)
+    return movidas
@@ -1,6 +1,6 @@
 # clientes/views.py
 from django.shortcuts import render, redirect, get_object_or_404
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.views import View
 from django.views.generic import CreateView, ListView, DetailView, UpdateView
 from django.contrib.auth.views import LoginView, LogoutView
@@ -8,15 +8,30 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth import login, authenticate, get_user_model
 from django.db import transaction
 from django.contrib import messages
-from django.utils.dateparse import parse_datetime
+from django.utils.dateparse import parse_datetime, parse_date
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.http import Http404, HttpResponse, JsonResponse
+from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth.models import Group
 
 from .models import Usuario, Usuario_Perfil, Reserva_Pedido
 from .forms import UsuarioRegistroForm, UsuarioPerfilForm, ReservaPedidoForm, LoginEmpresaForm
-from staff.models import Producto, Empresa
+from .utils import empresa_predominante
+from .registro import registrar_usuario
+from .borradores import borrar_borrador, datos_de_post, guardar_borrador, leer_borrador
+from staff.models import Producto, Empresa, CartaPublicada
+from staff.precios import precios_efectivos
+from staff.carta import cartas_del_dia
+from staff.imagenes import imagenes_de
+from staff.cocina import tramos_saturados
 from staff.mixins import ClientePropietarioMixin
 from staff.forms import EmpresaRegistroForm
+from chefquest.db_routers import usar_replica, ReplicaLecturaMixin
+from chefquest.condicional import condicional, contadores_catalogo
+from chefquest.idempotencia import idempotente, nueva_clave
+from chefquest.concurrencia import ConflictoDeVersion, EdicionVersionadaMixin, MENSAJE_CONFLICTO
+from django.utils.decorators import method_decorator
 
 User = get_user_model()
 
@@ -27,16 +42,36 @@ def calcular_precio(p):
         descuento = p.categoria.cupon.descuento or 0
     return round(p.precio * (100 - descuento) / 100, 2)
 
+@condicional(contadores_catalogo)
+@usar_replica
 def inicio(request):
     productos_activos = Producto.objects.filter(activo=True).select_related(
         "categoria__cupon", "empresa"
     )
 
+    # Precios ya compilados por el motor de reglas (una sola consulta)
+    precios = precios_efectivos(productos_activos)
+    productos, carta_del_dia = items_de_carta(productos_activos, precios, imagenes_de(productos_activos))
+
+    return render(request, "clientes/inicio.html", {
+        "productos": productos,
+        # Instantáneas ya renderizadas por `publicar_cartas`; si no hay, se usa producto_del_dia
+        "cartas_publicadas": cartas_del_dia(),
+        "carta_del_dia": carta_del_dia if carta_del_dia else None,
+    })
+
+
+def items_de_carta(productos_activos, precios, imagenes=None):
+    """Diccionarios de la plantilla de inicio: (todos los productos, los del día)."""
+    imagenes = imagenes or {}
     carta_del_dia = []
     productos = []
 
     for p in productos_activos:
-        precio_descuento = calcular_precio(p)
+        precio_descuento = precios.get(p.id)
+        if precio_descuento is None:
+            # Producto aún sin compilar: cálculo clásico con el cupón de la categoría
+            precio_descuento = calcular_precio(p)
         item = {
             "nombre": p.nombre,
             "descripcion": p.descripcion,
@@ -44,15 +79,49 @@ def inicio(request):
             "precio_descuento": precio_descuento,
             "categoria": p.categoria if p.categoria else None,
             "empresa": p.empresa.nombre_comercial if p.empresa else "Sin empresa",
+            # Miniaturas para <picture>; None si no tiene imagen o aún no está procesada
+            "imagen": imagenes.get(p.imagen.name) if imagenes and p.imagen else None,
         }
         productos.append(item)
         if p.producto_del_dia:
             carta_del_dia.append(item)
+    return productos, carta_del_dia
 
-    return render(request, "clientes/inicio.html", {
-        "productos": productos,
-        "carta_del_dia": carta_del_dia if carta_del_dia else None,
-    })
+
+def _respuesta_carta(contenido, max_age, immutable=False):
+    response = JsonResponse(contenido, json_dumps_params={"ensure_ascii": False})
+    if immutable:
+        patch_cache_control(response, public=True, max_age=max_age, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=max_age)
+    return response
+
+
+def carta_hoy_json(request):
+    """Índice de las cartas de hoy: apunta a las URLs versionadas (inmutables)."""
+    cartas = cartas_del_dia()
+    contenido = {
+        "fecha": timezone.localdate().isoformat(),
+        "cartas": [
+            {
+                "empresa": c.contenido["empresa"],
+                "version": c.version,
+                "url": reverse("clientes:carta_publicada", args=[c.empresa_id, c.fecha.isoformat(), c.version]),
+            }
+            for c in cartas
+        ],
+    }
+    # Caché corta: solo cambia al publicar una versión nueva o al cambiar de día
+    return _respuesta_carta(contenido, max_age=60)
+
+
+def carta_publicada_json(request, empresa_id, fecha, version):
+    fecha = parse_date(fecha)
+    if not fecha:
+        raise Http404("Fecha no válida.")
+    carta = get_object_or_404(CartaPublicada, empresa_id=empresa_id, fecha=fecha, version=version)
+    # Una versión publicada no cambia nunca: se puede cachear indefinidamente
+    return _respuesta_carta(carta.contenido, max_age=60 * 60 * 24 * 365, immutable=True)
 
 
 class UsuarioCreateView(CreateView):
@@ -101,44 +170,18 @@ class UsuarioCreateView(CreateView):
                     form.add_error(None, "Si te registras como empresa debes indicar el nombre de la empresa.")
                     return self.form_invalid(form)
 
-        # Crear usuario
-        usuario = form.save()
+        # Usuario, perfil, empresa y grupo en un número fijo de INSERT (ver clientes/registro.py)
+        usuario = form.save(commit=False)
+        perfil = perfil_form.save(commit=False)
 
-        # Crear perfil
-        perfil, created = Usuario_Perfil.objects.get_or_create(usuario=usuario)
-        perfil_obj = perfil_form.save(commit=False)
-        perfil.preferencias_de_comunicacion = getattr(perfil_obj, "preferencias_de_comunicacion", perfil.preferencias_de_comunicacion)
-        perfil.direccion = getattr(perfil_obj, "direccion", perfil.direccion)
-        perfil.observacion = getattr(perfil_obj, "observacion", perfil.observacion)
-        perfil.save()
-
-        # Crear empresa y asociarla al usuario
+        empresa = None
         if es_empresa:
             if empresa_form_to_use and empresa_form_to_use.is_valid():
-                empresa = empresa_form_to_use.save()
-            else:
-                empresa = Empresa.objects.create(
-                    nombre_comercial=nombre_empresa,
-                    contacto=usuario.email,
-                    codigo=form._generar_codigo_unico()
-                )
-
-            usuario.empresa = empresa
-            usuario.save()
-
-        # Asignar grupos
-        try:
-            if es_empresa:
-                grupo, _ = Group.objects.get_or_create(name="Empresas")
-                usuario.groups.add(grupo)
-                usuario.is_staff = True
+                empresa = empresa_form_to_use.save(commit=False)
             else:
-                grupo, _ = Group.objects.get_or_create(name="Usuarios")
-                usuario.groups.add(grupo)
-        except Exception:
-            pass
+                empresa = Empresa(nombre_comercial=nombre_empresa, contacto=usuario.email)
 
-        usuario.save()
+        usuario = registrar_usuario(usuario, perfil=perfil, empresa=empresa, es_empresa=es_empresa)
 
         login(self.request, usuario)
         return redirect(self.success_url)
@@ -148,53 +191,70 @@ class UsuarioLogoutView(LogoutView):
     next_page = reverse_lazy("clientes:inicio")
 
 
+def asignar_empresa(form, user):
+    productos = form.cleaned_data.get("productos") or []
+    return empresa_predominante(p.empresa_id for p in productos) or getattr(user, "empresa_id", None)
+
+
+@method_decorator(idempotente("reserva_create"), name="dispatch")
 class ReservaPedidoCreateView(LoginRequiredMixin, CreateView):
     model = Reserva_Pedido
     form_class = ReservaPedidoForm
     template_name = "clientes/reserva_form.html"
     success_url = reverse_lazy("clientes:mis_reservas")
 
+    # Clave antigua: los borradores se guardaban en la sesión
     SESSION_KEY = "reserva_en_construccion"
 
     def get_initial(self):
         initial = super().get_initial()
-        datos = self.request.session.get(self.SESSION_KEY)
-        if datos:
-            initial.update(datos)
+        self.request.session.pop(self.SESSION_KEY, None)
+        initial.update(leer_borrador(self.request.user))
         return initial
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["url_autoguardado"] = reverse("clientes:autoguardar_reserva")
+        context["clave_idempotencia"] = nueva_clave()
+        return context
+
     def form_invalid(self, form):
-        datos = self.request.POST.dict()
-        datos.pop("csrfmiddlewaretoken", None)
-        datos["productos"] = self.request.POST.getlist("productos")
-        self.request.session[self.SESSION_KEY] = datos
-        messages.warning(self.request, "Tu reserva se ha guardado temporalmente en sesión.")
+        guardar_borrador(self.request.user, datos_de_post(self.request.POST))
+        messages.warning(self.request, "Tu reserva se ha guardado como borrador.")
         return super().form_invalid(form)
 
     def form_valid(self, form):
         form.instance.cliente = self.request.user
-        # Si el modelo Reserva_Pedido no tiene campo empresa_id, no asignamos empresa aquí.
-        # La pertenencia a empresa se determina por cliente.perfil.empresa o por productos al confirmar.
+        # Empresa desnormalizada: la de los productos (ya cargados al validar el form)
+        form.instance.empresa_id = asignar_empresa(form, self.request.user)
         form.instance.estado = "PENDIENTE"
         response = super().form_valid(form)
-        if self.SESSION_KEY in self.request.session:
-            del self.request.session[self.SESSION_KEY]
+        borrar_borrador(self.request.user)
         messages.success(self.request, "Reserva creada correctamente.")
+        saturados = tramos_saturados(self.object)
+        if saturados:
+            messages.warning(
+                self.request,
+                f"La cocina está muy ocupada hacia las {saturados[0][0]:%H:%M}: tu reserva podría tardar algo más.",
+            )
         return response
 
 
-class ReservaPedidoUpdateView(LoginRequiredMixin, ClientePropietarioMixin, UpdateView):
+class ReservaPedidoUpdateView(LoginRequiredMixin, ClientePropietarioMixin, EdicionVersionadaMixin, UpdateView):
     model = Reserva_Pedido
     form_class = ReservaPedidoForm
     template_name = "clientes/reserva_form.html"
     success_url = reverse_lazy("clientes:mis_reservas")
+    # Se asignan en form_valid, no vienen del formulario
+    campos_extra = ("cliente", "empresa")
 
     def form_valid(self, form):
         form.instance.cliente = self.request.user
+        form.instance.empresa_id = asignar_empresa(form, self.request.user)
         return super().form_valid(form)
 
 
-class MisReservasListView(LoginRequiredMixin, ListView):
+class MisReservasListView(LoginRequiredMixin, ReplicaLecturaMixin, ListView):
     model = Reserva_Pedido
     template_name = "clientes/mis_reservas.html"
     context_object_name = "reservas"
@@ -207,6 +267,11 @@ class MisReservasListView(LoginRequiredMixin, ListView):
             .prefetch_related("productos")
         )
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["clave_idempotencia"] = nueva_clave()
+        return context
+
 
 class ReservaDetailView(LoginRequiredMixin, ClientePropietarioMixin, DetailView):
     model = Reserva_Pedido
@@ -214,27 +279,51 @@ class ReservaDetailView(LoginRequiredMixin, ClientePropietarioMixin, DetailView)
 
     def get_queryset(self):
         qs = super().get_queryset().filter(cliente=self.request.user)
-        # Reserva_Pedido no tiene FK directa a empresa; evitar select_related("empresa")
-        return qs.select_related("cliente").prefetch_related("productos")
+        return qs.select_related("cliente", "empresa").prefetch_related("productos")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        reserva = self.object
+        productos = list(reserva.productos.all())
+        # Precio a la hora de la reserva (franjas horarias incluidas), desde la tabla compilada.
+        # Cada producto de la reserva es una unidad: no se aplican tramos por cantidad.
+        precios = precios_efectivos([p.id for p in productos], momento=reserva.fecha, cantidad=1)
+        context["lineas"] = [(p, precios.get(p.id, p.precio)) for p in productos]
+        context["total"] = sum((precio for _, precio in context["lineas"]), 0)
+        return context
 
 
+@idempotente("cancelar_reserva")
 @login_required
+@require_POST
 def cancelar_reserva(request, pk):
     reserva = get_object_or_404(Reserva_Pedido, pk=pk, cliente=request.user)
     if reserva.estado == "CANCELADO":
         messages.warning(request, "La reserva ya estaba cancelada.")
         return redirect("clientes:mis_reservas")
     reserva.estado = "CANCELADO"
-    reserva.save()
+    try:
+        reserva.save(update_fields=["estado"])
+    except ConflictoDeVersion:
+        messages.error(request, MENSAJE_CONFLICTO)
+        return redirect("clientes:mis_reservas")
     messages.success(request, "Reserva cancelada.")
     return redirect("clientes:mis_reservas")
 
 
 @login_required
 def limpiar_reserva_sesion(request):
-    request.session.pop("reserva_en_construccion", None)
+    borrar_borrador(request.user)
     messages.info(request, "Reserva temporal eliminada.")
-    return redirect("reserva_create")
+    return redirect("clientes:reserva_create")
+
+
+@login_required
+@require_POST
+def autoguardar_reserva(request):
+    """Autoguardado en segundo plano del formulario de nueva reserva (sin tocar la sesión)."""
+    guardar_borrador(request.user, datos_de_post(request.POST))
+    return HttpResponse(status=204)
 
 
 def cambiar_tema(request):
@@ -17,6 +17,7 @@ django.setup()
 # ---------------------------
 from staff.models import Empresa, Producto, Categoria, Cupon
 from clientes.models import Usuario, Reserva_Pedido
+from clientes.utils import empresa_predominante
 
 # ---------------------------
 # Crear superuser de prueba
@@ -173,7 +174,9 @@ for i in range(10):
         estado=random.choice(ESTADOS),
         cliente=random.choice(usuarios)
     )
-    productos_random = Producto.objects.order_by("?")[:random.randint(1, 4)]
+    productos_random = list(Producto.objects.order_by("?")[:random.randint(1, 4)])
     r.productos.set(productos_random)
+    r.empresa_id = empresa_predominante(p.empresa_id for p in productos_random)
+    r.save(update_fields=["empresa"])
 
 print("Base de datos poblada correctamente con empresas reales 🎉")
@@ -1,5 +1,16 @@
+from django import forms
 from django.contrib import admin
-from .models import Empresa,Producto,Categoria,Cupon
+from django.core.files.uploadedfile import UploadedFile
+from django.db.models import OuterRef, Q, Subquery
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
+
+from chefquest.concurrencia import VersionadoAdminMixin, VersionFormMixin, VersionWidget
+from chefquest.perfilado import CABECERA, PARAMETRO, token_para
+
+from .imagenes import validar_imagen
+from .models import Empresa,Producto,Categoria,Cupon,ReglaPrecio,PrecioEfectivo,CartaProgramada,CartaPublicada,PerfilPeticion,PuntoCallejero,EventoOutbox,ConsumidorOutbox,ImagenProducto
 # Register your models here.
 """
 admin.site.register(Empresa)
@@ -20,8 +31,29 @@ class EmpresaAdmin(admin.ModelAdmin):
 # -----------------------------
 # Admin para Producto
 # -----------------------------
+class ProductoAdminForm(VersionFormMixin, forms.ModelForm):
+    # Declarado para que el admin lo incluya (oculto) en el formulario
+    version = forms.IntegerField(required=False, widget=forms.HiddenInput)
+
+    class Meta:
+        model = Producto
+        exclude = ("version",)
+
+    def clean_imagen(self):
+        imagen = self.cleaned_data.get("imagen")
+        if isinstance(imagen, UploadedFile):
+            validar_imagen(imagen)
+        return imagen
+
+
+class ProductoListaForm(ProductoAdminForm):
+    # En las filas editables de la lista la versión se ve en su columna
+    version_widget = VersionWidget
+
+
 @admin.register(Producto)
-class ProductoAdmin(admin.ModelAdmin):
+class ProductoAdmin(VersionadoAdminMixin, admin.ModelAdmin):
+    form = ProductoAdminForm
     list_display = (
         "nombre",
         "categoria",
@@ -30,8 +62,9 @@ class ProductoAdmin(admin.ModelAdmin):
         "precio_con_descuento",  # campo calculado
         "stock",
         "activo",
-        "producto_del_dia",    
-    )  
+        "producto_del_dia",
+        "version",
+    )
     list_filter = (
         "activo",
         "categoria",
@@ -47,8 +80,28 @@ class ProductoAdmin(admin.ModelAdmin):
     ordering = ("nombre",)
     list_editable = ("activo", "producto_del_dia", "stock")  # editable rápido desde la lista
 
+    def get_changelist_form(self, request, **kwargs):
+        return super().get_changelist_form(request, form=ProductoListaForm, **kwargs)
+
+    def get_queryset(self, request):
+        # Precio efectivo actual (cantidad 1) desde la tabla compilada, en la misma consulta
+        hora = timezone.localtime().time()
+        precio_actual = (
+            PrecioEfectivo.objects
+            .filter(producto=OuterRef("pk"), cantidad_minima=1, desde__lte=hora)
+            .filter(Q(hasta__gt=hora) | Q(hasta__isnull=True))
+            .values("precio")[:1]
+        )
+        return (
+            super().get_queryset(request)
+            .select_related("categoria__cupon", "empresa")
+            .annotate(precio_efectivo=Subquery(precio_actual))
+        )
+
     def precio_con_descuento(self, obj):
-        """Muestra el precio con descuento si tiene cupón"""
+        """Muestra el precio efectivo compilado (reglas y cupones)"""
+        if obj.precio_efectivo is not None:
+            return obj.precio_efectivo
         if obj.categoria and obj.categoria.cupon:
             descuento = obj.categoria.cupon.descuento
             return round(obj.precio * (100 - descuento) / 100, 2)
@@ -72,4 +125,160 @@ class CategoriaAdmin(admin.ModelAdmin):
 class CuponAdmin(admin.ModelAdmin):
     list_display = ("nombre", "descuento")
     search_fields = ("nombre",)
-    ordering = ("nombre",)
\ No newline at end of file
+    ordering = ("nombre",)
+
+# -----------------------------
+# Admin para ReglaPrecio
+# -----------------------------
+@admin.register(ReglaPrecio)
+class ReglaPrecioAdmin(admin.ModelAdmin):
+    list_display = (
+        "nombre",
+        "descuento",
+        "producto",
+        "categoria",
+        "empresa",
+        "hora_inicio",
+        "hora_fin",
+        "cantidad_minima",
+        "prioridad",
+        "acumulable",
+        "activo",
+    )
+    list_filter = ("activo", "acumulable", "empresa", "categoria")
+    search_fields = ("nombre", "producto__nombre")
+    list_select_related = ("producto", "categoria", "empresa")
+    autocomplete_fields = ("producto",)
+    ordering = ("-prioridad", "nombre")
+
+
+# -----------------------------
+# Admin para la carta del día
+# -----------------------------
+@admin.register(CartaProgramada)
+class CartaProgramadaAdmin(admin.ModelAdmin):
+    list_display = ("fecha", "empresa")
+    list_filter = ("empresa",)
+    date_hierarchy = "fecha"
+    filter_horizontal = ("productos",)
+    list_select_related = ("empresa",)
+    ordering = ("-fecha",)
+
+
+@admin.register(CartaPublicada)
+class CartaPublicadaAdmin(admin.ModelAdmin):
+    # Solo lectura: las versiones publicadas son inmutables
+    list_display = ("fecha", "empresa", "version", "publicada_en")
+    list_filter = ("empresa",)
+    date_hierarchy = "fecha"
+    list_select_related = ("empresa",)
+    ordering = ("-fecha", "-version")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# -----------------------------
+# Admin para el callejero de reparto
+# -----------------------------
+@admin.register(PuntoCallejero)
+class PuntoCallejeroAdmin(admin.ModelAdmin):
+    list_display = ("calle", "numero", "latitud", "longitud")
+    search_fields = ("calle",)
+    ordering = ("calle", "numero")
+    show_full_result_count = False
+
+
+# -----------------------------
+# Admin para la outbox de eventos (solo lectura: la tabla solo crece)
+# -----------------------------
+@admin.register(EventoOutbox)
+class EventoOutboxAdmin(admin.ModelAdmin):
+    list_display = ("id", "creado", "tipo", "modelo", "objeto_id", "empresa")
+    list_filter = ("tipo",)
+    list_select_related = ("empresa",)
+    ordering = ("-id",)
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ConsumidorOutbox)
+class ConsumidorOutboxAdmin(admin.ModelAdmin):
+    list_display = ("nombre", "posicion", "pendientes", "actualizado")
+    ordering = ("nombre",)
+
+    @admin.display(description="Eventos pendientes")
+    def pendientes(self, obj):
+        return EventoOutbox.objects.filter(pk__gt=obj.posicion).count()
+
+
+# -----------------------------
+# Admin para las imágenes procesadas (borrar una fila la vuelve a poner en cola)
+# -----------------------------
+@admin.register(ImagenProducto)
+class ImagenProductoAdmin(admin.ModelAdmin):
+    list_display = ("original", "ancho", "alto", "anchos", "error", "procesada")
+    search_fields = ("original",)
+    ordering = ("-procesada",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# -----------------------------
+# Admin para los perfiles de peticiones (solo superusuarios)
+# -----------------------------
+@admin.register(PerfilPeticion)
+class PerfilPeticionAdmin(admin.ModelAdmin):
+    change_list_template = "admin/staff/perfilpeticion/change_list.html"
+    list_display = ("creado", "metodo", "ruta", "estado", "duracion_ms", "consultas", "sql_ms", "plantillas_ms", "usuario", "ficheros")
+    list_filter = ("metodo", "estado")
+    search_fields = ("ruta",)
+    date_hierarchy = "creado"
+    list_select_related = ("usuario",)
+    ordering = ("-creado",)
+
+    @admin.display(description="Ficheros")
+    def ficheros(self, obj):
+        return format_html_join(
+            " ", '<a href="{}">{}</a>',
+            (
+                (reverse("staff:descargar_perfil", args=[obj.nombre, extension.lstrip(".")]), extension)
+                for extension in PerfilPeticion.EXTENSIONES
+            ),
+        )
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {
+            **(extra_context or {}),
+            "token_perfil": token_para(request.user),
+            "cabecera_perfil": CABECERA[len("HTTP_"):].replace("_", "-").title(),
+            "parametro_perfil": PARAMETRO,
+        }
+        return super().changelist_view(request, extra_context)
+
+    def has_module_permission(self, request):
+        return request.user.is_superuser
+
+    def has_view_permission(self, request, obj=None):
+        return request.user.is_superuser
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,185 @@
+# staff/analitica.py
+"""
+Analítica de reservas para el panel de estadísticas.
+
+Las reservas de la empresa se leen como columnas (values_list por lotes a arrays
+de NumPy) y todas las series se calculan de una pasada con bincount: pedidos por
+día y por hora según tipo, media móvil, embudo de estados, distribución de
+comensales y productos más pedidos.
+"""
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from clientes.models import Reserva_Pedido
+
+TAMANO_LOTE = 20000
+VENTANA_MEDIA = 7
+MAX_COMENSALES = 20  # el último tramo agrupa "20 o más"
+DIAS_FUTURO = 60  # también se incluyen las reservas ya hechas para los próximos días
+TOP_PRODUCTOS = 10
+
+TIPOS = [clave for clave, _ in Reserva_Pedido.TIPO_CHOICES]
+ESTADOS = [clave for clave, _ in Reserva_Pedido.ESTADOS_CHOICES]
+
+
+# ==============================
+# CARGA EN COLUMNAS
+# ==============================
+
+def cargar_columnas(empresa_id, desde, hasta):
+    """
+    Devuelve un dict de arrays: segundos (epoch UTC), tipo y estado (códigos según
+    TIPOS/ESTADOS) y comensales, de las reservas con desde <= fecha < hasta.
+    """
+    codigo_tipo = {t: i for i, t in enumerate(TIPOS)}
+    codigo_estado = {e: i for i, e in enumerate(ESTADOS)}
+    filas = (
+        Reserva_Pedido.objects
+        .filter(empresa_id=empresa_id, fecha__gte=desde, fecha__lt=hasta)
+        .order_by()
+        .values_list("fecha", "tipo", "estado", "comensales")
+        .iterator(chunk_size=TAMANO_LOTE)
+    )
+
+    trozos = []
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= TAMANO_LOTE:
+            trozos.append(_a_columnas(lote, codigo_tipo, codigo_estado))
+            lote = []
+    if lote or not trozos:
+        trozos.append(_a_columnas(lote, codigo_tipo, codigo_estado))
+    return {clave: np.concatenate([t[clave] for t in trozos]) for clave in trozos[0]}
+
+
+def _a_columnas(lote, codigo_tipo, codigo_estado):
+    n = len(lote)
+    return {
+        "segundos": np.fromiter((f[0].timestamp() for f in lote), dtype=np.int64, count=n),
+        "tipo": np.fromiter((codigo_tipo.get(f[1], 0) for f in lote), dtype=np.int64, count=n),
+        "estado": np.fromiter((codigo_estado.get(f[2], 0) for f in lote), dtype=np.int64, count=n),
+        "comensales": np.fromiter((f[3] for f in lote), dtype=np.int64, count=n),
+    }
+
+
+def a_hora_local(segundos):
+    """
+    Segundos UTC -> segundos en la zona horaria actual. El desfase se calcula una vez
+    por hora distinta (unas pocas miles como mucho), no por reserva.
+    """
+    if not segundos.size:
+        return segundos
+    zona = timezone.get_current_timezone()
+    horas, inversa = np.unique(segundos // 3600, return_inverse=True)
+    desfases = np.array(
+        [datetime.fromtimestamp(int(h) * 3600, zona).utcoffset().total_seconds() for h in horas],
+        dtype=np.int64,
+    )
+    return segundos + desfases[inversa]
+
+
+def media_movil(valores, ventana=VENTANA_MEDIA):
+    """Media de los últimos `ventana` valores (los primeros usan los que haya)."""
+    acumulado = np.concatenate(([0], np.cumsum(valores)))
+    fin = np.arange(1, len(valores) + 1)
+    inicio = np.maximum(0, fin - ventana)
+    return (acumulado[fin] - acumulado[inicio]) / (fin - inicio)
+
+
+# ==============================
+# SERIES
+# ==============================
+
+def calcular_series(columnas, primer_dia, num_dias):
+    """
+    `primer_dia`: date local del primer día de la serie diaria. Devuelve un dict
+    serializable a JSON con todas las series.
+    """
+    locales = a_hora_local(columnas["segundos"])
+    dia = locales // 86400 - (primer_dia - date(1970, 1, 1)).days
+    hora = (locales % 86400) // 3600
+    tipo = columnas["tipo"]
+    estado = columnas["estado"]
+    comensales = columnas["comensales"]
+    nt = len(TIPOS)
+
+    dentro = (dia >= 0) & (dia < num_dias)
+    por_dia = np.bincount(dia[dentro] * nt + tipo[dentro], minlength=num_dias * nt).reshape(num_dias, nt)
+    por_hora = np.bincount(hora * nt + tipo, minlength=24 * nt).reshape(24, nt)
+    total_dia = por_dia.sum(axis=1)
+    embudo = np.bincount(estado, minlength=len(ESTADOS))
+    tramos_comensales = np.bincount(np.minimum(comensales, MAX_COMENSALES), minlength=MAX_COMENSALES + 1)
+
+    return {
+        "total": int(tipo.size),
+        "por_dia": {
+            "fechas": [(primer_dia + timedelta(days=i)).isoformat() for i in range(num_dias)],
+            "series": {t: por_dia[:, i].tolist() for i, t in enumerate(TIPOS)},
+            "total": total_dia.tolist(),
+            "media_movil": np.round(media_movil(total_dia), 2).tolist(),
+        },
+        "por_hora": {
+            "horas": list(range(24)),
+            "series": {t: por_hora[:, i].tolist() for i, t in enumerate(TIPOS)},
+        },
+        "embudo": [
+            {"estado": e, "nombre": nombre, "total": int(embudo[i])}
+            for i, (e, nombre) in enumerate(Reserva_Pedido.ESTADOS_CHOICES)
+        ],
+        "comensales": {
+            "etiquetas": [str(i) for i in range(MAX_COMENSALES)] + [f"{MAX_COMENSALES}+"],
+            "totales": tramos_comensales.tolist(),
+            "media": round(float(comensales.mean()), 2) if comensales.size else None,
+            "mediana": float(np.median(comensales)) if comensales.size else None,
+            "p90": float(np.percentile(comensales, 90)) if comensales.size else None,
+        },
+    }
+
+
+def top_productos(empresa_id, desde, hasta, limite=TOP_PRODUCTOS):
+    """Productos más pedidos: cuenta los enlaces reserva-producto con np.unique."""
+    from .models import Producto
+
+    Enlace = Reserva_Pedido.productos.through
+    ids = np.fromiter(
+        Enlace.objects
+        .filter(
+            reserva_pedido__empresa_id=empresa_id,
+            reserva_pedido__fecha__gte=desde,
+            reserva_pedido__fecha__lt=hasta,
+        )
+        .values_list("producto_id", flat=True)
+        .iterator(chunk_size=TAMANO_LOTE),
+        dtype=np.int64,
+    )
+    if not ids.size:
+        return []
+    unicos, totales = np.unique(ids, return_counts=True)
+    orden = np.argsort(-totales, kind="stable")[:limite]
+    nombres = dict(Producto.objects.filter(pk__in=unicos[orden].tolist()).values_list("pk", "nombre"))
+    return [
+        {"id": int(unicos[i]), "nombre": nombres.get(int(unicos[i]), ""), "total": int(totales[i])}
+        for i in orden
+    ]
+
+
+def analitica_empresa(empresa_id, dias=90):
+    """Todas las series del panel para los últimos `dias` días (y los próximos DIAS_FUTURO)."""
+    hoy = timezone.localdate()
+    primer_dia = hoy - timedelta(days=dias - 1)
+    num_dias = dias + DIAS_FUTURO
+    desde = timezone.make_aware(datetime.combine(primer_dia, datetime.min.time()))
+    hasta = desde + timedelta(days=num_dias)
+
+    columnas = cargar_columnas(empresa_id, desde, hasta)
+    datos = calcular_series(columnas, primer_dia, num_dias)
+    datos.update({
+        "desde": primer_dia.isoformat(),
+        "hasta": (primer_dia + timedelta(days=num_dias - 1)).isoformat(),
+        "tipos": [{"clave": t, "nombre": n} for t, n in Reserva_Pedido.TIPO_CHOICES],
+        "top_productos": top_productos(empresa_id, desde, hasta),
+    })
+    return datos
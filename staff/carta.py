@@ -0,0 +1,114 @@
+# staff/carta.py
+"""
+Publicación de la "carta del día".
+
+Cada empresa programa con antelación sus productos destacados (CartaProgramada).
+El comando `publicar_cartas` renderiza cada día en una CartaPublicada inmutable
+(JSON + fragmento HTML). Las cartas de mañana se publican por adelantado, así que
+el cambio de día es atómico: a medianoche la consulta por fecha pasa a devolver
+la nueva instantánea sin tocar ninguna fila.
+"""
+import hashlib
+import json
+from datetime import datetime, time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import CartaProgramada, CartaPublicada, Empresa, Producto
+from .precios import precios_efectivos
+
+
+def productos_de_la_carta(empresa_id, fecha):
+    """Productos programados para ese día o, si no hay programación, los marcados como 'producto del día'."""
+    programada = CartaProgramada.objects.filter(empresa_id=empresa_id, fecha=fecha).first()
+    if programada:
+        qs = programada.productos.all()
+    else:
+        qs = Producto.objects.filter(empresa_id=empresa_id, producto_del_dia=True)
+    return list(qs.filter(activo=True).select_related("categoria", "empresa").order_by("nombre"))
+
+
+def construir_contenido(empresa, fecha, productos):
+    # Precio de referencia: el de mediodía de ese día
+    momento = timezone.make_aware(datetime.combine(fecha, time(12)))
+    precios = precios_efectivos([p.id for p in productos], momento=momento)
+    return {
+        "empresa": {"id": empresa.id, "nombre": empresa.nombre_comercial},
+        "fecha": fecha.isoformat(),
+        "productos": [
+            {
+                "id": p.id,
+                "nombre": p.nombre,
+                "descripcion": p.descripcion,
+                "precio": str(p.precio),
+                "precio_descuento": str(precios.get(p.id, p.precio)),
+                "categoria": p.categoria.nombre if p.categoria else None,
+            }
+            for p in productos
+        ],
+    }
+
+
+def publicar_carta(empresa, fecha):
+    """
+    Publica la carta de una empresa para un día. Si el contenido no ha cambiado
+    respecto a la última versión, no crea nada y devuelve None.
+    """
+    productos = productos_de_la_carta(empresa.id, fecha)
+    contenido = construir_contenido(empresa, fecha, productos)
+    huella = hashlib.sha256(
+        json.dumps(contenido, sort_keys=True, cls=DjangoJSONEncoder).encode()
+    ).hexdigest()
+
+    ultima = (
+        CartaPublicada.objects
+        .filter(empresa=empresa, fecha=fecha)
+        .order_by("-version")
+        .values_list("version", "huella")
+        .first()
+    )
+    if ultima and ultima[1] == huella:
+        return None
+
+    version = (ultima[0] if ultima else 0) + 1
+    contenido["version"] = version
+    html = render_to_string("staff/carta_del_dia_fragmento.html", {"carta": contenido})
+    try:
+        with transaction.atomic():
+            return CartaPublicada.objects.create(
+                empresa=empresa, fecha=fecha, version=version,
+                contenido=contenido, html=html, huella=huella,
+            )
+    except IntegrityError:
+        # Otro proceso publicó la misma versión a la vez; la suya es igual de válida
+        return None
+
+
+def publicar_cartas(fecha, empresas=None):
+    """Publica las cartas del día para todas las empresas activas. Devuelve las versiones nuevas."""
+    if empresas is None:
+        empresas = Empresa.objects.filter(activo=True)
+    return [c for c in (publicar_carta(e, fecha) for e in empresas) if c]
+
+
+def cartas_del_dia(fecha=None):
+    """
+    Última versión publicada de cada empresa para el día indicado (hoy por defecto).
+    Las cartas sin productos no se devuelven.
+    """
+    fecha = fecha or timezone.localdate()
+    ultimas = (
+        CartaPublicada.objects
+        .filter(fecha=fecha)
+        .values("empresa_id")
+        .annotate(ultima=Max("version"))
+    )
+    filtro = {(u["empresa_id"], u["ultima"]) for u in ultimas}
+    if not filtro:
+        return []
+    cartas = CartaPublicada.objects.filter(fecha=fecha, empresa_id__in={e for e, _ in filtro}).order_by("empresa_id")
+    return [c for c in cartas if (c.empresa_id, c.version) in filtro and c.contenido.get("productos")]
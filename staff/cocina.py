@@ -0,0 +1,299 @@
+# staff/cocina.py
+"""
+Planificador de carga de cocina por empresa.
+
+Cada reserva confirmada entra en una cola de prioridad (heap) ordenada por la hora
+a la que hay que empezar a prepararla: fecha - duración, donde la duración es el
+mayor tiempo de preparación de sus productos (los platos se hacen en paralelo).
+Su carga (minutos de trabajo: la suma de los tiempos, por comensal en LOCAL y
+EVENTO) se reparte entre los tramos de 15 minutos que van del inicio a la fecha.
+
+La cola vive en la caché compartida y se mantiene de forma incremental con las
+señales de Reserva_Pedido (añadir, quitar); solo se reconstruye desde la base de
+datos si no está en la caché. Un tramo está saturado cuando su carga supera la
+capacidad de la empresa (Empresa.capacidad_cocina, minutos de trabajo por tramo).
+
+Una cola reconstruida es una foto de la base de datos: solo se guarda con el
+cerrojo y si nadie ha anotado un cambio mientras se construía. Quien cambia una
+reserva sin tocar la cola (porque no está en la caché) anota el cambio antes de
+mirar la caché; así, o el que reconstruye ve la anotación y no guarda, o el que
+cambia ve la cola guardada y la actualiza.
+"""
+import heapq
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from clientes.models import Reserva_Pedido
+
+TRAMO = 15 * 60  # segundos
+ESPERA_CERROJO = 2  # segundos
+POR_COMENSAL = ("LOCAL", "EVENTO")
+
+
+def _clave(empresa_id):
+    return f"cocina:{empresa_id}"
+
+
+def inicio_tramo(segundos):
+    return int(segundos) - int(segundos) % TRAMO
+
+
+def como_fecha(segundos):
+    return datetime.fromtimestamp(segundos, tz=dt_timezone.utc)
+
+
+def carga_de_reserva(tipo, comensales, duracion, suma_tiempos):
+    """Minutos de trabajo de cocina de una reserva (duracion/suma_tiempos de sus productos, en minutos)."""
+    if not duracion:
+        return 0
+    return suma_tiempos * (max(comensales, 1) if tipo in POR_COMENSAL else 1)
+
+
+def tiempos_de_productos(reserva_ids):
+    """{reserva_id: (duración, suma de tiempos)} en una sola consulta agregada."""
+    return {
+        r["reserva_pedido_id"]: (r["duracion"] or 0, r["suma"] or 0)
+        for r in (
+            Reserva_Pedido.productos.through.objects
+            .filter(reserva_pedido_id__in=reserva_ids)
+            .values("reserva_pedido_id")
+            .annotate(duracion=Max("producto__tiempo_preparacion"), suma=Sum("producto__tiempo_preparacion"))
+        )
+    }
+
+
+# ==============================
+# COLA
+# ==============================
+
+class ColaCocina:
+    """
+    heap:    (inicio, fecha, reserva_id) de las reservas, ordenado por inicio. Las
+             entradas retiradas o sustituidas se descartan al llegar a la cima.
+    activas: reserva_id -> (inicio, fecha, carga), lo que vale de verdad.
+    tramos:  inicio del tramo -> minutos de trabajo previstos.
+    """
+
+    def __init__(self, heap=None, activas=None, tramos=None):
+        self.heap = heap or []
+        self.activas = activas or {}
+        self.tramos = tramos or {}
+
+    def estado(self):
+        return {"heap": self.heap, "activas": self.activas, "tramos": self.tramos}
+
+    def _repartir(self, inicio, fecha, carga, signo):
+        duracion = fecha - inicio
+        tramo = inicio_tramo(inicio)
+        while tramo < fecha:
+            solape = min(fecha, tramo + TRAMO) - max(inicio, tramo)
+            minutos = self.tramos.get(tramo, 0) + signo * carga * solape / duracion
+            if minutos > 1e-6:
+                self.tramos[tramo] = minutos
+            else:
+                self.tramos.pop(tramo, None)
+            tramo += TRAMO
+
+    def anadir(self, reserva_id, fecha, duracion, carga):
+        """Añade o sustituye una reserva (fecha en segundos, duracion en minutos)."""
+        self.quitar(reserva_id)
+        if not duracion or not carga:
+            return
+        inicio = fecha - duracion * 60
+        self.activas[reserva_id] = (inicio, fecha, carga)
+        heapq.heappush(self.heap, (inicio, fecha, reserva_id))
+        self._repartir(inicio, fecha, carga, 1)
+
+    def quitar(self, reserva_id):
+        entrada = self.activas.pop(reserva_id, None)
+        if entrada:
+            self._repartir(*entrada, -1)
+
+    def _vigente(self, entrada):
+        inicio, fecha, reserva_id = entrada
+        actual = self.activas.get(reserva_id)
+        return actual is not None and actual[:2] == (inicio, fecha)
+
+    def purgar(self, ahora):
+        """Olvida las reservas ya servidas y los tramos pasados; compacta el heap si hace falta."""
+        for reserva_id, (inicio, fecha, carga) in list(self.activas.items()):
+            if fecha <= ahora:
+                del self.activas[reserva_id]
+        tramo_actual = inicio_tramo(ahora)
+        for tramo in [t for t in self.tramos if t < tramo_actual]:
+            del self.tramos[tramo]
+        while self.heap and not self._vigente(self.heap[0]):
+            heapq.heappop(self.heap)
+        if len(self.heap) > 2 * len(self.activas) + 16:
+            self.heap = [e for e in self.heap if self._vigente(e)]
+            heapq.heapify(self.heap)
+
+    def siguientes(self, limite=20):
+        """Las próximas reservas a empezar, en orden: (inicio, fecha, reserva_id, carga)."""
+        vigentes = heapq.nsmallest(limite, (e for e in self.heap if self._vigente(e)))
+        return [(i, f, r, self.activas[r][2]) for i, f, r in vigentes]
+
+    def carga(self, desde, hasta):
+        """[(tramo, minutos)] de desde a hasta (segundos), incluidos los tramos vacíos."""
+        return [(t, self.tramos.get(t, 0)) for t in range(inicio_tramo(desde), hasta, TRAMO)]
+
+    def saturados(self, capacidad, fecha, duracion, carga):
+        """
+        Tramos que superarían `capacidad` si se añadiera una reserva con esta fecha,
+        duración y carga: [(tramo, minutos previstos con ella)].
+        """
+        if not duracion or not carga:
+            return []
+        prueba = ColaCocina(tramos={})
+        prueba._repartir(fecha - duracion * 60, fecha, carga, 1)
+        return [
+            (tramo, self.tramos.get(tramo, 0) + minutos)
+            for tramo, minutos in sorted(prueba.tramos.items())
+            if self.tramos.get(tramo, 0) + minutos > capacidad
+        ]
+
+
+def construir_cola(empresa_id, ahora):
+    """Reconstruye la cola desde la base de datos (solo si no estaba en la caché)."""
+    reservas = list(
+        Reserva_Pedido.objects
+        .filter(empresa_id=empresa_id, estado="CONFIRMADO", fecha__gt=como_fecha(ahora))
+        .values_list("pk", "fecha", "tipo", "comensales")
+    )
+    tiempos = tiempos_de_productos([pk for pk, *_ in reservas])
+    cola = ColaCocina()
+    for pk, fecha, tipo, comensales in reservas:
+        duracion, suma = tiempos.get(pk, (0, 0))
+        cola.anadir(pk, int(fecha.timestamp()), duracion, carga_de_reserva(tipo, comensales, duracion, suma))
+    return cola
+
+
+def _clave_cambios(empresa_id):
+    return f"{_clave(empresa_id)}:cambios"
+
+
+def _anotar_cambio(empresa_id):
+    cache.set(_clave_cambios(empresa_id), time.time_ns(), timeout=None)
+
+
+def _cargar(empresa_id):
+    """(cola, anotación leída antes de reconstruirla o None si venía de la caché)."""
+    ahora = int(time.time())
+    estado = cache.get(_clave(empresa_id))
+    if estado:
+        cola, cambios = ColaCocina(**estado), None
+    else:
+        cambios = cache.get(_clave_cambios(empresa_id), 0)
+        cola = construir_cola(empresa_id, ahora)
+    cola.purgar(ahora)
+    return cola, cambios
+
+
+def _guardar(empresa_id, cola, cambios):
+    """Guarda la cola (con el cerrojo). Si era una reconstrucción y hubo cambios entretanto, la descarta."""
+    cache.set(_clave(empresa_id), cola.estado(), timeout=None)
+    if cambios is not None and cache.get(_clave_cambios(empresa_id), 0) != cambios:
+        cache.delete(_clave(empresa_id))
+
+
+def _tomar_cerrojo(empresa_id, espera):
+    cerrojo = f"{_clave(empresa_id)}:cerrojo"
+    limite = time.monotonic() + espera
+    bloqueada = cache.add(cerrojo, 1, timeout=ESPERA_CERROJO)
+    while not bloqueada and time.monotonic() < limite:
+        time.sleep(0.01)
+        bloqueada = cache.add(cerrojo, 1, timeout=ESPERA_CERROJO)
+    return bloqueada
+
+
+def leer_cola(empresa_id):
+    """Cola de la empresa. Si hay que reconstruirla, solo se guarda si el cerrojo está libre."""
+    cola, cambios = _cargar(empresa_id)
+    if cambios is not None and _tomar_cerrojo(empresa_id, espera=0):
+        try:
+            if cache.get(_clave(empresa_id)) is None:
+                _guardar(empresa_id, cola, cambios)
+        finally:
+            cache.delete(f"{_clave(empresa_id)}:cerrojo")
+    return cola
+
+
+@contextmanager
+def modificar_cola(empresa_id):
+    """Lee la cola, la deja modificar y la guarda, con un cerrojo en la caché entre procesos."""
+    if not _tomar_cerrojo(empresa_id, espera=ESPERA_CERROJO):
+        # Sin cerrojo no se escribe: se descarta la cola y la próxima lectura la reconstruye
+        olvidar_cola(empresa_id)
+        yield ColaCocina()
+        return
+    try:
+        cola, cambios = _cargar(empresa_id)
+        yield cola
+        _guardar(empresa_id, cola, cambios)
+    finally:
+        cache.delete(f"{_clave(empresa_id)}:cerrojo")
+
+
+def olvidar_cola(empresa_id):
+    _anotar_cambio(empresa_id)
+    cache.delete(_clave(empresa_id))
+
+
+# ==============================
+# USO DESDE VISTAS Y SEÑALES
+# ==============================
+
+def actualizar_reserva(reserva):
+    """Refleja en la cola el estado actual de una reserva (confirmada o no)."""
+    if not reserva.empresa_id:
+        return
+    confirmada = reserva.estado == "CONFIRMADO" and reserva.fecha.timestamp() > time.time()
+    if not confirmada:
+        # Caso habitual (reservas nuevas, pendientes): basta una lectura para ver que no está.
+        # La anotación va antes: una reconstrucción en curso no debe guardar una foto anterior
+        _anotar_cambio(reserva.empresa_id)
+        estado = cache.get(_clave(reserva.empresa_id))
+        if not estado or reserva.pk not in estado["activas"]:
+            return
+    with modificar_cola(reserva.empresa_id) as cola:
+        if confirmada:
+            duracion, suma = tiempos_de_productos([reserva.pk]).get(reserva.pk, (0, 0))
+            carga = carga_de_reserva(reserva.tipo, reserva.comensales, duracion, suma)
+            cola.anadir(reserva.pk, int(reserva.fecha.timestamp()), duracion, carga)
+        else:
+            cola.quitar(reserva.pk)
+
+
+def quitar_reserva(empresa_id, reserva_id):
+    if not empresa_id:
+        return
+    _anotar_cambio(empresa_id)
+    estado = cache.get(_clave(empresa_id))
+    if estado and reserva_id in estado["activas"]:
+        with modificar_cola(empresa_id) as cola:
+            cola.quitar(reserva_id)
+
+
+def tramos_saturados(reserva):
+    """
+    Tramos que quedarían por encima de la capacidad de la cocina con esta reserva:
+    [(hora local del tramo, minutos previstos)]. No modifica la cola.
+    """
+    from .models import Empresa
+
+    if not reserva.empresa_id:
+        return []
+    capacidad = Empresa.objects.filter(pk=reserva.empresa_id).values_list("capacidad_cocina", flat=True).first()
+    duracion, suma = tiempos_de_productos([reserva.pk]).get(reserva.pk, (0, 0))
+    carga = carga_de_reserva(reserva.tipo, reserva.comensales, duracion, suma)
+    cola = leer_cola(reserva.empresa_id)
+    cola.quitar(reserva.pk)  # por si ya estaba confirmada (edición)
+    return [
+        (timezone.localtime(como_fecha(tramo)), round(minutos))
+        for tramo, minutos in cola.saturados(capacidad or 0, int(reserva.fecha.timestamp()), duracion, carga)
+    ]
@@ -0,0 +1,42 @@
+# staff/codigos.py
+"""
+Asignación de códigos de empresa.
+
+En PostgreSQL los códigos salen de la secuencia staff_empresa_codigo_seq
+(un solo round-trip para N códigos). En otros motores se reserva un bloque
+en SecuenciaCodigo bajo SELECT ... FOR UPDATE. En ambos casos dos procesos
+concurrentes nunca reciben el mismo código. La secuencia (o la fila inicial
+de SecuenciaCodigo) se crea en la migración staff 0006.
+"""
+from django.db import connection, transaction
+from django.db.models import F
+
+NOMBRE_SECUENCIA = "staff_empresa_codigo_seq"
+CODIGO_INICIAL = 100000
+
+
+def valor_inicial(empresa_model):
+    """Primer código libre por encima de los ya existentes (aleatorios, id + 1000, manuales)."""
+    maximo = empresa_model.objects.order_by("-codigo").values_list("codigo", flat=True).first()
+    return max((maximo or 0) + 1, CODIGO_INICIAL)
+
+
+def reservar_codigos(cantidad):
+    """Devuelve `cantidad` códigos de empresa nuevos y únicos."""
+    if cantidad <= 0:
+        return []
+
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval(%s) FROM generate_series(1, %s)", [NOMBRE_SECUENCIA, cantidad])
+            return sorted(r[0] for r in cursor.fetchall())
+
+    from .models import Empresa, SecuenciaCodigo
+
+    with transaction.atomic():
+        fila = SecuenciaCodigo.objects.select_for_update().filter(nombre=NOMBRE_SECUENCIA).first()
+        if fila is None:
+            fila = SecuenciaCodigo.objects.create(nombre=NOMBRE_SECUENCIA, siguiente=valor_inicial(Empresa))
+        inicio = fila.siguiente
+        SecuenciaCodigo.objects.filter(pk=fila.pk).update(siguiente=F("siguiente") + cantidad)
+    return list(range(inicio, inicio + cantidad))
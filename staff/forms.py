@@ -2,11 +2,14 @@
 
 from django import forms
 from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
 from django.core.validators import validate_email
+from chefquest.concurrencia import VersionFormMixin
+from .imagenes import validar_imagen
 from .models import Producto, Empresa
 
 
-class ProductoFormStaff(forms.ModelForm):
+class ProductoFormStaff(VersionFormMixin, forms.ModelForm):
     class Meta:
         model = Producto
         fields = [
@@ -15,10 +18,19 @@ class ProductoFormStaff(forms.ModelForm):
             "precio",
             "coste",
             "stock",
+            "tiempo_preparacion",
             "activo",
             "categoria",
+            "imagen",
         ]
 
+    def clean_imagen(self):
+        imagen = self.cleaned_data.get("imagen")
+        # Solo se valida una subida nueva (no la imagen que ya tenía el producto)
+        if isinstance(imagen, UploadedFile):
+            validar_imagen(imagen)
+        return imagen
+
     def clean_precio(self):
         precio = self.cleaned_data.get("precio")
         if precio is None:
@@ -0,0 +1,209 @@
+# staff/imagenes.py
+"""
+Imágenes de productos: validación de la subida, miniaturas y datos para `srcset`.
+
+- Los originales se guardan en el almacén "imagenes" (chefquest.storage.AlmacenPorContenido)
+  con el hash del contenido como nombre. No se procesan en la petición de subida.
+- `manage.py procesar_imagenes` genera fuera de línea, en un pool de procesos,
+  una miniatura WebP y otra JPEG por cada ancho de IMAGENES_ANCHOS (sin ampliar
+  el original): `miniaturas/ab/cdef...-320.webp`. Cada fichero se escribe en un
+  temporal y se renombra, así que una interrupción no deja miniaturas a medias.
+- El resultado de cada imagen se guarda en ImagenProducto en cuanto termina: al
+  volver a ejecutarlo se sigue por las pendientes, y reprocesar (--todas) solo
+  crea los ficheros que falten.
+- Hasta que una imagen está procesada, la carta no la muestra: nunca se sirve
+  el original a tamaño completo.
+
+Pillow solo se importa al validar y al procesar.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections
+
+from chefquest import versiones
+from chefquest.storage import almacen_imagenes
+
+from .models import ImagenProducto, Producto
+
+CARPETA_ORIGINALES = "productos"
+CARPETA_MINIATURAS = "miniaturas"
+
+# extensión -> (formato de Pillow, opciones de guardado); en este orden en <picture>
+FORMATOS = {
+    "webp": ("WEBP", {"quality": 80, "method": 6}),
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+# Formato detectado por Pillow -> extensión con la que se guarda (nunca la del cliente)
+FORMATOS_ADMITIDOS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp"}
+
+
+# ==============================
+# SUBIDA
+# ==============================
+
+def validar_imagen(fichero):
+    """Comprueba tamaño y formato de una imagen subida (sin decodificarla entera)."""
+    from PIL import Image, UnidentifiedImageError
+
+    if fichero.size > settings.IMAGENES_MAX_MB * 1024 * 1024:
+        raise ValidationError(f"La imagen no puede superar {settings.IMAGENES_MAX_MB:g} MB.")
+    try:
+        fichero.seek(0)
+        with Image.open(fichero) as imagen:
+            formato = imagen.format
+            imagen.verify()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ValidationError("El fichero no es una imagen válida.")
+    finally:
+        fichero.seek(0)
+    if formato not in FORMATOS_ADMITIDOS:
+        raise ValidationError("Formatos admitidos: JPEG, PNG y WebP.")
+    fichero.name = os.path.splitext(os.path.basename(fichero.name))[0] + FORMATOS_ADMITIDOS[formato]
+    return fichero
+
+
+# ==============================
+# MINIATURAS (en los procesos del pool)
+# ==============================
+
+def nombre_miniatura(original, ancho, extension):
+    # productos/ab/cdef.jpg -> miniaturas/ab/cdef-320.webp
+    base = os.path.splitext(original.split("/", 1)[1])[0]
+    return f"{CARPETA_MINIATURAS}/{base}-{ancho}.{extension}"
+
+
+def anchos_para(ancho_original):
+    return sorted({min(ancho, ancho_original) for ancho in settings.IMAGENES_ANCHOS})
+
+
+def _iniciar_proceso():
+    # Con el método "spawn" (macOS, Windows) el proceso hijo empieza sin Django configurado
+    import django
+    django.setup()
+
+
+def _escribir(imagen, ruta, formato, opciones):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    try:
+        imagen.save(temporal, formato, **opciones)
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def generar_miniaturas(original):
+    """Crea las miniaturas que falten de `original`. Devuelve (original, ancho, alto, anchos)."""
+    from PIL import Image, ImageOps
+
+    almacen = almacen_imagenes()
+    with almacen.open(original, "rb") as fichero, Image.open(fichero) as imagen:
+        imagen = ImageOps.exif_transpose(imagen)  # fotos de móvil giradas por EXIF
+        if imagen.mode in ("RGBA", "LA", "P"):
+            # JPEG no tiene transparencia: se aplana sobre blanco
+            imagen = imagen.convert("RGBA")
+            fondo = Image.new("RGB", imagen.size, "white")
+            fondo.paste(imagen, mask=imagen.getchannel("A"))
+            imagen = fondo
+        elif imagen.mode != "RGB":
+            imagen = imagen.convert("RGB")
+
+        ancho, alto = imagen.size
+        anchos = anchos_para(ancho)
+        for a in anchos:
+            reducida = None
+            for extension, (formato, opciones) in FORMATOS.items():
+                ruta = almacen.path(nombre_miniatura(original, a, extension))
+                if os.path.exists(ruta):
+                    continue
+                if reducida is None:
+                    reducida = imagen if a == ancho else imagen.resize(
+                        (a, max(round(alto * a / ancho), 1)), Image.Resampling.LANCZOS
+                    )
+                _escribir(reducida, ruta, formato, opciones)
+    return original, ancho, alto, anchos
+
+
+# ==============================
+# COLA DE PENDIENTES
+# ==============================
+
+def pendientes(todas=False):
+    """Nombres de originales usados por algún producto y aún sin procesar (o todos)."""
+    nombres = Producto.objects.exclude(imagen="").order_by().values_list("imagen", flat=True).distinct()
+    if not todas:
+        nombres = nombres.exclude(imagen__in=ImagenProducto.objects.values("original"))
+    return list(nombres)
+
+
+def _guardar(original, **datos):
+    ImagenProducto.objects.update_or_create(original=original, defaults=datos)
+    # Cambia lo que muestra la carta: nuevas ETag de inicio y de los listados de sus empresas
+    empresas = set(Producto.objects.filter(imagen=original).values_list("empresa_id", flat=True))
+    versiones.incrementar(versiones.CATALOGO, *(versiones.clave_empresa(e) for e in empresas if e))
+
+
+def procesar(nombres, procesos=None, al_terminar=None):
+    """
+    Genera las miniaturas de `nombres` en un pool de `procesos` y guarda cada
+    resultado al terminar. Una imagen que no se puede abrir queda registrada con
+    su error y sin anchos. Devuelve (procesadas, fallidas).
+    """
+    procesadas = fallidas = 0
+    # Los procesos hijos no usan la base de datos: que no hereden conexiones abiertas
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso) as pool:
+        futuros = {pool.submit(generar_miniaturas, nombre): nombre for nombre in nombres}
+        for futuro in as_completed(futuros):
+            original = futuros[futuro]
+            try:
+                _, ancho, alto, anchos = futuro.result()
+            except Exception as e:
+                _guardar(original, ancho=0, alto=0, anchos=[], error=f"{type(e).__name__}: {e}")
+                fallidas += 1
+                error = e
+            else:
+                _guardar(original, ancho=ancho, alto=alto, anchos=anchos, error="")
+                procesadas += 1
+                error = None
+            if al_terminar:
+                al_terminar(original, error)
+    return procesadas, fallidas
+
+
+# ==============================
+# PLANTILLAS
+# ==============================
+
+def fuentes(imagen):
+    """Datos de <picture> para una ImagenProducto procesada (None si no tiene miniaturas)."""
+    if not imagen.anchos:
+        return None
+    almacen = almacen_imagenes()
+
+    def srcset(extension):
+        return ", ".join(f"{almacen.url(nombre_miniatura(imagen.original, a, extension))} {a}w" for a in imagen.anchos)
+
+    mayor = imagen.anchos[-1]
+    # src de respaldo: el JPEG más cercano a 640 px
+    respaldo = min(imagen.anchos, key=lambda a: abs(a - 640))
+    return {
+        "srcset_webp": srcset("webp"),
+        "srcset_jpg": srcset("jpg"),
+        "src": almacen.url(nombre_miniatura(imagen.original, respaldo, "jpg")),
+        "sizes": settings.IMAGENES_SIZES,
+        "ancho": mayor,
+        "alto": max(round(imagen.alto * mayor / imagen.ancho), 1),
+    }
+
+
+def imagenes_de(productos):
+    """{nombre del original: fuentes} de los productos, en una sola consulta."""
+    nombres = {p.imagen.name for p in productos if p.imagen}
+    if not nombres:
+        return {}
+    return {i.original: fuentes(i) for i in ImagenProducto.objects.filter(original__in=nombres)}
@@ -0,0 +1,52 @@
+import csv
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from staff.onboarding import TAMANO_LOTE, alta_masiva_empresas
+
+
+def leer_csv(ruta):
+    """
+    Columnas: nombre_comercial, contacto, username, email, nombre_visible, password.
+    Las filas consecutivas con la misma empresa (nombre + contacto) añaden usuarios a esa empresa.
+    """
+    filas = []
+    with open(ruta, newline="", encoding="utf-8") as f:
+        for registro in csv.DictReader(f):
+            clave = (registro["nombre_comercial"], registro.get("contacto", ""))
+            if not filas or (filas[-1]["nombre_comercial"], filas[-1]["contacto"]) != clave:
+                filas.append({"nombre_comercial": clave[0], "contacto": clave[1], "usuarios": []})
+            if registro.get("username"):
+                filas[-1]["usuarios"].append({
+                    "username": registro["username"],
+                    "email": registro.get("email"),
+                    "nombre_visible": registro.get("nombre_visible"),
+                    "password": registro.get("password"),
+                })
+    return filas
+
+
+class Command(BaseCommand):
+    help = "Alta masiva de empresas con sus usuarios de staff desde un CSV o JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("fichero", help="Ruta a un .csv o .json")
+        parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Filas por INSERT.")
+
+    def handle(self, *args, **options):
+        ruta = options["fichero"]
+        if ruta.endswith(".json"):
+            with open(ruta, encoding="utf-8") as f:
+                filas = json.load(f)
+        else:
+            filas = leer_csv(ruta)
+
+        try:
+            empresas = alta_masiva_empresas(filas, tamano=options["lote"])
+        except ValidationError as e:
+            raise CommandError("; ".join(e.messages))
+
+        usuarios = sum(len(f.get("usuarios", [])) for f in filas)
+        self.stdout.write(self.style.SUCCESS(f"{len(empresas)} empresas y {usuarios} usuarios creados."))
@@ -0,0 +1,54 @@
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from staff.reparto import dos_opt, longitud_ruta, matriz_distancias, rutas_de_ventana, sectores, vecino_mas_cercano
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la planificación de rutas con pedidos sintéticos repartidos en un radio "
+        "de 6 km alrededor del local (sin base de datos)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pedidos", type=int, nargs="+", default=[100, 300, 600])
+        parser.add_argument("--repartidores", type=int, default=5)
+        parser.add_argument("--repeticiones", type=int, default=5)
+        parser.add_argument("--semilla", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options["semilla"])
+        repartidores = options["repartidores"]
+        self.stdout.write(f"{'pedidos':>8} {'total ms':>9} {'vecino ms':>10} {'2-opt ms':>9} {'km vecino':>10} {'km 2-opt':>9} {'mejora':>7}")
+
+        for n in options["pedidos"]:
+            radio = 6 * np.sqrt(rng.random(n))
+            angulo = rng.random(n) * 2 * np.pi
+            puntos = np.column_stack((radio * np.cos(angulo), radio * np.sin(angulo)))
+
+            totales = []
+            for _ in range(options["repeticiones"]):
+                inicio = time.perf_counter()
+                rutas_de_ventana(puntos, repartidores)
+                totales.append(time.perf_counter() - inicio)
+
+            # Desglose por fase sobre los mismos sectores
+            t_vecino = t_2opt = km_vecino = km_2opt = 0.0
+            for grupo in sectores(puntos, repartidores):
+                distancias = matriz_distancias(np.vstack(([0.0, 0.0], puntos[grupo])))
+                inicio = time.perf_counter()
+                ruta = vecino_mas_cercano(distancias)
+                t_vecino += time.perf_counter() - inicio
+                km_vecino += longitud_ruta(ruta, distancias)
+                inicio = time.perf_counter()
+                ruta = dos_opt(ruta, distancias)
+                t_2opt += time.perf_counter() - inicio
+                km_2opt += longitud_ruta(ruta, distancias)
+
+            self.stdout.write(
+                f"{n:>8} {statistics.median(totales) * 1000:>9.1f} {t_vecino * 1000:>10.1f} {t_2opt * 1000:>9.1f} "
+                f"{km_vecino:>10.1f} {km_2opt:>9.1f} {(1 - km_2opt / km_vecino) * 100:>6.1f}%"
+            )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from staff.precios import TAMANO_LOTE, compilar_precios
+
+
+class Command(BaseCommand):
+    help = "Recompila la tabla de precios efectivos a partir de las reglas activas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("productos", nargs="*", type=int, help="Ids de producto (por defecto, todos).")
+        parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Productos por transacción.")
+
+    def handle(self, *args, **options):
+        filas = compilar_precios(options["productos"] or None, tamano=options["lote"])
+        self.stdout.write(self.style.SUCCESS(f"{filas} tramos de precio compilados."))
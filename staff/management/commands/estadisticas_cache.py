@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from chefquest.cache_niveles import estadisticas, volcar_contadores
+
+
+class Command(BaseCommand):
+    help = "Aciertos, fallos y recálculos de la caché de dos niveles, por nombre (todos los workers)."
+
+    def handle(self, *args, **options):
+        volcar_contadores()
+        datos = estadisticas()
+        if not datos:
+            self.stdout.write("Todavía no hay contadores.")
+        for nombre, c in sorted(datos.items()):
+            peticiones = c["local"] + c["compartida"] + c["obsoleto"] + c["fallo"]
+            aciertos = c["local"] + c["compartida"] + c["obsoleto"]
+            media = c["recalculo_ms"] / c["recalculo"] if c["recalculo"] else 0
+            self.stdout.write(
+                f"{nombre}: {peticiones} lecturas, {aciertos / peticiones if peticiones else 0:.1%} aciertos "
+                f"(local {c['local']}, compartida {c['compartida']}, obsoletos {c['obsoleto']}), "
+                f"{c['fallo']} fallos, {c['recalculo']} recálculos de {media:.0f} ms de media"
+            )
@@ -0,0 +1,40 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from staff.outbox import como_dict, consumir, leer
+
+
+class Command(BaseCommand):
+    help = (
+        "Lee la outbox de eventos en orden (una línea JSON por evento). Con --consumidor "
+        "se continúa desde su posición guardada y se avanza al terminar cada lote."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", type=int, default=0, help="Posición desde la que leer (sin --consumidor).")
+        parser.add_argument("--consumidor", help="Nombre del consumidor con posición guardada.")
+        parser.add_argument("--tipo", action="append", help="Filtra por tipo de evento (repetible).")
+        parser.add_argument("--limite", type=int, default=500, help="Eventos por lote.")
+        parser.add_argument("--seguir", type=float, metavar="SEGUNDOS", help="No termina: vuelve a leer cada N segundos.")
+
+    def escribir(self, eventos):
+        for evento in eventos:
+            self.stdout.write(json.dumps(como_dict(evento), cls=DjangoJSONEncoder, ensure_ascii=False))
+
+    def handle(self, *args, **options):
+        desde = options["desde"]
+        while True:
+            if options["consumidor"]:
+                leidos = consumir(options["consumidor"], self.escribir, limite=options["limite"], tipos=options["tipo"])
+            else:
+                eventos, desde = leer(desde, limite=options["limite"], tipos=options["tipo"])
+                self.escribir(eventos)
+                leidos = len(eventos)
+            if leidos == options["limite"]:
+                continue  # quedan más: se lee el siguiente lote sin esperar
+            if not options["seguir"]:
+                return
+            time.sleep(options["seguir"])
@@ -0,0 +1,53 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from staff.models import PuntoCallejero
+from staff.reparto import normalizar_direccion, olvidar_geocodificaciones
+
+TAMANO_LOTE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa el callejero para geocodificar los repartos desde un CSV con columnas "
+        "calle, numero, latitud, longitud (numero vacío = centro de la calle)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("fichero", help="Ruta al .csv")
+        parser.add_argument("--vaciar", action="store_true", help="Borra antes el callejero existente.")
+
+    def handle(self, *args, **options):
+        puntos = {}
+        with open(options["fichero"], newline="", encoding="utf-8") as f:
+            for linea, registro in enumerate(csv.DictReader(f), start=2):
+                calle, _ = normalizar_direccion(registro["calle"])
+                try:
+                    numero = int(registro.get("numero") or 0)
+                    latitud, longitud = float(registro["latitud"]), float(registro["longitud"])
+                except (TypeError, ValueError):
+                    raise CommandError(f"Línea {linea}: número o coordenadas no válidos.")
+                if not calle:
+                    raise CommandError(f"Línea {linea}: calle vacía.")
+                # Si una calle y número se repiten, vale la última fila
+                puntos[(calle, numero)] = PuntoCallejero(
+                    calle=calle, numero=numero, latitud=latitud, longitud=longitud
+                )
+
+        # Borrado y carga en una transacción: nunca se geocodifica contra un callejero vacío
+        with transaction.atomic():
+            if options["vaciar"]:
+                # _raw_delete: un solo DELETE, sin cargar las filas ni enviar post_delete por cada una
+                existentes = PuntoCallejero.objects.all()
+                existentes._raw_delete(existentes.db)
+            PuntoCallejero.objects.bulk_create(
+                puntos.values(),
+                batch_size=TAMANO_LOTE,
+                update_conflicts=True,
+                unique_fields=["calle", "numero"],
+                update_fields=["latitud", "longitud"],
+            )
+        olvidar_geocodificaciones()
+        self.stdout.write(self.style.SUCCESS(f"{len(puntos)} puntos del callejero importados."))
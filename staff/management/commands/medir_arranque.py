@@ -0,0 +1,120 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+CLAVES_BASE_DATOS = ("ENGINE", "NAME", "USER", "PASSWORD", "HOST", "PORT", "OPTIONS")
+
+# Se ejecuta en un intérprete nuevo para medir un arranque en frío de verdad
+SCRIPT_HIJO = """
+import json, os, sys, time
+inicio = time.perf_counter()
+if os.environ.get("ARRANQUE_BASE_DATOS"):
+    # La base de datos del proceso que mide (p. ej. la de los tests), no la configurada
+    from django.conf import settings
+    settings.DATABASES["default"].update(json.loads(os.environ["ARRANQUE_BASE_DATOS"]))
+from chefquest.wsgi import application
+arranque = time.perf_counter() - inicio
+
+from wsgiref.util import setup_testing_defaults
+
+def peticion(ruta):
+    environ = {"PATH_INFO": ruta, "REQUEST_METHOD": "GET"}
+    setup_testing_defaults(environ)
+    estado = []
+    t0 = time.perf_counter()
+    respuesta = application(environ, lambda s, h, e=None: estado.append(s))
+    b"".join(respuesta)
+    getattr(respuesta, "close", lambda: None)()
+    return time.perf_counter() - t0, estado[0]
+
+primera, estado = peticion(sys.argv[1])
+segunda, _ = peticion(sys.argv[1])
+sys.stdout.write("\\n@@" + json.dumps({"arranque": arranque, "primera": primera, "segunda": segunda, "estado": estado}))
+"""
+
+
+def leer_importtime(salida):
+    """Líneas de `python -X importtime` -> {módulo: (propio_us, acumulado_us)}."""
+    modulos = {}
+    for linea in salida.splitlines():
+        if not linea.startswith("import time:") or "[us]" in linea:
+            continue
+        propio, acumulado, modulo = linea[len("import time:"):].split("|")
+        modulos[modulo.strip()] = (int(propio), int(acumulado))
+    return modulos
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el arranque en frío del proceso web (importaciones, calentamiento y primera "
+        "petición) en intérpretes nuevos. Con --presupuesto falla si se supera."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ruta", default="/", help="Ruta de la primera petición.")
+        parser.add_argument("--repeticiones", type=int, default=3, help="Arranques a medir (se usa la mediana).")
+        parser.add_argument("--top", type=int, default=15, help="Módulos más lentos a mostrar.")
+        parser.add_argument("--sin-calentar", action="store_true", help="Arranca con ARRANQUE_CALENTAR=False.")
+        parser.add_argument(
+            "--presupuesto", type=float, nargs="?", const=settings.ARRANQUE_PRESUPUESTO_MS, default=None,
+            help="Milisegundos máximos de arranque + primera petición (por defecto ARRANQUE_PRESUPUESTO_MS).",
+        )
+
+    def arrancar(self, ruta, sin_calentar):
+        # El hijo usa la misma base de datos que este proceso (en los tests, la de pruebas)
+        base_datos = {c: connections["default"].settings_dict[c] for c in CLAVES_BASE_DATOS}
+        entorno = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1", "ARRANQUE_BASE_DATOS": json.dumps(base_datos)}
+        if sin_calentar:
+            entorno["ARRANQUE_CALENTAR"] = "False"
+        proceso = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", SCRIPT_HIJO, ruta],
+            cwd=settings.BASE_DIR, env=entorno, capture_output=True, text=True,
+        )
+        _, separador, resultado = proceso.stdout.rpartition("\n@@")
+        if proceso.returncode or not separador:
+            raise CommandError(f"El arranque ha fallado:\n{proceso.stderr[-3000:]}")
+        return json.loads(resultado), leer_importtime(proceso.stderr)
+
+    def handle(self, *args, **options):
+        medidas = []
+        modulos = {}
+        for _ in range(max(options["repeticiones"], 1)):
+            medida, modulos = self.arrancar(options["ruta"], options["sin_calentar"])
+            # Un error rápido no es un arranque rápido
+            if not 200 <= int(medida["estado"].split()[0]) < 400:
+                raise CommandError(f"La primera petición a {options['ruta']} ha respondido {medida['estado']}.")
+            medidas.append(medida)
+
+        # Importaciones del último arranque, agrupadas por paquete de primer nivel
+        paquetes = {}
+        for modulo, (propio, _) in modulos.items():
+            paquete = modulo.split(".")[0]
+            paquetes[paquete] = paquetes.get(paquete, 0) + propio
+        self.stdout.write(self.style.MIGRATE_HEADING("Importación por paquete (ms)"))
+        for paquete, us in sorted(paquetes.items(), key=lambda p: -p[1])[:options["top"]]:
+            self.stdout.write(f"  {us / 1000:8.1f}  {paquete}")
+        self.stdout.write(self.style.MIGRATE_HEADING("Módulos más lentos (ms propios / acumulados)"))
+        for modulo, (propio, acumulado) in sorted(modulos.items(), key=lambda m: -m[1][0])[:options["top"]]:
+            self.stdout.write(f"  {propio / 1000:8.1f} {acumulado / 1000:8.1f}  {modulo}")
+
+        arranque = statistics.median(m["arranque"] for m in medidas) * 1000
+        primera = statistics.median(m["primera"] for m in medidas) * 1000
+        segunda = statistics.median(m["segunda"] for m in medidas) * 1000
+        total = arranque + primera
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Mediana de {len(medidas)} arranques (ms)"))
+        self.stdout.write(f"  Importación + calentamiento: {arranque:8.1f}")
+        self.stdout.write(f"  Primera petición ({medidas[-1]['estado']}): {primera:8.1f}")
+        self.stdout.write(f"  Segunda petición:            {segunda:8.1f}")
+        self.stdout.write(f"  Total hasta la primera respuesta: {total:.1f}")
+
+        presupuesto = options["presupuesto"]
+        if presupuesto is not None:
+            if total > presupuesto:
+                raise CommandError(f"Arranque en frío de {total:.0f} ms: supera el presupuesto de {presupuesto:.0f} ms.")
+            self.stdout.write(self.style.SUCCESS(f"Dentro del presupuesto ({total:.0f} / {presupuesto:.0f} ms)."))
@@ -0,0 +1,70 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chefquest.microbench import cambio, cargar_referencias, ejecutar, entorno_actual, guardar_referencias
+
+
+class Command(BaseCommand):
+    help = (
+        "Microbenchmarks de precios, formularios, resolución de empresa y plantillas. Compara "
+        "el mejor tiempo con las referencias guardadas y falla si alguno empeora más del umbral."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--filtro", help="Solo los benchmarks cuyo nombre contiene este texto.")
+        parser.add_argument("--repeticiones", type=int, default=5)
+        parser.add_argument("--umbral", type=float, default=settings.MICROBENCH_UMBRAL,
+                            help="Porcentaje de empeoramiento que se considera regresión.")
+        parser.add_argument("--referencias", default=settings.MICROBENCH_REFERENCIAS,
+                            help="Fichero JSON con las referencias.")
+        parser.add_argument("--guardar", action="store_true",
+                            help="Guarda los tiempos medidos como nuevas referencias.")
+
+    def handle(self, *args, **options):
+        referencias, entorno = cargar_referencias(options["referencias"])
+        if referencias and entorno != entorno_actual():
+            # Los tiempos de otra máquina (u otro Python) no dicen nada de esta
+            self.stdout.write(self.style.WARNING(
+                f"Las referencias se midieron en otro entorno ({entorno}); no se comparan."
+            ))
+            referencias = {}
+        if not referencias and not options["guardar"]:
+            self.stdout.write(self.style.WARNING(
+                f"Sin referencias válidas en {options['referencias']}: genéralas en esta máquina con --guardar."
+            ))
+        umbral = options["umbral"] / 100
+        regresiones = []
+
+        self.stdout.write(f"{'benchmark':<30} {'mejor µs':>12} {'mediana µs':>12} {'referencia':>12} {'cambio':>8}")
+
+        def al_medir(nombre, mejor, mediana):
+            referencia = referencias.get(nombre)
+            linea = f"{nombre:<30} {mejor * 1e6:>12.1f} {mediana * 1e6:>12.1f}"
+            if referencia is None:
+                self.stdout.write(f"{linea} {'-':>12} {'nuevo':>8}")
+                return
+            variacion = cambio(mejor, referencia)
+            linea = f"{linea} {referencia * 1e6:>12.1f} {variacion:>+8.1%}"
+            if variacion > umbral:
+                regresiones.append(nombre)
+                self.stdout.write(self.style.ERROR(f"{linea}  LENTO"))
+            elif variacion < -umbral:
+                self.stdout.write(self.style.SUCCESS(linea))
+            else:
+                self.stdout.write(linea)
+
+        resultados = ejecutar(options["filtro"], max(options["repeticiones"], 1), al_medir=al_medir)
+        if not resultados:
+            raise CommandError("Ningún benchmark coincide con el filtro.")
+
+        if options["guardar"]:
+            os.makedirs(os.path.dirname(options["referencias"]) or ".", exist_ok=True)
+            guardar_referencias(options["referencias"], resultados)
+            self.stdout.write(self.style.SUCCESS(f"Referencias guardadas en {options['referencias']}."))
+        elif regresiones:
+            raise CommandError(
+                f"{len(regresiones)} benchmarks más de un {options['umbral']:.0f} % más lentos que la referencia: "
+                + ", ".join(regresiones)
+            )
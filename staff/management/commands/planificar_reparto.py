@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from staff.models import Empresa
+from staff.reparto import planificar_reparto
+
+
+class Command(BaseCommand):
+    help = "Muestra las rutas de reparto de los pedidos de comida de una empresa para un día."
+
+    def add_arguments(self, parser):
+        parser.add_argument("empresa", type=int, help="Id de la empresa.")
+        parser.add_argument("--fecha", help="Día (AAAA-MM-DD). Por defecto, hoy.")
+        parser.add_argument("--repartidores", type=int, default=1)
+        parser.add_argument("--ventana", type=int, help="Minutos por ventana de entrega.")
+
+    def handle(self, *args, **options):
+        if not Empresa.objects.filter(pk=options["empresa"]).exists():
+            raise CommandError(f"No existe la empresa {options['empresa']}.")
+        try:
+            dia = datetime.strptime(options["fecha"], "%Y-%m-%d").date() if options["fecha"] else timezone.localdate()
+        except ValueError:
+            raise CommandError("La fecha debe tener el formato AAAA-MM-DD.")
+        desde = timezone.make_aware(datetime.combine(dia, datetime.min.time()))
+
+        plan = planificar_reparto(
+            options["empresa"], desde, desde + timedelta(days=1),
+            repartidores=options["repartidores"], ventana_minutos=options["ventana"],
+        )
+        for ventana in plan["ventanas"]:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{ventana['inicio']:%H:%M}-{ventana['fin']:%H:%M}"))
+            for ruta in ventana["rutas"]:
+                self.stdout.write(f"  Repartidor {ruta['repartidor']}: {ruta['km']} km, ~{ruta['minutos']} min")
+                for parada in ruta["paradas"]:
+                    self.stdout.write(f"    {parada['llegada']:%H:%M}  #{parada['pk']}  {parada['direccion']}")
+        for pedido in plan["sin_ubicar"]:
+            self.stdout.write(self.style.WARNING(f"Sin ubicar: #{pedido['pk']} {pedido['direccion']}"))
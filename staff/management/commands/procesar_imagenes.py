@@ -0,0 +1,39 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from staff.imagenes import pendientes, procesar
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera las miniaturas WebP/JPEG de las imágenes de productos pendientes en un pool "
+        "de procesos. Se puede interrumpir y relanzar: continúa por las que faltan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1, help="Procesos del pool.")
+        parser.add_argument("--todas", action="store_true",
+                            help="Reprocesa también las ya procesadas (p. ej. tras cambiar IMAGENES_ANCHOS).")
+        parser.add_argument("--seguir", type=float, metavar="SEGUNDOS",
+                            help="No termina: vuelve a buscar pendientes cada N segundos.")
+
+    def al_terminar(self, original, error):
+        if error:
+            self.stderr.write(f"{original}: {error}")
+        elif self.verbosity > 1:
+            self.stdout.write(original)
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        todas = options["todas"]
+        while True:
+            nombres = pendientes(todas=todas)
+            if nombres:
+                procesadas, fallidas = procesar(nombres, max(options["procesos"], 1), al_terminar=self.al_terminar)
+                self.stdout.write(self.style.SUCCESS(f"{procesadas} imágenes procesadas, {fallidas} con error."))
+            if not options["seguir"]:
+                return
+            todas = False
+            time.sleep(options["seguir"])
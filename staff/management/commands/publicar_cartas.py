@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from staff.carta import publicar_cartas
+
+
+class Command(BaseCommand):
+    help = "Publica las cartas del día (hoy y los próximos días) como instantáneas versionadas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=2,
+                            help="Días a publicar a partir de hoy (por defecto hoy y mañana).")
+
+    def handle(self, *args, **options):
+        hoy = timezone.localdate()
+        for i in range(options["dias"]):
+            fecha = hoy + timedelta(days=i)
+            nuevas = publicar_cartas(fecha)
+            for carta in nuevas:
+                self.stdout.write(f"{fecha:%d/%m/%Y}: empresa {carta.empresa_id} v{carta.version}")
+            self.stdout.write(self.style.SUCCESS(f"{fecha:%d/%m/%Y}: {len(nuevas)} cartas nuevas."))
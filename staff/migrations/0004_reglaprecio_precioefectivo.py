@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0003_producto_producto_del_dia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReglaPrecio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, verbose_name='Nombre de la regla')),
+                ('descuento', models.PositiveIntegerField(verbose_name='Descuento (%)')),
+                ('hora_inicio', models.TimeField(blank=True, null=True, verbose_name='Desde (hora)')),
+                ('hora_fin', models.TimeField(blank=True, null=True, verbose_name='Hasta (hora)')),
+                ('cantidad_minima', models.PositiveIntegerField(default=1, verbose_name='Cantidad mínima')),
+                ('prioridad', models.IntegerField(default=0, help_text='Las reglas de mayor prioridad se aplican primero.', verbose_name='Prioridad')),
+                ('acumulable', models.BooleanField(default=False, help_text='Si no es acumulable, detiene la aplicación de reglas de menor prioridad.', verbose_name='¿Acumulable?')),
+                ('activo', models.BooleanField(default=True, verbose_name='¿Regla activa?')),
+                ('categoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reglas_precio', to='staff.categoria', verbose_name='Categoría')),
+                ('empresa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reglas_precio', to='staff.empresa', verbose_name='Empresa')),
+                ('producto', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reglas_precio', to='staff.producto', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Regla de precio',
+                'verbose_name_plural': 'Reglas de precio',
+                'ordering': ['-prioridad', 'nombre'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PrecioEfectivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('desde', models.TimeField(verbose_name='Desde')),
+                ('hasta', models.TimeField(blank=True, null=True, verbose_name='Hasta')),
+                ('cantidad_minima', models.PositiveIntegerField(default=1, verbose_name='Cantidad mínima')),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=7, verbose_name='Precio efectivo')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='precios_efectivos', to='staff.producto', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Precio efectivo',
+                'verbose_name_plural': 'Precios efectivos',
+                'indexes': [models.Index(fields=['producto', 'cantidad_minima', 'desde'], name='precio_producto_franja_idx')],
+            },
+        ),
+    ]
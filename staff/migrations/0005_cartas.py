@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0004_reglaprecio_precioefectivo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartaProgramada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Día')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cartas_programadas', to='staff.empresa', verbose_name='Empresa')),
+                ('productos', models.ManyToManyField(related_name='cartas_programadas', to='staff.producto', verbose_name='Productos')),
+            ],
+            options={
+                'verbose_name': 'Carta programada',
+                'verbose_name_plural': 'Cartas programadas',
+                'ordering': ['-fecha', 'empresa'],
+                'constraints': [models.UniqueConstraint(fields=('empresa', 'fecha'), name='carta_programada_unica')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CartaPublicada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Día')),
+                ('version', models.PositiveIntegerField(verbose_name='Versión')),
+                ('contenido', models.JSONField(verbose_name='Contenido (JSON)')),
+                ('html', models.TextField(verbose_name='Fragmento HTML')),
+                ('huella', models.CharField(max_length=64, verbose_name='Huella del contenido')),
+                ('publicada_en', models.DateTimeField(auto_now_add=True, verbose_name='Publicada en')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cartas_publicadas', to='staff.empresa', verbose_name='Empresa')),
+            ],
+            options={
+                'verbose_name': 'Carta publicada',
+                'verbose_name_plural': 'Cartas publicadas',
+                'ordering': ['-fecha', 'empresa', '-version'],
+                'constraints': [models.UniqueConstraint(fields=('empresa', 'fecha', 'version'), name='carta_publicada_version_unica')],
+            },
+        ),
+    ]
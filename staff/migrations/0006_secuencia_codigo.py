@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:52
+
+from django.db import migrations, models
+
+# Copia de la lógica de staff.codigos en el momento de esta migración: las
+# migraciones no importan código de la app, que puede cambiar después.
+NOMBRE_SECUENCIA = "staff_empresa_codigo_seq"
+CODIGO_INICIAL = 100000
+
+
+def crear_secuencia(apps, schema_editor):
+    # Primer código libre por encima de los ya existentes (aleatorios, id + 1000, manuales)
+    Empresa = apps.get_model("staff", "Empresa")
+    maximo = Empresa.objects.order_by("-codigo").values_list("codigo", flat=True).first()
+    inicio = max((maximo or 0) + 1, CODIGO_INICIAL)
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"CREATE SEQUENCE IF NOT EXISTS {NOMBRE_SECUENCIA} START WITH {int(inicio)}")
+    else:
+        SecuenciaCodigo = apps.get_model("staff", "SecuenciaCodigo")
+        SecuenciaCodigo.objects.get_or_create(nombre=NOMBRE_SECUENCIA, defaults={"siguiente": inicio})
+
+
+def borrar_secuencia(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP SEQUENCE IF EXISTS {NOMBRE_SECUENCIA}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0005_cartas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaCodigo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True, verbose_name='Nombre')),
+                ('siguiente', models.PositiveBigIntegerField(verbose_name='Siguiente valor')),
+            ],
+            options={
+                'verbose_name': 'Secuencia de códigos',
+                'verbose_name_plural': 'Secuencias de códigos',
+            },
+        ),
+        # Secuencia nativa en PostgreSQL; fila de SecuenciaCodigo en el resto
+        migrations.RunPython(crear_secuencia, borrar_secuencia),
+    ]
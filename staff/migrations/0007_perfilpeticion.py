@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0006_secuencia_codigo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerfilPeticion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=64, unique=True, verbose_name='Nombre de los ficheros')),
+                ('creado', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Fecha')),
+                ('metodo', models.CharField(max_length=10, verbose_name='Método')),
+                ('ruta', models.CharField(max_length=255, verbose_name='Ruta')),
+                ('estado', models.PositiveSmallIntegerField(verbose_name='Código HTTP')),
+                ('duracion_ms', models.FloatField(verbose_name='Duración (ms)')),
+                ('consultas', models.PositiveIntegerField(verbose_name='Consultas SQL')),
+                ('sql_ms', models.FloatField(verbose_name='Tiempo SQL (ms)')),
+                ('plantillas_ms', models.FloatField(verbose_name='Tiempo de plantillas (ms)')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Perfil de petición',
+                'verbose_name_plural': 'Perfiles de peticiones',
+                'ordering': ['-creado'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0007_perfilpeticion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Versión'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0008_producto_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empresa',
+            name='latitud',
+            field=models.FloatField(blank=True, null=True, verbose_name='Latitud del local'),
+        ),
+        migrations.AddField(
+            model_name='empresa',
+            name='longitud',
+            field=models.FloatField(blank=True, null=True, verbose_name='Longitud del local'),
+        ),
+        migrations.CreateModel(
+            name='PuntoCallejero',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('calle', models.CharField(max_length=100, verbose_name='Calle (normalizada)')),
+                ('numero', models.PositiveIntegerField(default=0, verbose_name='Número')),
+                ('latitud', models.FloatField(verbose_name='Latitud')),
+                ('longitud', models.FloatField(verbose_name='Longitud')),
+            ],
+            options={
+                'verbose_name': 'Punto del callejero',
+                'verbose_name_plural': 'Callejero',
+                'ordering': ['calle', 'numero'],
+                'constraints': [models.UniqueConstraint(fields=('calle', 'numero'), name='punto_callejero_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0009_reparto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empresa',
+            name='capacidad_cocina',
+            field=models.PositiveIntegerField(default=30, verbose_name='Capacidad de cocina (min/15 min)'),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='tiempo_preparacion',
+            field=models.PositiveIntegerField(default=10, verbose_name='Tiempo de preparación (min)'),
+        ),
+    ]
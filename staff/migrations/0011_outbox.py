@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:19
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0010_cocina'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsumidorOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=64, unique=True, verbose_name='Nombre')),
+                ('posicion', models.PositiveBigIntegerField(default=0, verbose_name='Posición')),
+                ('actualizado', models.DateTimeField(auto_now=True, verbose_name='Última lectura')),
+            ],
+            options={
+                'verbose_name': 'Consumidor de la outbox',
+                'verbose_name_plural': 'Consumidores de la outbox',
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EventoOutbox',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False, verbose_name='Posición')),
+                ('tipo', models.CharField(choices=[('reserva.creada', 'reserva.creada'), ('reserva.confirmada', 'reserva.confirmada'), ('reserva.cancelada', 'reserva.cancelada'), ('reserva.entregada', 'reserva.entregada'), ('producto.stock', 'producto.stock'), ('producto.precio', 'producto.precio')], max_length=30, verbose_name='Tipo')),
+                ('modelo', models.CharField(max_length=50, verbose_name='Modelo')),
+                ('objeto_id', models.PositiveBigIntegerField(verbose_name='Id del objeto')),
+                ('datos', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Datos')),
+                ('creado', models.DateTimeField(auto_now_add=True, verbose_name='Fecha')),
+                ('empresa', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='staff.empresa', verbose_name='Empresa')),
+            ],
+            options={
+                'verbose_name': 'Evento (outbox)',
+                'verbose_name_plural': 'Eventos (outbox)',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['empresa', 'id'], name='outbox_empresa_id_idx')],
+            },
+        ),
+    ]
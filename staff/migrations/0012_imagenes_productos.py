@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:31
+
+import chefquest.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0011_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImagenProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original', models.CharField(max_length=100, unique=True, verbose_name='Original')),
+                ('ancho', models.PositiveIntegerField(default=0, verbose_name='Ancho original')),
+                ('alto', models.PositiveIntegerField(default=0, verbose_name='Alto original')),
+                ('anchos', models.JSONField(default=list, verbose_name='Anchos generados')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('procesada', models.DateTimeField(auto_now=True, verbose_name='Procesada')),
+            ],
+            options={
+                'verbose_name': 'Imagen de producto',
+                'verbose_name_plural': 'Imágenes de productos',
+                'ordering': ['-procesada'],
+            },
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='imagen',
+            field=models.FileField(blank=True, storage=chefquest.storage.almacen_imagenes, upload_to='productos', verbose_name='Imagen'),
+        ),
+    ]
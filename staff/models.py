@@ -1,4 +1,87 @@
-from django.db import models
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, router
+from django.db.models import F
+
+from chefquest.concurrencia import ConflictoDeVersion
+from chefquest.storage import almacen_imagenes
+
+
+class ModeloVersionado(models.Model):
+    """
+    Base con control de concurrencia optimista (ver chefquest/concurrencia.py):
+    cada UPDATE comprueba la versión leída y la incrementa.
+    """
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        verbose_name="Versión"
+    )
+
+    class Meta:
+        abstract = True
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        if self._state.adding:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        campo = self._meta.get_field("version")
+        values = [v for v in values if v[0] is not campo] + [(campo, None, F("version") + 1)]
+        actualizado = super()._do_update(
+            base_qs.filter(version=self.version), using, pk_val, values, update_fields, True
+        )
+        if not actualizado:
+            raise ConflictoDeVersion(f"{self._meta.label} {pk_val}: versión {self.version} obsoleta.")
+        self.version += 1
+        return True
+
+
+class ModeloConEventos(models.Model):
+    """
+    Base que escribe en la outbox (staff/outbox.py) los eventos de cada guardado,
+    en la misma transacción. `campos_seguidos` se recuerdan al leer de la base de
+    datos para saber qué ha cambiado; cada modelo decide sus eventos en
+    eventos_al_guardar(creado, cambios), con cambios = {campo: (antes, después)}.
+    """
+    campos_seguidos = ()
+    _seguidos = None
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._seguidos = {c: instancia.__dict__[c] for c in cls.campos_seguidos if c in instancia.__dict__}
+        return instancia
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        recargados = {c: self.__dict__[c] for c in self.campos_seguidos if c in self.__dict__ and (fields is None or c in fields)}
+        self._seguidos = {**(self._seguidos or {}), **recargados}
+
+    def eventos_al_guardar(self, creado, cambios):
+        return ()
+
+    def save(self, *args, **kwargs):
+        from .outbox import lote, registrar
+
+        creado = self._state.adding
+        update_fields = kwargs.get("update_fields")
+        anteriores = self._seguidos or {}
+        campos = [c for c in self.campos_seguidos if update_fields is None or c in update_fields]
+        # to_python: el valor que se guardará (p. ej. Decimal aunque se haya asignado un int)
+        actuales = {c: self._meta.get_field(c).to_python(getattr(self, c)) for c in campos}
+        cambios = {
+            c: (anteriores.get(c), actual)
+            for c, actual in actuales.items()
+            if creado or c not in anteriores or anteriores[c] != actual
+        }
+        with lote(kwargs.get("using") or router.db_for_write(type(self), instance=self)):
+            super().save(*args, **kwargs)
+            for tipo, datos in self.eventos_al_guardar(creado, cambios):
+                registrar(tipo, self, datos)
+        self._seguidos = {**anteriores, **{c: despues for c, (_, despues) in cambios.items()}}
+
 
 class Cupon(models.Model):
     nombre = models.CharField(
@@ -56,12 +139,18 @@ class Empresa(models.Model):
         verbose_name="¿Activa?"
     )
     codigo = models.PositiveIntegerField(unique=True, null=True, blank=True, verbose_name="Código de empresa")
+    # Origen de las rutas de reparto (si faltan, se usa el centro de los pedidos)
+    latitud = models.FloatField(null=True, blank=True, verbose_name="Latitud del local")
+    longitud = models.FloatField(null=True, blank=True, verbose_name="Longitud del local")
+    # Minutos de trabajo que la cocina asume en cada tramo de 15 minutos (staff/cocina.py)
+    capacidad_cocina = models.PositiveIntegerField(default=30, verbose_name="Capacidad de cocina (min/15 min)")
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)  # Primero guardamos para obtener el ID
         if not self.codigo:
-            self.codigo = self.id + 1000
-            super().save(update_fields=['codigo'])  # Guardamos solo el código
+            # El código sale de una secuencia: un único INSERT y sin colisiones
+            from .codigos import reservar_codigos
+            self.codigo = reservar_codigos(1)[0]
+        super().save(*args, **kwargs)
     
     class Meta:
         verbose_name = "Empresa"
@@ -72,7 +161,22 @@ class Empresa(models.Model):
         estado = "Activo" if self.activo else "Inactivo"
         return f"{self.nombre_comercial} ({estado})"
 
-class Producto(models.Model):
+class SecuenciaCodigo(models.Model):
+    """
+    Contador de códigos de empresa para motores sin secuencias (SQLite en local).
+    En PostgreSQL se usa la secuencia nativa staff_empresa_codigo_seq.
+    """
+    nombre = models.CharField(max_length=50, unique=True, verbose_name="Nombre")
+    siguiente = models.PositiveBigIntegerField(verbose_name="Siguiente valor")
+
+    class Meta:
+        verbose_name = "Secuencia de códigos"
+        verbose_name_plural = "Secuencias de códigos"
+
+    def __str__(self):
+        return f"{self.nombre}: {self.siguiente}"
+
+class Producto(ModeloVersionado, ModeloConEventos):
     nombre = models.CharField(
         max_length=30,
         verbose_name="Nombre del producto"
@@ -98,6 +202,10 @@ class Producto(models.Model):
         verbose_name="¿Producto activo?"
     )
     producto_del_dia = models.BooleanField(default=False, verbose_name="Producto del día")
+    tiempo_preparacion = models.PositiveIntegerField(
+        default=10,
+        verbose_name="Tiempo de preparación (min)"
+    )
     # Si borramos la empresa, el producto no se elimina, solo se queda sin empresa
     empresa = models.ForeignKey(
         Empresa,
@@ -119,13 +227,325 @@ class Producto(models.Model):
         related_query_name='producto',
         verbose_name="Categoría"
     )
-    
+    # Original subido (nombre = hash del contenido); las miniaturas las genera
+    # `procesar_imagenes` y se describen en ImagenProducto
+    imagen = models.FileField(
+        upload_to="productos",
+        storage=almacen_imagenes,
+        blank=True,
+        verbose_name="Imagen"
+    )
+
     class Meta:
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
         ordering = ['nombre']
 
+    campos_seguidos = ("stock", "precio")
+
+    def eventos_al_guardar(self, creado, cambios):
+        for campo, (antes, despues) in cambios.items():
+            if campo == "precio":
+                antes, despues = (None if v is None else f"{v:.2f}" for v in (antes, despues))
+            yield f"producto.{campo}", {"antes": antes, "despues": despues, "version": self.version}
+
     def __str__(self):
         empresa_str = self.empresa.nombre_comercial if self.empresa else "Sin empresa"
         categoria_str = self.categoria.nombre if self.categoria else "Sin categoría"
-        return f"{self.nombre} | {categoria_str} | {empresa_str} | Stock: {self.stock}"
\ No newline at end of file
+        return f"{self.nombre} | {categoria_str} | {empresa_str} | Stock: {self.stock}"
+
+class ImagenProducto(models.Model):
+    """
+    Miniaturas ya generadas de una imagen original (ver staff/imagenes.py). Una fila
+    por contenido, no por producto: los productos con la misma imagen la comparten.
+    Sin fila, la imagen está pendiente de procesar.
+    """
+    original = models.CharField(max_length=100, unique=True, verbose_name="Original")
+    ancho = models.PositiveIntegerField(default=0, verbose_name="Ancho original")
+    alto = models.PositiveIntegerField(default=0, verbose_name="Alto original")
+    # Anchos generados, cada uno en WebP y JPEG; vacío si no se pudo procesar
+    anchos = models.JSONField(default=list, verbose_name="Anchos generados")
+    error = models.TextField(blank=True, verbose_name="Error")
+    procesada = models.DateTimeField(auto_now=True, verbose_name="Procesada")
+
+    class Meta:
+        verbose_name = "Imagen de producto"
+        verbose_name_plural = "Imágenes de productos"
+        ordering = ['-procesada']
+
+    def __str__(self):
+        return self.original
+
+
+class ReglaPrecio(models.Model):
+    """
+    Regla de promoción. Se aplica a un producto, a una categoría o a todos los
+    productos de una empresa (el alcance más concreto que se indique).
+    Las reglas no se evalúan por petición: staff.precios las compila en PrecioEfectivo.
+    """
+    nombre = models.CharField(
+        max_length=50,
+        verbose_name="Nombre de la regla"
+    )
+    descuento = models.PositiveIntegerField(
+        verbose_name="Descuento (%)"
+    )
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='reglas_precio',
+        verbose_name="Producto"
+    )
+    categoria = models.ForeignKey(
+        Categoria,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='reglas_precio',
+        verbose_name="Categoría"
+    )
+    empresa = models.ForeignKey(
+        Empresa,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='reglas_precio',
+        verbose_name="Empresa"
+    )
+    # Franja horaria diaria (happy hour). Si fin < inicio la franja cruza la medianoche.
+    hora_inicio = models.TimeField(null=True, blank=True, verbose_name="Desde (hora)")
+    hora_fin = models.TimeField(null=True, blank=True, verbose_name="Hasta (hora)")
+    cantidad_minima = models.PositiveIntegerField(
+        default=1,
+        verbose_name="Cantidad mínima"
+    )
+    prioridad = models.IntegerField(
+        default=0,
+        verbose_name="Prioridad",
+        help_text="Las reglas de mayor prioridad se aplican primero."
+    )
+    acumulable = models.BooleanField(
+        default=False,
+        verbose_name="¿Acumulable?",
+        help_text="Si no es acumulable, detiene la aplicación de reglas de menor prioridad."
+    )
+    activo = models.BooleanField(
+        default=True,
+        verbose_name="¿Regla activa?"
+    )
+
+    class Meta:
+        verbose_name = "Regla de precio"
+        verbose_name_plural = "Reglas de precio"
+        ordering = ['-prioridad', 'nombre']
+
+    def __str__(self):
+        return f"{self.nombre} (-{self.descuento}%)"
+
+
+class PrecioEfectivo(models.Model):
+    """
+    Tabla precalculada de precios: un tramo por producto, franja horaria y cantidad mínima.
+    'hasta' es exclusivo; NULL significa hasta el final del día.
+    """
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name='precios_efectivos',
+        verbose_name="Producto"
+    )
+    desde = models.TimeField(verbose_name="Desde")
+    hasta = models.TimeField(null=True, blank=True, verbose_name="Hasta")
+    cantidad_minima = models.PositiveIntegerField(default=1, verbose_name="Cantidad mínima")
+    precio = models.DecimalField(
+        max_digits=7,
+        decimal_places=2,
+        verbose_name="Precio efectivo"
+    )
+
+    class Meta:
+        verbose_name = "Precio efectivo"
+        verbose_name_plural = "Precios efectivos"
+        indexes = [
+            models.Index(fields=['producto', 'cantidad_minima', 'desde'], name='precio_producto_franja_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id} {self.desde}-{self.hasta or '24:00'} x{self.cantidad_minima}: {self.precio}"
+
+
+class CartaProgramada(models.Model):
+    """Productos destacados de una empresa para un día concreto, definidos con antelación."""
+    empresa = models.ForeignKey(
+        Empresa,
+        on_delete=models.CASCADE,
+        related_name='cartas_programadas',
+        verbose_name="Empresa"
+    )
+    fecha = models.DateField(verbose_name="Día")
+    productos = models.ManyToManyField(
+        Producto,
+        related_name='cartas_programadas',
+        verbose_name="Productos"
+    )
+
+    class Meta:
+        verbose_name = "Carta programada"
+        verbose_name_plural = "Cartas programadas"
+        ordering = ['-fecha', 'empresa']
+        constraints = [
+            models.UniqueConstraint(fields=['empresa', 'fecha'], name='carta_programada_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.empresa.nombre_comercial} - {self.fecha:%d/%m/%Y}"
+
+
+class CartaPublicada(models.Model):
+    """
+    Instantánea inmutable de la carta del día de una empresa. Cada publicación con
+    cambios crea una versión nueva; las anteriores no se modifican nunca.
+    """
+    empresa = models.ForeignKey(
+        Empresa,
+        on_delete=models.CASCADE,
+        related_name='cartas_publicadas',
+        verbose_name="Empresa"
+    )
+    fecha = models.DateField(verbose_name="Día")
+    version = models.PositiveIntegerField(verbose_name="Versión")
+    contenido = models.JSONField(verbose_name="Contenido (JSON)")
+    html = models.TextField(verbose_name="Fragmento HTML")
+    huella = models.CharField(max_length=64, verbose_name="Huella del contenido")
+    publicada_en = models.DateTimeField(auto_now_add=True, verbose_name="Publicada en")
+
+    class Meta:
+        verbose_name = "Carta publicada"
+        verbose_name_plural = "Cartas publicadas"
+        ordering = ['-fecha', 'empresa', '-version']
+        constraints = [
+            models.UniqueConstraint(fields=['empresa', 'fecha', 'version'], name='carta_publicada_version_unica'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Las cartas publicadas son inmutables: publica una versión nueva.")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.empresa_id} - {self.fecha:%d/%m/%Y} v{self.version}"
+
+
+class PerfilPeticion(models.Model):
+    """
+    Resumen de una petición perfilada bajo demanda (ver chefquest/perfilado.py).
+    Los ficheros <nombre>.prof/.folded/.json están en PERFILADO_DIR.
+    """
+    EXTENSIONES = (".prof", ".folded", ".json")
+
+    nombre = models.CharField(max_length=64, unique=True, verbose_name="Nombre de los ficheros")
+    creado = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Fecha")
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Usuario"
+    )
+    metodo = models.CharField(max_length=10, verbose_name="Método")
+    ruta = models.CharField(max_length=255, verbose_name="Ruta")
+    estado = models.PositiveSmallIntegerField(verbose_name="Código HTTP")
+    duracion_ms = models.FloatField(verbose_name="Duración (ms)")
+    consultas = models.PositiveIntegerField(verbose_name="Consultas SQL")
+    sql_ms = models.FloatField(verbose_name="Tiempo SQL (ms)")
+    plantillas_ms = models.FloatField(verbose_name="Tiempo de plantillas (ms)")
+
+    class Meta:
+        verbose_name = "Perfil de petición"
+        verbose_name_plural = "Perfiles de peticiones"
+        ordering = ['-creado']
+
+    def __str__(self):
+        return f"{self.metodo} {self.ruta} ({self.duracion_ms:.0f} ms)"
+
+
+class PuntoCallejero(models.Model):
+    """
+    Callejero local para geocodificar las direcciones de reparto sin servicios
+    externos. `calle` va normalizada (ver staff/reparto.py); numero=0 es el
+    centro de la calle, para direcciones sin número.
+    """
+    calle = models.CharField(max_length=100, verbose_name="Calle (normalizada)")
+    numero = models.PositiveIntegerField(default=0, verbose_name="Número")
+    latitud = models.FloatField(verbose_name="Latitud")
+    longitud = models.FloatField(verbose_name="Longitud")
+
+    class Meta:
+        verbose_name = "Punto del callejero"
+        verbose_name_plural = "Callejero"
+        ordering = ['calle', 'numero']
+        constraints = [
+            models.UniqueConstraint(fields=['calle', 'numero'], name='punto_callejero_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.calle}, {self.numero} ({self.latitud:.5f}, {self.longitud:.5f})"
+
+
+class EventoOutbox(models.Model):
+    """
+    Outbox de eventos de reservas y productos (ver staff/outbox.py). Solo se
+    añaden filas, en la misma transacción que el cambio que describen; el id es
+    la posición por la que leen los consumidores.
+    """
+    TIPOS = (
+        "reserva.creada", "reserva.confirmada", "reserva.cancelada", "reserva.entregada",
+        "producto.stock", "producto.precio",
+    )
+
+    id = models.BigAutoField(primary_key=True, verbose_name="Posición")
+    tipo = models.CharField(max_length=30, choices=[(t, t) for t in TIPOS], verbose_name="Tipo")
+    modelo = models.CharField(max_length=50, verbose_name="Modelo")
+    objeto_id = models.PositiveBigIntegerField(verbose_name="Id del objeto")
+    # Sin clave foránea real: la tabla no se modifica aunque se borre la empresa
+    empresa = models.ForeignKey(
+        Empresa,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Empresa"
+    )
+    datos = models.JSONField(encoder=DjangoJSONEncoder, default=dict, verbose_name="Datos")
+    creado = models.DateTimeField(auto_now_add=True, verbose_name="Fecha")
+
+    class Meta:
+        verbose_name = "Evento (outbox)"
+        verbose_name_plural = "Eventos (outbox)"
+        ordering = ['id']
+        indexes = [
+            # Consumidores por empresa: WHERE empresa_id = X AND id > N ORDER BY id
+            models.Index(fields=['empresa', 'id'], name='outbox_empresa_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.tipo} {self.modelo} {self.objeto_id}"
+
+
+class ConsumidorOutbox(models.Model):
+    """Posición (último evento procesado) de cada consumidor de la outbox."""
+    nombre = models.CharField(max_length=64, unique=True, verbose_name="Nombre")
+    posicion = models.PositiveBigIntegerField(default=0, verbose_name="Posición")
+    actualizado = models.DateTimeField(auto_now=True, verbose_name="Última lectura")
+
+    class Meta:
+        verbose_name = "Consumidor de la outbox"
+        verbose_name_plural = "Consumidores de la outbox"
+        ordering = ['nombre']
+
+    def __str__(self):
+        return f"{self.nombre} @ {self.posicion}"
@@ -0,0 +1,82 @@
+# staff/onboarding.py
+"""
+Alta masiva de empresas (franquicias con muchos locales).
+
+Todas las empresas, sus usuarios de staff y la pertenencia al grupo "Empresas"
+se crean con inserciones por lotes: un bulk_create por tabla, más una sola
+reserva de códigos para todas las empresas.
+"""
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .codigos import reservar_codigos
+from .models import Empresa
+
+GRUPO_EMPRESAS = "Empresas"
+TAMANO_LOTE = 500
+
+
+def _validar(filas, Usuario):
+    usernames = [u["username"] for fila in filas for u in fila.get("usuarios", [])]
+    repetidos = {u for u, n in Counter(usernames).items() if n > 1}
+    if repetidos:
+        raise ValidationError(f"Usuarios repetidos en la importación: {', '.join(sorted(repetidos))}")
+    existentes = set(Usuario.objects.filter(username__in=usernames).values_list("username", flat=True))
+    if existentes:
+        raise ValidationError(f"Los usuarios ya existen: {', '.join(sorted(existentes))}")
+    for fila in filas:
+        if not (fila.get("nombre_comercial") or "").strip():
+            raise ValidationError("Todas las empresas necesitan nombre comercial.")
+
+
+@transaction.atomic
+def alta_masiva_empresas(filas, tamano=TAMANO_LOTE):
+    """
+    `filas`: lista de dicts
+        {"nombre_comercial", "contacto", "usuarios": [{"username", "email", "nombre_visible", "password"?}]}
+    Los usuarios sin contraseña quedan con contraseña inutilizable (deberán restablecerla).
+    Devuelve la lista de empresas creadas, con su código.
+    """
+    Usuario = get_user_model()
+    _validar(filas, Usuario)
+
+    codigos = reservar_codigos(len(filas))
+    empresas = Empresa.objects.bulk_create(
+        [
+            Empresa(
+                nombre_comercial=fila["nombre_comercial"].strip(),
+                contacto=fila.get("contacto") or "",
+                activo=fila.get("activo", True),
+                codigo=codigo,
+            )
+            for fila, codigo in zip(filas, codigos)
+        ],
+        batch_size=tamano,
+    )
+
+    usuarios = []
+    for fila, empresa in zip(filas, empresas):
+        for datos in fila.get("usuarios", []):
+            usuarios.append(Usuario(
+                username=datos["username"],
+                email=datos.get("email") or fila.get("contacto") or "",
+                nombre_visible=datos.get("nombre_visible") or datos["username"],
+                empresa=empresa,
+                is_staff=True,
+                # make_password(None) genera una contraseña inutilizable
+                password=make_password(datos.get("password") or None),
+            ))
+    usuarios = Usuario.objects.bulk_create(usuarios, batch_size=tamano)
+
+    grupo, _ = Group.objects.get_or_create(name=GRUPO_EMPRESAS)
+    Pertenencia = Usuario.groups.through
+    Pertenencia.objects.bulk_create(
+        [Pertenencia(usuario_id=u.pk, group_id=grupo.pk) for u in usuarios],
+        batch_size=tamano,
+    )
+    return empresas
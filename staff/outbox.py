@@ -0,0 +1,171 @@
+# staff/outbox.py
+"""
+Outbox transaccional de eventos de reservas y productos.
+
+Los modelos con eventos (staff.models.ModeloConEventos) añaden sus filas a
+EventoOutbox dentro de la misma transacción que el cambio: si el cambio se
+deshace, el evento también. Dentro de un `lote()` los eventos se acumulan y se
+insertan con un solo bulk_create al final (p. ej. confirmar una reserva y restar
+el stock de sus productos).
+
+Los consumidores leen por posición (el id, creciente). Un id se reserva al
+insertar pero la fila no se ve hasta el commit, así que dos transacciones pueden
+confirmarse en distinto orden: leer() no pasa de la `frontera`, el último id
+antes del primer hueco reciente. Un hueco más antiguo que OUTBOX_MARGEN_SEGUNDOS
+es un rollback (o una transacción más larga que el margen) y se salta.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from .models import ConsumidorOutbox, EventoOutbox
+
+# Eventos pendientes del lote abierto (None: fuera de un lote, se insertan al momento)
+_lote = ContextVar("outbox_lote", default=None)
+
+
+def _margen():
+    return timedelta(seconds=getattr(settings, "OUTBOX_MARGEN_SEGUNDOS", 10))
+
+
+# ==============================
+# ESCRITURA
+# ==============================
+
+def nuevo_evento(tipo, objeto, datos=None, empresa_id=None):
+    return EventoOutbox(
+        tipo=tipo,
+        modelo=objeto._meta.label_lower,
+        objeto_id=objeto.pk,
+        empresa_id=empresa_id if empresa_id is not None else getattr(objeto, "empresa_id", None),
+        datos=datos or {},
+    )
+
+
+def registrar(tipo, objeto, datos=None, empresa_id=None):
+    """Añade un evento a la transacción actual (al lote abierto, si lo hay)."""
+    evento = nuevo_evento(tipo, objeto, datos, empresa_id)
+    pendientes = _lote.get()
+    if pendientes is None:
+        evento.save()
+    else:
+        pendientes.append(evento)
+    return evento
+
+
+@contextmanager
+def lote(using=None):
+    """
+    Transacción (atomic) cuyos eventos se insertan juntos al cerrarla. Los lotes
+    anidados usan el del exterior; si uno interior falla, sus eventos se descartan
+    con su savepoint.
+    """
+    using = using or DEFAULT_DB_ALIAS
+    pendientes = _lote.get()
+    if pendientes is not None:
+        inicio = len(pendientes)
+        try:
+            with transaction.atomic(using=using):
+                yield
+        except BaseException:
+            del pendientes[inicio:]
+            raise
+        return
+
+    pendientes = []
+    token = _lote.set(pendientes)
+    try:
+        with transaction.atomic(using=using):
+            yield
+            _lote.reset(token)
+            token = None
+            if pendientes:
+                EventoOutbox.objects.using(using).bulk_create(pendientes)
+    finally:
+        if token is not None:
+            _lote.reset(token)
+
+
+# ==============================
+# LECTURA
+# ==============================
+
+def frontera():
+    """Última posición que ya no puede cambiar: hasta ella, leer en orden no se salta eventos."""
+    corte = timezone.now() - _margen()
+    # El evento más reciente con más antigüedad que el margen: los huecos anteriores son definitivos
+    base = (
+        EventoOutbox.objects.filter(creado__lte=corte)
+        .order_by("-pk").values_list("pk", flat=True).first()
+    )
+    recientes = list(
+        EventoOutbox.objects.filter(pk__gt=base or 0)
+        .order_by("pk").values_list("pk", flat=True)
+    )
+    # Sin eventos anteriores al margen, los ids previos al primero visible pueden ser
+    # transacciones aún abiertas: se cuenta desde 0 hasta que dejen de ser recientes
+    base = base or 0
+    for pk in recientes:
+        if pk != base + 1:
+            break
+        base = pk
+    return base
+
+
+def leer(desde=0, limite=500, empresa_id=None, tipos=None):
+    """
+    Eventos con posición > desde (como mucho `limite`), en orden. Devuelve
+    (eventos, siguiente): `siguiente` es la posición desde la que seguir leyendo,
+    aunque no haya eventos para esta empresa o estos tipos.
+    """
+    hasta = frontera()
+    if hasta <= desde:
+        return [], desde
+    eventos = EventoOutbox.objects.filter(pk__gt=desde, pk__lte=hasta)
+    if empresa_id is not None:
+        eventos = eventos.filter(empresa_id=empresa_id)
+    if tipos:
+        eventos = eventos.filter(tipo__in=tipos)
+    eventos = list(eventos.order_by("pk")[:limite])
+    siguiente = eventos[-1].pk if len(eventos) == limite else hasta
+    return eventos, siguiente
+
+
+def como_dict(evento):
+    return {
+        "posicion": evento.pk,
+        "tipo": evento.tipo,
+        "modelo": evento.modelo,
+        "objeto_id": evento.objeto_id,
+        "empresa_id": evento.empresa_id,
+        "datos": evento.datos,
+        "creado": evento.creado.isoformat(),
+    }
+
+
+# ==============================
+# CONSUMIDORES CON POSICIÓN GUARDADA
+# ==============================
+
+def consumir(nombre, procesar, limite=500, tipos=None):
+    """
+    Pasa a procesar(eventos) los eventos pendientes del consumidor `nombre` y
+    guarda su nueva posición. La fila del consumidor se bloquea mientras tanto, así
+    que dos procesos con el mismo nombre no leen lo mismo. Si procesar() falla, la
+    posición no avanza y los eventos se vuelven a entregar (al menos una vez).
+    Devuelve cuántos eventos se han procesado.
+    """
+    ConsumidorOutbox.objects.get_or_create(nombre=nombre)
+    with transaction.atomic():
+        consumidor = ConsumidorOutbox.objects.select_for_update().get(nombre=nombre)
+        eventos, siguiente = leer(consumidor.posicion, limite=limite, tipos=tipos)
+        if eventos:
+            procesar(eventos)
+        if siguiente != consumidor.posicion:
+            consumidor.posicion = siguiente
+            consumidor.save(update_fields=["posicion", "actualizado"])
+    return len(eventos)
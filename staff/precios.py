@@ -0,0 +1,239 @@
+# staff/precios.py
+"""
+Motor de reglas de precio.
+
+Las reglas (ReglaPrecio y los cupones de categoría) se compilan en la tabla
+PrecioEfectivo: para cada producto, tramos horarios y de cantidad mínima con el
+precio final ya calculado. El catálogo y el resto de vistas solo consultan esa tabla.
+"""
+from datetime import time
+from types import SimpleNamespace
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from chefquest import versiones
+from .models import Categoria, PrecioEfectivo, Producto, ReglaPrecio
+
+TAMANO_LOTE = 500
+
+
+# ==============================
+# EVALUACIÓN (solo se usa al compilar)
+# ==============================
+
+def regla_activa_a(regla, hora):
+    if regla.hora_inicio is None and regla.hora_fin is None:
+        return True
+    inicio = regla.hora_inicio or time.min
+    fin = regla.hora_fin
+    if fin is None:
+        return hora >= inicio
+    if inicio <= fin:
+        return inicio <= hora < fin
+    # La franja cruza la medianoche (p. ej. 22:00 - 02:00)
+    return hora >= inicio or hora < fin
+
+
+def regla_aplica_a(regla, producto):
+    """Todos los alcances indicados en la regla deben coincidir; sin alcance aplica a todo."""
+    if regla.producto_id and regla.producto_id != producto.id:
+        return False
+    if regla.categoria_id and regla.categoria_id != producto.categoria_id:
+        return False
+    if regla.empresa_id and regla.empresa_id != producto.empresa_id:
+        return False
+    return True
+
+
+def aplicar_reglas(precio, reglas):
+    """
+    Aplica las reglas por prioridad descendente. Una regla no acumulable
+    se aplica y detiene el resto.
+    """
+    for regla in sorted(reglas, key=lambda r: (-r.prioridad, r.id)):
+        precio = precio * (100 - min(regla.descuento, 100)) / 100
+        if not regla.acumulable:
+            break
+    return round(precio, 2)
+
+
+def compilar_producto(producto, reglas):
+    """Devuelve las filas de PrecioEfectivo (sin guardar) de un producto."""
+    aplicables = [r for r in reglas if regla_aplica_a(r, producto)]
+
+    # El precio solo puede cambiar en los bordes de las franjas horarias
+    cortes = {time.min}
+    for r in aplicables:
+        cortes.update(h for h in (r.hora_inicio, r.hora_fin) if h is not None)
+    cortes = sorted(cortes)
+    cantidades = sorted({1} | {r.cantidad_minima or 1 for r in aplicables})
+
+    filas = []
+    tramos_anteriores = None
+    for cantidad in cantidades:
+        tramos = []
+        for corte in cortes:
+            activas = [r for r in aplicables if (r.cantidad_minima or 1) <= cantidad and regla_activa_a(r, corte)]
+            precio = aplicar_reglas(producto.precio, activas)
+            if tramos and tramos[-1][1] == precio:
+                continue
+            tramos.append((corte, precio))
+
+        # Un nivel de cantidad idéntico al anterior no aporta nada a la búsqueda
+        if tramos == tramos_anteriores:
+            continue
+        tramos_anteriores = tramos
+
+        for i, (desde, precio) in enumerate(tramos):
+            hasta = tramos[i + 1][0] if i + 1 < len(tramos) else None
+            filas.append(PrecioEfectivo(
+                producto_id=producto.id, desde=desde, hasta=hasta,
+                cantidad_minima=cantidad, precio=precio,
+            ))
+    return filas
+
+
+# ==============================
+# COMPILACIÓN
+# ==============================
+
+def cargar_reglas():
+    """Reglas activas más los cupones de categoría, como reglas de prioridad 0 acumulables."""
+    reglas = list(ReglaPrecio.objects.filter(activo=True))
+    cupones = Categoria.objects.filter(cupon__isnull=False).values_list("id", "cupon_id", "cupon__descuento")
+    for categoria_id, cupon_id, descuento in cupones:
+        reglas.append(SimpleNamespace(
+            id=-cupon_id, descuento=descuento or 0, producto_id=None, categoria_id=categoria_id,
+            empresa_id=None, hora_inicio=None, hora_fin=None, cantidad_minima=1,
+            prioridad=0, acumulable=True,
+        ))
+    return reglas
+
+
+def _indexar_reglas(reglas):
+    indice = {"producto": {}, "categoria": {}, "empresa": {}, "global": []}
+    for r in reglas:
+        if r.producto_id:
+            indice["producto"].setdefault(r.producto_id, []).append(r)
+        elif r.categoria_id:
+            indice["categoria"].setdefault(r.categoria_id, []).append(r)
+        elif r.empresa_id:
+            indice["empresa"].setdefault(r.empresa_id, []).append(r)
+        else:
+            indice["global"].append(r)
+    return indice
+
+
+def compilar_precios(producto_ids=None, tamano=TAMANO_LOTE):
+    """
+    Recalcula PrecioEfectivo de los productos indicados (todos si es None).
+    Cada lote se reemplaza en una transacción corta. Devuelve el número de filas escritas.
+    """
+    indice = _indexar_reglas(cargar_reglas())
+
+    qs = Producto.objects.only("id", "precio", "categoria_id", "empresa_id").order_by("pk")
+    if producto_ids is not None:
+        qs = qs.filter(pk__in=list(producto_ids))
+
+    escritas = 0
+    lote = []
+    for producto in qs.iterator(chunk_size=tamano):
+        lote.append(producto)
+        if len(lote) >= tamano:
+            escritas += _guardar_lote(lote, indice)
+            lote = []
+    if lote:
+        escritas += _guardar_lote(lote, indice)
+    # Los precios del catálogo han cambiado: invalida los ETag de las páginas
+    versiones.incrementar(versiones.CATALOGO)
+    return escritas
+
+
+def _guardar_lote(productos, indice):
+    filas = []
+    for p in productos:
+        candidatas = (
+            indice["producto"].get(p.id, [])
+            + indice["categoria"].get(p.categoria_id, [])
+            + indice["empresa"].get(p.empresa_id, [])
+            + indice["global"]
+        )
+        filas.extend(compilar_producto(p, candidatas))
+    with transaction.atomic():
+        PrecioEfectivo.objects.filter(producto_id__in=[p.id for p in productos]).delete()
+        PrecioEfectivo.objects.bulk_create(filas)
+    return len(filas)
+
+
+def productos_de_regla(regla):
+    """Ids de los productos afectados por una regla (None = todos)."""
+    if regla.producto_id:
+        return [regla.producto_id]
+    filtros = {}
+    if regla.categoria_id:
+        filtros["categoria_id"] = regla.categoria_id
+    if regla.empresa_id:
+        filtros["empresa_id"] = regla.empresa_id
+    if not filtros:
+        return None
+    return list(Producto.objects.filter(**filtros).values_list("pk", flat=True))
+
+
+def programar_compilacion(producto_ids):
+    """Recompila al confirmar la transacción actual (o en el acto si no hay ninguna)."""
+    ids = None if producto_ids is None else list(producto_ids)
+    if ids == []:
+        return
+    transaction.on_commit(lambda: compilar_precios(ids))
+
+
+# ==============================
+# CONSULTA (catálogo y pedidos)
+# ==============================
+
+def precios_efectivos(productos, momento=None, cantidad=1):
+    """
+    Devuelve {producto_id: precio} para el momento y la cantidad indicados.
+    `productos` puede ser una lista de ids o un queryset (se usa como subconsulta).
+    Los productos sin compilar no aparecen en el resultado.
+    """
+    hora = timezone.localtime(momento or timezone.now()).time()
+    if isinstance(productos, QuerySet):
+        productos = productos.values("pk")
+    filas = (
+        PrecioEfectivo.objects
+        .filter(producto_id__in=productos, cantidad_minima__lte=cantidad, desde__lte=hora)
+        .filter(Q(hasta__gt=hora) | Q(hasta__isnull=True))
+        .order_by("producto_id", "-cantidad_minima")
+        .values_list("producto_id", "precio")
+    )
+    precios = {}
+    for producto_id, precio in filas:
+        # El nivel de cantidad más alto que cumple va primero
+        precios.setdefault(producto_id, precio)
+    return precios
+
+
+def cortes_horarios(version_catalogo):
+    """
+    Horas en las que puede cambiar algún precio (inicios y fines de las reglas activas),
+    ordenadas. Se cachean con la versión del catálogo, que sube al recompilar.
+    """
+    clave = f"precios:cortes:{version_catalogo}"
+    cortes = cache.get(clave)
+    if cortes is None:
+        horas = ReglaPrecio.objects.filter(activo=True).values_list("hora_inicio", "hora_fin")
+        cortes = sorted({h for fila in horas for h in fila if h is not None})
+        cache.set(clave, cortes, timeout=24 * 60 * 60)
+    return cortes
+
+
+def inicio_tramo(version_catalogo, momento=None):
+    """Instante (hoy, hora local) en que empezó la franja de precios vigente."""
+    ahora = timezone.localtime(momento or timezone.now())
+    hora = ahora.time()
+    corte = max((c for c in cortes_horarios(version_catalogo) if c <= hora), default=time.min)
+    return ahora.replace(hour=corte.hour, minute=corte.minute, second=corte.second, microsecond=corte.microsecond)
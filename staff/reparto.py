@@ -0,0 +1,363 @@
+# staff/reparto.py
+"""
+Planificación de repartos de los pedidos de comida (tipo COMIDA).
+
+1. Geocodificación: la dirección en texto libre se normaliza ("C/ de Alcalá, nº 5, 2ºB"
+   -> ("calle alcala", 5)) y se busca en el callejero local (PuntoCallejero),
+   interpolando entre portales conocidos. Los resultados se guardan en la caché.
+2. Ventanas: los pedidos pendientes de la empresa se agrupan por franjas de
+   REPARTO_VENTANA_MINUTOS según su hora de entrega.
+3. Repartidores: cada ventana se divide en sectores alrededor del local (barrido
+   por ángulo) con el mismo número de pedidos por repartidor.
+4. Orden: cada ruta se construye con vecino más cercano y se mejora con 2-opt,
+   ambos vectorizados con NumPy sobre la matriz de distancias.
+"""
+import hashlib
+import re
+import unicodedata
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from clientes.models import Reserva_Pedido
+
+from .models import Empresa, PuntoCallejero
+
+RADIO_TIERRA_KM = 6371.0
+ESTADOS_REPARTO = ("PENDIENTE", "CONFIRMADO")
+MAX_PASADAS_2OPT = 50
+
+GEO_SEGUNDOS = 30 * 24 * 3600
+GEO_NO_ENCONTRADA_SEGUNDOS = 10 * 60  # para que el callejero nuevo se use pronto
+GEO_GENERACION = "geo:generacion"
+NO_ENCONTRADA = ""
+
+# Tipos de vía abreviados -> nombre completo (solo como primera palabra)
+TIPOS_VIA = {
+    "c": "calle", "cl": "calle", "cll": "calle", "calle": "calle",
+    "av": "avenida", "avd": "avenida", "avda": "avenida", "avenida": "avenida",
+    "pl": "plaza", "plz": "plaza", "pza": "plaza", "plaza": "plaza",
+    "p": "paseo", "po": "paseo", "ps": "paseo", "pso": "paseo", "paseo": "paseo",
+    "ctra": "carretera", "cra": "carretera", "carretera": "carretera",
+    "rda": "ronda", "ronda": "ronda",
+    "trav": "travesia", "trva": "travesia", "travesia": "travesia",
+    "gta": "glorieta", "glorieta": "glorieta",
+    "cm": "camino", "cno": "camino", "camino": "camino",
+}
+VIA_POR_DEFECTO = "calle"
+PALABRAS_VACIAS = {"de", "del", "la", "las", "el", "los", "y"}
+ANTES_DEL_NUMERO = {"n", "no", "num", "numero", "nro"}
+
+
+# ==============================
+# GEOCODIFICACIÓN
+# ==============================
+
+def normalizar_direccion(texto):
+    """
+    Devuelve (calle, numero) con la calle en minúsculas, sin tildes, con el tipo de
+    vía completo y sin artículos. Lo que va tras el número (piso, puerta) se ignora;
+    sin número, numero es None.
+    """
+    texto = unicodedata.normalize("NFKD", (texto or "").lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"\bs\s*/\s*n\b", " ", texto)  # "sin número"
+    palabras = re.findall(r"[a-z]+|\d+", texto)
+
+    calle, numero = [], None
+    for palabra in palabras:
+        if palabra.isdigit():
+            numero = int(palabra)
+            break
+        calle.append(palabra)
+    while calle and calle[-1] in ANTES_DEL_NUMERO:
+        calle.pop()
+    if calle and calle[0] in TIPOS_VIA:
+        via = TIPOS_VIA[calle.pop(0)]
+    else:
+        via = VIA_POR_DEFECTO
+    nombre = [p for p in calle if p not in PALABRAS_VACIAS]
+    if not nombre:
+        return None, numero
+    return " ".join([via, *nombre]), numero
+
+
+def _clave_geo(generacion, calle, numero):
+    huella = hashlib.md5(f"{calle}|{numero}".encode()).hexdigest()
+    return f"geo:{generacion}:{huella}"
+
+
+def olvidar_geocodificaciones():
+    """Invalida todas las direcciones cacheadas (tras importar el callejero)."""
+    if not cache.add(GEO_GENERACION, 1, timeout=None):
+        try:
+            cache.incr(GEO_GENERACION)
+        except ValueError:  # expulsada entre add() e incr()
+            cache.set(GEO_GENERACION, 1, timeout=None)
+
+
+def _situar(portales, numero):
+    """
+    `portales`: array (n, 3) de numero, latitud, longitud de una calle, ordenado por
+    número. Interpola entre los portales de la misma acera (misma paridad).
+    """
+    centro = portales[portales[:, 0] == 0]
+    if numero is None or numero == 0:
+        if len(centro):
+            return tuple(centro[0, 1:])
+        return tuple(portales[:, 1:].mean(axis=0))
+
+    numerados = portales[portales[:, 0] > 0]
+    if not len(numerados):
+        return tuple(centro[0, 1:])
+    acera = numerados[numerados[:, 0] % 2 == numero % 2]
+    if len(acera):
+        numerados = acera
+    numeros = numerados[:, 0]
+    pos = int(np.searchsorted(numeros, numero))
+    if pos < len(numeros) and numeros[pos] == numero:
+        return tuple(numerados[pos, 1:])
+    if pos == 0:
+        return tuple(numerados[0, 1:])
+    if pos == len(numeros):
+        return tuple(numerados[-1, 1:])
+    anterior, siguiente = numerados[pos - 1], numerados[pos]
+    t = (numero - anterior[0]) / (siguiente[0] - anterior[0])
+    return tuple(anterior[1:] + t * (siguiente[1:] - anterior[1:]))
+
+
+def geocodificar(direcciones):
+    """
+    {dirección: (latitud, longitud) o None} para una lista de direcciones en texto.
+    Una lectura de la caché para todas y, para las que falten, una sola consulta
+    al callejero.
+    """
+    normalizadas = {d: normalizar_direccion(d) for d in set(direcciones)}
+    generacion = cache.get(GEO_GENERACION, 0)
+    claves = {
+        _clave_geo(generacion, calle, numero): (calle, numero)
+        for calle, numero in normalizadas.values() if calle
+    }
+    en_cache = cache.get_many(list(claves))
+
+    resultados = {}
+    for clave, valor in en_cache.items():
+        resultados[claves[clave]] = None if valor == NO_ENCONTRADA else tuple(valor)
+
+    pendientes = {c: n for c, n in claves.items() if c not in en_cache}
+    if pendientes:
+        por_calle = {}
+        for calle, numero, latitud, longitud in (
+            PuntoCallejero.objects
+            .filter(calle__in={calle for calle, _ in pendientes.values()})
+            .order_by("calle", "numero")
+            .values_list("calle", "numero", "latitud", "longitud")
+        ):
+            por_calle.setdefault(calle, []).append((numero, latitud, longitud))
+        por_calle = {calle: np.array(filas, dtype=float) for calle, filas in por_calle.items()}
+
+        encontradas, no_encontradas = {}, {}
+        for clave, (calle, numero) in pendientes.items():
+            if calle in por_calle:
+                coordenadas = tuple(float(v) for v in _situar(por_calle[calle], numero))
+                resultados[(calle, numero)] = coordenadas
+                encontradas[clave] = coordenadas
+            else:
+                resultados[(calle, numero)] = None
+                no_encontradas[clave] = NO_ENCONTRADA
+        if encontradas:
+            cache.set_many(encontradas, timeout=GEO_SEGUNDOS)
+        if no_encontradas:
+            cache.set_many(no_encontradas, timeout=GEO_NO_ENCONTRADA_SEGUNDOS)
+
+    return {d: resultados.get(n) if n[0] else None for d, n in normalizadas.items()}
+
+
+# ==============================
+# RUTAS
+# ==============================
+
+def a_plano(coordenadas, origen):
+    """
+    (latitud, longitud) -> km en un plano centrado en `origen` (proyección
+    equirectangular: a escala de ciudad el error es despreciable).
+    """
+    coordenadas = np.radians(np.asarray(coordenadas, dtype=float).reshape(-1, 2))
+    lat0, lon0 = np.radians(origen)
+    x = (coordenadas[:, 1] - lon0) * np.cos(lat0) * RADIO_TIERRA_KM
+    y = (coordenadas[:, 0] - lat0) * RADIO_TIERRA_KM
+    return np.column_stack((x, y))
+
+
+def matriz_distancias(puntos):
+    diferencias = puntos[:, None, :] - puntos[None, :, :]
+    return np.sqrt((diferencias ** 2).sum(axis=2))
+
+
+def vecino_mas_cercano(distancias):
+    """Ruta cerrada que empieza en el nodo 0 (el local) y va siempre al más cercano sin visitar."""
+    n = len(distancias)
+    ruta = np.zeros(n, dtype=np.int64)
+    visitado = np.zeros(n, dtype=bool)
+    visitado[0] = True
+    actual = 0
+    for paso in range(1, n):
+        actual = int(np.where(visitado, np.inf, distancias[actual]).argmin())
+        ruta[paso] = actual
+        visitado[actual] = True
+    return ruta
+
+
+def dos_opt(ruta, distancias, max_pasadas=MAX_PASADAS_2OPT):
+    """
+    Mejora una ruta cerrada invirtiendo tramos mientras acorte el recorrido. Para
+    cada arista (a, b) se evalúan a la vez todas las aristas posteriores (c, d).
+    El nodo 0 no se mueve.
+    """
+    ruta = ruta.copy()
+    n = len(ruta)
+    if n < 4:
+        return ruta
+    for _ in range(max_pasadas):
+        mejorada = False
+        for i in range(n - 2):
+            a, b = ruta[i], ruta[i + 1]
+            c = ruta[i + 2:]
+            d = np.append(ruta[i + 3:], ruta[0])
+            ahorro = distancias[a, c] + distancias[b, d] - distancias[a, b] - distancias[c, d]
+            j = int(ahorro.argmin())
+            if ahorro[j] < -1e-9:
+                j += i + 2
+                ruta[i + 1:j + 1] = ruta[i + 1:j + 1][::-1]
+                mejorada = True
+        if not mejorada:
+            break
+    return ruta
+
+
+def longitud_ruta(ruta, distancias):
+    """Km del recorrido cerrado (vuelta al local incluida)."""
+    return float(distancias[ruta, np.roll(ruta, -1)].sum())
+
+
+def sectores(puntos, repartidores):
+    """
+    Reparte los puntos (km respecto al local) en `repartidores` grupos del mismo
+    tamaño por barrido angular, empezando a cortar en el mayor hueco entre pedidos.
+    Devuelve una lista de arrays de índices.
+    """
+    n = len(puntos)
+    repartidores = max(1, min(repartidores, n))
+    if repartidores == 1:
+        return [np.arange(n)]
+    angulos = np.arctan2(puntos[:, 1], puntos[:, 0])
+    orden = np.argsort(angulos, kind="stable")
+    huecos = np.diff(np.append(angulos[orden], angulos[orden[0]] + 2 * np.pi))
+    orden = np.roll(orden, -(int(huecos.argmax()) + 1))
+    return np.array_split(orden, repartidores)
+
+
+def ordenar_ruta(puntos):
+    """
+    `puntos`: km respecto al local (el local es el origen). Devuelve el orden de
+    visita (índices de `puntos`) y los km de la ruta cerrada.
+    """
+    nodos = np.vstack(([0.0, 0.0], puntos))
+    distancias = matriz_distancias(nodos)
+    ruta = dos_opt(vecino_mas_cercano(distancias), distancias)
+    return ruta[1:] - 1, longitud_ruta(ruta, distancias)
+
+
+def rutas_de_ventana(puntos, repartidores):
+    """Lista de (índices en orden de visita, km) por repartidor."""
+    rutas = []
+    for grupo in sectores(puntos, repartidores):
+        orden, km = ordenar_ruta(puntos[grupo])
+        rutas.append((grupo[orden], km))
+    return rutas
+
+
+# ==============================
+# PLANIFICACIÓN
+# ==============================
+
+def get_ventana_minutos():
+    return getattr(settings, "REPARTO_VENTANA_MINUTOS", 30)
+
+
+def _inicio_ventana(fecha, minutos):
+    local = timezone.localtime(fecha)
+    desde_medianoche = local.hour * 60 + local.minute
+    return local.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(
+        minutes=desde_medianoche - desde_medianoche % minutos
+    )
+
+
+def planificar_reparto(empresa_id, desde, hasta, repartidores=1, ventana_minutos=None):
+    """
+    Rutas por ventana y repartidor para los pedidos COMIDA pendientes de la empresa
+    con desde <= fecha < hasta. Devuelve un dict:
+        origen: (latitud, longitud) del local (o el centro de los pedidos)
+        ventanas: [{inicio, fin, rutas: [{repartidor, km, minutos, paradas: [...]}]}]
+        sin_ubicar: pedidos cuya dirección no está en el callejero
+    """
+    ventana_minutos = ventana_minutos or get_ventana_minutos()
+    velocidad = getattr(settings, "REPARTO_VELOCIDAD_KMH", 20)
+    minutos_parada = getattr(settings, "REPARTO_MINUTOS_PARADA", 3)
+
+    pedidos = list(
+        Reserva_Pedido.objects
+        .filter(
+            empresa_id=empresa_id,
+            tipo="COMIDA",
+            estado__in=ESTADOS_REPARTO,
+            fecha__gte=desde,
+            fecha__lt=hasta,
+        )
+        .order_by("fecha", "pk")
+        .values("pk", "fecha", "direccion", "estado")
+    )
+    situadas = geocodificar([p["direccion"] for p in pedidos])
+    ubicados = [p for p in pedidos if situadas[p["direccion"]]]
+    sin_ubicar = [p for p in pedidos if not situadas[p["direccion"]]]
+
+    origen = Empresa.objects.filter(pk=empresa_id).values_list("latitud", "longitud").first()
+    if not origen or None in origen:
+        origen = (
+            tuple(np.mean([situadas[p["direccion"]] for p in ubicados], axis=0).tolist())
+            if ubicados else None
+        )
+
+    por_ventana = {}
+    for pedido in ubicados:
+        por_ventana.setdefault(_inicio_ventana(pedido["fecha"], ventana_minutos), []).append(pedido)
+
+    ventanas = []
+    for inicio, grupo in sorted(por_ventana.items()):
+        puntos = a_plano([situadas[p["direccion"]] for p in grupo], origen)
+        rutas = []
+        for numero, (orden, km) in enumerate(rutas_de_ventana(puntos, repartidores), start=1):
+            paradas = []
+            recorrido = 0.0
+            anterior = np.zeros(2)
+            for posicion, indice in enumerate(orden):
+                recorrido += float(np.hypot(*(puntos[indice] - anterior)))
+                anterior = puntos[indice]
+                paradas.append({
+                    **grupo[indice],
+                    "coordenadas": situadas[grupo[indice]["direccion"]],
+                    "km": round(recorrido, 2),
+                    "llegada": inicio + timedelta(minutes=recorrido / velocidad * 60 + posicion * minutos_parada),
+                })
+            rutas.append({
+                "repartidor": numero,
+                "km": round(km, 2),
+                "minutos": round(km / velocidad * 60 + len(paradas) * minutos_parada),
+                "paradas": paradas,
+            })
+        ventanas.append({"inicio": inicio, "fin": inicio + timedelta(minutes=ventana_minutos), "rutas": rutas})
+
+    return {"origen": origen, "ventanas": ventanas, "sin_ubicar": sin_ubicar}
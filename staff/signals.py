@@ -0,0 +1,107 @@
+# staff/signals.py
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from chefquest import versiones
+from .models import CartaPublicada, Categoria, Cupon, Empresa, Producto, PuntoCallejero, ReglaPrecio
+from .precios import productos_de_regla, programar_compilacion
+from .cocina import olvidar_cola
+
+
+# ==============================
+# RECOMPILACIÓN INCREMENTAL DE PRECIOS
+# ==============================
+
+@receiver(pre_save, sender=ReglaPrecio)
+def regla_alcance_anterior(sender, instance, raw=False, **kwargs):
+    # Si la regla cambia de producto/categoría/empresa, los productos del alcance
+    # anterior también tienen que perder el descuento
+    instance._productos_anteriores = []
+    if raw or instance.pk is None:
+        return
+    anterior = ReglaPrecio.objects.filter(pk=instance.pk).only("producto_id", "categoria_id", "empresa_id").first()
+    alcance = lambda r: (r.producto_id, r.categoria_id, r.empresa_id)
+    if anterior is not None and alcance(anterior) != alcance(instance):
+        instance._productos_anteriores = productos_de_regla(anterior)
+
+
+@receiver(post_save, sender=ReglaPrecio)
+@receiver(post_delete, sender=ReglaPrecio)
+def regla_cambiada(sender, instance, **kwargs):
+    actuales = productos_de_regla(instance)
+    anteriores = getattr(instance, "_productos_anteriores", [])
+    instance._productos_anteriores = []
+    if actuales is None or anteriores is None:
+        programar_compilacion(None)
+    else:
+        programar_compilacion(set(actuales) | set(anteriores))
+
+
+@receiver(post_save, sender=Producto)
+def producto_guardado(sender, instance, **kwargs):
+    programar_compilacion([instance.pk])
+
+
+@receiver(post_save, sender=Categoria)
+def categoria_guardada(sender, instance, **kwargs):
+    programar_compilacion(Producto.objects.filter(categoria=instance).values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=Categoria)
+@receiver(pre_delete, sender=Empresa)
+def alcance_borrado(sender, instance, **kwargs):
+    # pre_delete: después sus productos pasan a NULL (sin cupón ni reglas de ese alcance)
+    # y las reglas borradas en cascada ya no encontrarían a quién afectaban
+    campo = "categoria" if sender is Categoria else "empresa"
+    programar_compilacion(Producto.objects.filter(**{campo: instance}).values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=Cupon)
+@receiver(pre_delete, sender=Cupon)
+def cupon_cambiado(sender, instance, **kwargs):
+    # pre_delete: al borrar el cupón las categorías pasan a NULL y ya no sabríamos cuáles eran
+    programar_compilacion(Producto.objects.filter(categoria__cupon=instance).values_list("pk", flat=True))
+
+
+# ==============================
+# CONTADORES DE VERSIÓN (respuestas condicionales)
+# ==============================
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def producto_version(sender, instance, **kwargs):
+    nombres = [versiones.CATALOGO]
+    if instance.empresa_id:
+        nombres.append(versiones.clave_empresa(instance.empresa_id))
+    versiones.incrementar_al_confirmar(*nombres)
+
+
+@receiver(post_save, sender=Empresa)
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_save, sender=CartaPublicada)
+def catalogo_version(sender, instance, **kwargs):
+    versiones.incrementar_al_confirmar(versiones.CATALOGO)
+
+
+# ==============================
+# CALLEJERO DE REPARTO
+# ==============================
+
+@receiver(post_save, sender=PuntoCallejero)
+@receiver(post_delete, sender=PuntoCallejero)
+def callejero_cambiado(sender, instance, **kwargs):
+    from .reparto import olvidar_geocodificaciones  # importa NumPy: no en el arranque
+
+    olvidar_geocodificaciones()
+
+
+# ==============================
+# COLA DE COCINA
+# ==============================
+
+@receiver(post_save, sender=Producto)
+def producto_tiempo_cambiado(sender, instance, created, update_fields, **kwargs):
+    # La duración y la carga de las reservas confirmadas dependen del tiempo de preparación
+    if not created and instance.empresa_id and (update_fields is None or "tiempo_preparacion" in update_fields):
+        olvidar_cola(instance.empresa_id)
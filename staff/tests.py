@@ -1,3 +1,193 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from chefquest.concurrencia import MENSAJE_CONFLICTO_FORMULARIO, ConflictoDeVersion
+from clientes.models import Reserva_Pedido, Usuario
+
+from .models import EventoOutbox, Empresa, Producto
+
+# Caché en memoria y vacía en cada test: la de ficheros se comparte entre ejecuciones
+CACHE_PRUEBAS = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class ArranqueTests(TestCase):
+    def test_arranque_dentro_del_presupuesto(self):
+        # medir_arranque arranca intérpretes nuevos contra esta misma base de datos
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("La base de datos de pruebas está en memoria: otro proceso no la ve.")
+        # Con margen (ARRANQUE_MARGEN_TESTS) para las máquinas de CI; falla también si la
+        # primera petición no responde 2xx/3xx
+        presupuesto = settings.ARRANQUE_PRESUPUESTO_MS * settings.ARRANQUE_MARGEN_TESTS
+        try:
+            call_command("medir_arranque", presupuesto=presupuesto, stdout=StringIO())
+        except CommandError as e:
+            self.fail(str(e))
+
+
+def datos_producto(producto, **extra):
+    return {
+        "nombre": producto.nombre,
+        "descripcion": producto.descripcion,
+        "precio": producto.precio,
+        "coste": producto.coste,
+        "stock": producto.stock,
+        "tiempo_preparacion": producto.tiempo_preparacion,
+        "activo": "on",
+        "version": producto.version,
+        **extra,
+    }
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class ProductoVersionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.empresa = Empresa.objects.create(nombre_comercial="Casa Pepe", contacto="pepe@example.com")
+        self.producto = Producto.objects.create(
+            nombre="Paella", descripcion="Para dos", precio=20, coste=8, stock=5, empresa=self.empresa,
+        )
+        self.staff = Usuario.objects.create_user(
+            username="pepe", password="x", nombre_visible="Pepe", empresa=self.empresa,
+        )
+        self.staff.user_permissions.add(Permission.objects.get(codename="change_producto"))
+        self.url = reverse("staff:producto_update", args=[self.producto.pk])
+
+    def test_guardar_con_version_obsoleta_falla(self):
+        abierto = Producto.objects.get(pk=self.producto.pk)
+        # Una venta entretanto (como confirmar_reserva): resta stock y sube la versión
+        Producto.objects.filter(pk=self.producto.pk).update(stock=F("stock") - 1, version=F("version") + 1)
+
+        abierto.stock = 10
+        with self.assertRaises(ConflictoDeVersion):
+            abierto.save(update_fields=["stock"])
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 4)
+
+    def test_guardado_parcial_no_pisa_el_stock(self):
+        Producto.objects.filter(pk=self.producto.pk).update(stock=3)
+        self.producto.precio = 22
+        self.producto.save(update_fields=["precio"])
+
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 3)
+        self.assertEqual(self.producto.precio, 22)
+        self.assertEqual(self.producto.version, 2)
+
+    def test_formulario_obsoleto_no_deshace_una_venta(self):
+        self.client.force_login(self.staff)
+        datos = datos_producto(self.producto, precio="25.00")
+        Producto.objects.filter(pk=self.producto.pk).update(stock=F("stock") - 1, version=F("version") + 1)
+
+        respuesta = self.client.post(self.url, datos)
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn(MENSAJE_CONFLICTO_FORMULARIO, respuesta.context["form"].non_field_errors())
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 4)
+        self.assertEqual(self.producto.precio, 20)
+
+        # Reenviado sobre la versión actual, solo se escribe el precio
+        respuesta = self.client.post(self.url, datos_producto(self.producto, precio="25.00"))
+        self.assertEqual(respuesta.status_code, 302)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 4)
+        self.assertEqual(self.producto.precio, 25)
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class ConfirmarReservaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.empresa = Empresa.objects.create(nombre_comercial="Casa Pepe", contacto="pepe@example.com")
+        self.producto = Producto.objects.create(
+            nombre="Paella", descripcion="Para dos", precio=20, coste=8, stock=1, empresa=self.empresa,
+        )
+        self.staff = Usuario.objects.create_user(
+            username="pepe", password="x", nombre_visible="Pepe", empresa=self.empresa,
+        )
+        self.reserva = self.crear_reserva()
+        self.client.force_login(self.staff)
+
+    def crear_reserva(self):
+        reserva = Reserva_Pedido.objects.create(
+            tipo="COMIDA", fecha=timezone.now() + timedelta(days=1), comensales=2,
+            direccion="Calle Mayor 1", estado="PENDIENTE", empresa=self.empresa,
+        )
+        reserva.productos.add(self.producto)
+        return reserva
+
+    def confirmar(self, reserva, clave="confirmar-1"):
+        url = reverse("staff:confirmar_reserva", args=[reserva.pk])
+        return self.client.post(url, {"idempotency_key": clave})
+
+    def test_confirmar_resta_stock_y_sube_version(self):
+        self.confirmar(self.reserva)
+
+        self.reserva.refresh_from_db()
+        self.producto.refresh_from_db()
+        self.assertEqual(self.reserva.estado, "CONFIRMADO")
+        self.assertEqual(self.producto.stock, 0)
+        self.assertEqual(self.producto.version, 2)
+        self.assertTrue(EventoOutbox.objects.filter(tipo="producto.stock", objeto_id=self.producto.pk).exists())
+
+    def test_confirmar_duplicado_resta_stock_una_vez(self):
+        Producto.objects.filter(pk=self.producto.pk).update(stock=5)
+        primera = self.confirmar(self.reserva)
+        segunda = self.confirmar(self.reserva)
+
+        self.assertEqual(segunda["Idempotent-Replayed"], "true")
+        self.assertEqual(segunda["Location"], primera["Location"])
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 4)
+
+    def test_stock_agotado_entretanto_deshace_la_confirmacion(self):
+        def vender_el_ultimo(reserva):
+            # Otra confirmación se lleva la última unidad después de la comprobación de stock
+            Producto.objects.filter(pk=self.producto.pk).update(stock=0, version=F("version") + 1)
+            return []
+
+        with mock.patch("staff.views.tramos_saturados", side_effect=vender_el_ultimo):
+            self.confirmar(self.reserva)
+
+        self.reserva.refresh_from_db()
+        self.producto.refresh_from_db()
+        self.assertEqual(self.reserva.estado, "PENDIENTE")
+        self.assertEqual(self.reserva.version, 1)
+        self.assertEqual(self.producto.stock, 0)
+        self.assertFalse(EventoOutbox.objects.filter(tipo="reserva.confirmada").exists())
+
+    def test_reserva_modificada_entretanto_no_resta_stock(self):
+        def editar_reserva(reserva):
+            Reserva_Pedido.objects.filter(pk=reserva.pk).update(notas="Sin gluten", version=F("version") + 1)
+            return []
+
+        with mock.patch("staff.views.tramos_saturados", side_effect=editar_reserva):
+            self.confirmar(self.reserva)
+
+        self.reserva.refresh_from_db()
+        self.producto.refresh_from_db()
+        self.assertEqual(self.reserva.estado, "PENDIENTE")
+        self.assertEqual(self.producto.stock, 1)
+
+    def test_dos_reservas_para_la_ultima_unidad(self):
+        otra = self.crear_reserva()
+        self.confirmar(self.reserva, clave="a")
+        self.confirmar(otra, clave="b")
+
+        self.reserva.refresh_from_db()
+        otra.refresh_from_db()
+        self.producto.refresh_from_db()
+        self.assertEqual(self.reserva.estado, "CONFIRMADO")
+        self.assertEqual(otra.estado, "PENDIENTE")
+        self.assertEqual(self.producto.stock, 0)
@@ -37,5 +37,10 @@ urlpatterns = [
 
 
     path("estadisticas/", views.EstadisticasView.as_view(), name="estadisticas"),
+    path("estadisticas/datos.json", views.estadisticas_datos, name="estadisticas_datos"),
+    path("reparto/", views.reparto, name="reparto"),
+    path("cocina/", views.cocina, name="cocina"),
+    path("eventos.json", views.eventos, name="eventos"),
     path("registro/", views.EmpresaRegistroView.as_view(), name="registro_empresa"),
+    path("perfiles/<str:nombre>.<str:extension>", views.descargar_perfil, name="descargar_perfil"),
 ]
@@ -5,9 +5,8 @@ from typing import Optional
 def get_empresa_id_from_user(user) -> Optional[int]:
     """
     Devuelve el id de la empresa asociada al usuario (FK directa user.empresa) o None.
-    Prioriza siempre user.empresa.
+    Lee user.empresa_id: no necesita cargar la empresa.
     """
     if not user or not getattr(user, "is_authenticated", False):
         return None
-    empresa = getattr(user, "empresa", None)
-    return getattr(empresa, "id", None) if empresa else None
+    return getattr(user, "empresa_id", None)
@@ -1,4 +1,6 @@
 # staff/views.py
+import os
+from datetime import datetime, timedelta
 from functools import wraps
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
@@ -8,15 +10,29 @@ from django.urls import reverse_lazy
 from django.contrib import messages
 from django.db.models import F, Count, Sum
 from django.core.exceptions import PermissionDenied
+from django.contrib.auth.decorators import user_passes_test
+from django.http import FileResponse, Http404, JsonResponse
+from django.utils import timezone
 
-from .models import Producto, Empresa
+from .models import Producto, Empresa, PerfilPeticion
 from clientes.models import Usuario
 from clientes.models import Reserva_Pedido
 from .mixins import EmpresaEnSesionMixin, EmpresaStaffMixin, UsuarioEmpresaRequiredMixin
-from .forms import EmpresaRegistroForm
+from .forms import EmpresaRegistroForm, ProductoFormStaff
 from .utils import get_empresa_id_from_user
+from .cocina import TRAMO, como_fecha, leer_cola, tramos_saturados
+from .outbox import como_dict, leer as leer_eventos, lote, registrar
 from .decorators import empresa_required
 from django.contrib.auth import login
+from django.utils.decorators import method_decorator
+from chefquest.db_routers import ReplicaLecturaMixin, usar_replica
+from chefquest.condicional import condicional, contadores_empresa
+from chefquest.perfilado import get_directorio
+from chefquest.limitador import ip_de_la_peticion, permitir_intento
+from chefquest import cache_niveles, versiones
+from chefquest.idempotencia import idempotente, nueva_clave
+from chefquest.concurrencia import ConflictoDeVersion, EdicionVersionadaMixin, MENSAJE_CONFLICTO
+from django.views.decorators.http import require_POST
 
 
 # ==============================
@@ -34,6 +50,12 @@ def login_empresa(request):
             messages.error(request, "Debe introducir usuario y código de empresa.")
             return redirect("login_empresa")
 
+        # El código de empresa es lo que se adivina aquí: mismas cubetas que el login
+        permitido, _ = permitir_intento(ip=ip_de_la_peticion(request), usuario=username, codigo_empresa=codigo)
+        if not permitido:
+            messages.error(request, "Demasiados intentos. Espera unos minutos y vuelve a intentarlo.")
+            return redirect("login_empresa")
+
         try:
             # Buscamos al usuario
             user = Usuario.objects.get(username=username)
@@ -77,9 +99,12 @@ def logout_empresa(request):
 # CRUD PRODUCTOS (CBV)
 # ==============================
 
+# En get y no en dispatch: la respuesta condicional solo tras pasar los mixins de acceso
+@method_decorator(condicional(contadores_empresa), name="get")
 class ProductoListView(
     LoginRequiredMixin,
     PermissionRequiredMixin,
+    ReplicaLecturaMixin,
     ListView,
 ):
     model = Producto
@@ -100,8 +125,13 @@ class ProductoListView(
         if not empresa_id:
             raise PermissionDenied("No hay empresa activa en sesión ni asociada al usuario.")
 
-        # Optimizar: traer categoría y empresa en la misma consulta si se accede en plantilla
-        return Producto.objects.filter(empresa_id=empresa_id).select_related("categoria", "empresa")
+        # Optimizar: traer categoría y empresa en la misma consulta si se accede en plantilla.
+        # Cacheado en dos niveles; cambia de clave al modificar productos o el catálogo (categorías)
+        return cache_niveles.obtener(
+            "productos_staff",
+            lambda: list(Producto.objects.filter(empresa_id=empresa_id).select_related("categoria", "empresa")),
+            empresa_id=empresa_id, dependencias=(versiones.CATALOGO,), ttl=600,
+        )
 
 
 class ProductoCreateView(
@@ -112,8 +142,7 @@ class ProductoCreateView(
     CreateView,
 ):
     model = Producto
-    fields = ["nombre", "descripcion", "precio",
-              "coste", "stock", "activo", "categoria"]
+    form_class = ProductoFormStaff
     permission_required = "staff.add_producto"
     template_name = "staff/producto_form.html"
     success_url = reverse_lazy("staff:producto_list")
@@ -139,11 +168,11 @@ class ProductoUpdateView(
     PermissionRequiredMixin,
     EmpresaEnSesionMixin,
     UsuarioEmpresaRequiredMixin,
+    EdicionVersionadaMixin,
     UpdateView,
 ):
     model = Producto
-    fields = ["nombre", "descripcion", "precio",
-              "coste", "stock", "activo", "categoria"]
+    form_class = ProductoFormStaff
     permission_required = "staff.change_producto"
     template_name = "staff/producto_form.html"
     success_url = reverse_lazy("staff:producto_list")
@@ -188,11 +217,14 @@ class EmpresaRegistroView(CreateView):
 # ==============================
 # LISTADO RESERVAS EMPRESA
 # ==============================
+# En get y no en dispatch: la respuesta condicional solo tras pasar los mixins de acceso
+@method_decorator(condicional(contadores_empresa), name="get")
 class ReservasEmpresaListView(
     LoginRequiredMixin,
     PermissionRequiredMixin,
     EmpresaEnSesionMixin,
     UsuarioEmpresaRequiredMixin,
+    ReplicaLecturaMixin,
     ListView,
 ):
     model = Reserva_Pedido
@@ -205,22 +237,30 @@ class ReservasEmpresaListView(
         if not empresa_id:
             raise PermissionDenied("No hay empresa activa en sesión.")
 
-        # Filtrar por cliente__empresa (el usuario cliente tiene FK a Empresa)
+        # Filtrar por la empresa desnormalizada (índice empresa + fecha, sin JOIN)
         # select_related cliente para evitar consultas adicionales al acceder a cliente en plantilla
         return (
             Reserva_Pedido.objects
-            .filter(cliente__empresa_id=empresa_id)
+            .filter(empresa_id=empresa_id)
             .select_related("cliente")
             .prefetch_related("productos")
         )
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Una clave por render: con la ruta de cada reserva identifica cada confirmación
+        context["clave_idempotencia"] = nueva_clave()
+        return context
+
 
 # ==============================
 # CONFIRMAR RESERVA (FBV)
 # ==============================
 
+@idempotente("confirmar_reserva")
 @login_required
 @empresa_required
+@require_POST
 def confirmar_reserva(request, pk):
     empresa_id = request.session.get("empresa_id") or get_empresa_id_from_user(request.user)
     if not empresa_id:
@@ -228,17 +268,9 @@ def confirmar_reserva(request, pk):
 
     reserva = get_object_or_404(Reserva_Pedido, pk=pk)
 
-    # Validar que la reserva pertenece a la empresa activa (por cliente.empresa)
-    cliente_empresa_id = None
-    if getattr(reserva, "cliente", None):
-        cliente_empresa_id = getattr(reserva.cliente, "empresa_id", None) or getattr(getattr(reserva.cliente, "usuario_perfil", None), "empresa_id", None)
-
-    if cliente_empresa_id and cliente_empresa_id != empresa_id:
+    # Validar que la reserva pertenece a la empresa activa (columna desnormalizada)
+    if reserva.empresa_id != int(empresa_id):
         raise PermissionDenied("No tienes permisos sobre esta reserva.")
-    if not cliente_empresa_id:
-        # Si no hay empresa en cliente, validar por productos asociados a la reserva
-        if not reserva.productos.filter(empresa_id=empresa_id).exists():
-            raise PermissionDenied("No tienes permisos sobre esta reserva.")
 
     if reserva.estado != "PENDIENTE":
         messages.error(request, "Solo se pueden confirmar reservas pendientes.")
@@ -251,16 +283,41 @@ def confirmar_reserva(request, pk):
             messages.error(request, f"No hay stock suficiente de {producto.nombre}.")
             return redirect("staff:lista_reservas_staff")
 
-    # Restar stock solo de esos productos usando F() para evitar condiciones de carrera
-    for producto in productos_empresa:
-        Producto.objects.filter(pk=producto.pk).update(
-            stock=F("stock") - 1
-        )
-
-    reserva.estado = "CONFIRMADO"
-    reserva.save()
+    # Tramos de cocina que esta reserva deja por encima de la capacidad (antes de añadirla)
+    saturados = tramos_saturados(reserva)
+
+    # Sin bloqueos: la reserva se guarda comparando su versión y el stock se resta
+    # con F() solo si sigue habiendo (y sube la versión, para que los formularios
+    # abiertos con el stock anterior no lo pisen). Si algo falla, se deshace todo,
+    # eventos de la outbox incluidos (se insertan juntos al final del lote).
+    sin_stock = None
+    try:
+        with lote():
+            reserva.estado = "CONFIRMADO"
+            reserva.save(update_fields=["estado"])
+            for producto in productos_empresa:
+                restado = Producto.objects.filter(pk=producto.pk, stock__gte=1).update(
+                    stock=F("stock") - 1, version=F("version") + 1
+                )
+                if not restado:
+                    sin_stock = producto
+                    raise ConflictoDeVersion(f"Sin stock de {producto.nombre}")
+            # update() no pasa por save(): los eventos de stock se registran aquí
+            for producto in Producto.objects.filter(pk__in=[p.pk for p in productos_empresa]):
+                registrar("producto.stock", producto, {
+                    "antes": producto.stock + 1, "despues": producto.stock, "version": producto.version,
+                })
+    except ConflictoDeVersion:
+        if sin_stock:
+            messages.error(request, f"No hay stock suficiente de {sin_stock.nombre}.")
+        else:
+            messages.error(request, MENSAJE_CONFLICTO)
+        return redirect("staff:lista_reservas_staff")
 
     messages.success(request, "Reserva confirmada correctamente.")
+    if saturados:
+        horas = ", ".join(f"{tramo:%H:%M}" for tramo, _ in saturados)
+        messages.warning(request, f"La cocina supera su capacidad en los tramos de {horas}.")
     return redirect("staff:lista_reservas_staff")
 
 
@@ -270,9 +327,11 @@ def confirmar_reserva(request, pk):
 
 class EstadisticasView(LoginRequiredMixin,
                        UsuarioEmpresaRequiredMixin,
+                       ReplicaLecturaMixin,
                        ListView):
     model = Reserva_Pedido
     template_name = "staff/estadisticas.html"
+    paginate_by = 50
 
     def get_empresa_id(self):
         # Prioriza empresa en sesión; si no, usa user.empresa (FK) o perfil
@@ -296,13 +355,11 @@ class EstadisticasView(LoginRequiredMixin,
             messages.error(self.request, "No tienes una empresa asociada. Inicia sesión en una empresa para ver estadísticas.")
             return Reserva_Pedido.objects.none()
 
-        # Anotar número total de productos por reserva
+        # Solo el listado paginado: las series se piden aparte a estadisticas_datos
         return (
             Reserva_Pedido.objects
-            .filter(cliente__empresa_id=empresa_id)
-            .select_related("cliente")
-            .prefetch_related("productos")
-            .annotate(total_productos=Count("productos"))
+            .filter(empresa_id=empresa_id)
+            .only("id", "tipo", "fecha", "estado")
         )
 
     def get_context_data(self, **kwargs):
@@ -318,7 +375,7 @@ class EstadisticasView(LoginRequiredMixin,
         # Ejemplo de agregado adicional: ingresos estimados y coste total (si campos existen en modelo)
         empresa_id = self.request.session.get("empresa_id")
         if empresa_id:
-            qs_hoy = Reserva_Pedido.objects.filter(cliente__empresa_id=empresa_id)
+            qs_hoy = Reserva_Pedido.objects.filter(empresa_id=empresa_id)
             # Si Reserva_Pedido tiene campo 'importe' o similar, sumar
             try:
                 stats = qs_hoy.aggregate(
@@ -339,3 +396,133 @@ class EstadisticasView(LoginRequiredMixin,
         context["empresa_id"] = self.request.session.get("empresa_id")
         return context
 
+
+@login_required
+@empresa_required
+# Después de la autenticación: un 304 no debe llegar a quien no puede ver la página
+@condicional(contadores_empresa)
+@usar_replica
+def estadisticas_datos(request):
+    """Series del panel de estadísticas en JSON (?dias=N, por defecto 90)."""
+    try:
+        dias = min(max(int(request.GET.get("dias", 90)), 1), 365)
+    except ValueError:
+        dias = 90
+    from .analitica import analitica_empresa  # NumPy solo se importa al usarlo
+
+    empresa_id = request.session["empresa_id"]
+    datos = cache_niveles.obtener(
+        "estadisticas", lambda: analitica_empresa(empresa_id, dias=dias),
+        empresa_id=empresa_id, partes=(dias,), ttl=300,
+    )
+    response = JsonResponse(datos)
+    # Privada: depende de la empresa en sesión. El ETag de @condicional evita recalcularla
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+# ==============================
+# COCINA
+# ==============================
+
+@login_required
+@empresa_required
+def cocina(request):
+    """Próximas reservas confirmadas por hora de inicio y carga prevista por tramos de 15 minutos (?horas=N)."""
+    empresa_id = request.session["empresa_id"]
+    capacidad = Empresa.objects.filter(pk=empresa_id).values_list("capacidad_cocina", flat=True).first() or 0
+    cola = leer_cola(empresa_id)
+
+    siguientes = cola.siguientes(limite=30)
+    reservas = Reserva_Pedido.objects.select_related("cliente").in_bulk([r for _, _, r, _ in siguientes])
+    ahora = timezone.now().timestamp()
+    try:
+        horas = min(max(int(request.GET.get("horas", 8)), 1), 48)
+    except ValueError:
+        horas = 8
+    tramos = [
+        {
+            "inicio": timezone.localtime(como_fecha(tramo)),
+            "minutos": round(minutos),
+            "porcentaje": min(round(minutos * 100 / capacidad), 100) if capacidad else 100,
+            "saturado": minutos > capacidad,
+        }
+        for tramo, minutos in cola.carga(ahora, int(ahora) + horas * 3600 + TRAMO)
+    ]
+    return render(request, "staff/cocina.html", {
+        "capacidad": capacidad,
+        "horas": horas,
+        "tramos": tramos,
+        "siguientes": [
+            {
+                "inicio": timezone.localtime(como_fecha(inicio)),
+                "reserva": reservas.get(reserva_id),
+                "carga": round(carga),
+            }
+            for inicio, _, reserva_id, carga in siguientes
+        ],
+    })
+
+
+# ==============================
+# REPARTO
+# ==============================
+
+@login_required
+@empresa_required
+@usar_replica
+def reparto(request):
+    """Rutas de reparto del día (?fecha=AAAA-MM-DD, ?repartidores=N)."""
+    try:
+        dia = datetime.strptime(request.GET["fecha"], "%Y-%m-%d").date()
+    except (KeyError, ValueError):
+        dia = timezone.localdate()
+    try:
+        repartidores = min(max(int(request.GET.get("repartidores", 1)), 1), 50)
+    except ValueError:
+        repartidores = 1
+    from .reparto import planificar_reparto  # NumPy solo se importa al usarlo
+
+    desde = timezone.make_aware(datetime.combine(dia, datetime.min.time()))
+    plan = planificar_reparto(
+        request.session["empresa_id"], desde, desde + timedelta(days=1), repartidores=repartidores
+    )
+    return render(request, "staff/reparto.html", {**plan, "dia": dia, "repartidores": repartidores})
+
+
+# ==============================
+# EVENTOS (outbox)
+# ==============================
+
+@login_required
+@empresa_required
+def eventos(request):
+    """
+    Eventos de la empresa en sesión con posición > ?desde=N (como mucho ?limite=N, 500).
+    Se sigue leyendo con ?desde=<siguiente> de la respuesta.
+    """
+    try:
+        desde = max(int(request.GET.get("desde", 0)), 0)
+        limite = min(max(int(request.GET.get("limite", 500)), 1), 500)
+    except ValueError:
+        desde, limite = 0, 500
+    tipos = request.GET.getlist("tipo")
+    lista, siguiente = leer_eventos(desde, limite=limite, empresa_id=request.session["empresa_id"], tipos=tipos)
+    response = JsonResponse({"eventos": [como_dict(e) for e in lista], "siguiente": siguiente})
+    response["Cache-Control"] = "private, no-store"
+    return response
+
+
+# ==============================
+# PERFILES DE PETICIONES (superusuarios)
+# ==============================
+
+@user_passes_test(lambda u: u.is_superuser)
+def descargar_perfil(request, nombre, extension):
+    perfil = get_object_or_404(PerfilPeticion, nombre=nombre)
+    if "." + extension not in PerfilPeticion.EXTENSIONES:
+        raise Http404("Tipo de fichero desconocido.")
+    ruta = os.path.join(get_directorio(), f"{perfil.nombre}.{extension}")
+    if not os.path.exists(ruta):
+        raise Http404("El fichero del perfil ya no existe.")
+    return FileResponse(open(ruta, "rb"), as_attachment=True, filename=os.path.basename(ruta))